@@ -0,0 +1,122 @@
+# crawl_journal.py
+# 중단된 카테고리 크롤링을 이어서 실행하기 위한 작업 기록(저널)
+
+import json
+import os
+import time
+
+JOURNAL_DIR = "crawl_journal"
+
+
+class CrawlJournal:
+    """
+    한 번의 크롤링 실행에서 끝난 카테고리와, 진행 중인 카테고리의 다음 페이지 및
+    출력 파일(.part)에 기록된 위치를 파일로 남깁니다.
+    같은 설정(출력 디렉토리, 페이지 범위)으로 다시 실행하면 끝난 카테고리는 건너뛰고
+    진행 중이던 카테고리는 다음 페이지부터 이어서 가져옵니다.
+    기록은 ttl_seconds가 지나면 만료되어 처음부터 다시 크롤링합니다.
+    Args:
+        path (str): 저널 파일 경로입니다.
+        signature (dict): 실행 설정입니다. 저장된 설정과 다르면 저널을 새로 시작합니다.
+        ttl_seconds (float): 저널 유효 시간(초)입니다.
+    """
+
+    def __init__(self, path, signature, ttl_seconds):
+        self.path = path
+        self.signature = signature
+        self.ttl_seconds = ttl_seconds
+        self.created_at = time.time()
+        self.categories = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"경고: 크롤링 저널 '{self.path}'을(를) 읽지 못해 처음부터 시작합니다: {e}")
+            return
+        if data.get("signature") != self.signature:
+            print("크롤링 설정이 바뀌어 이전 저널을 사용하지 않고 처음부터 시작합니다.")
+            return
+        age = time.time() - data.get("created_at", 0)
+        if age > self.ttl_seconds:
+            print(
+                f"크롤링 저널이 만료되어({age / 3600:.1f}시간 경과) 처음부터 시작합니다."
+            )
+            return
+        self.created_at = data["created_at"]
+        self.categories = data.get("categories", {})
+        if self.categories:
+            done = sum(1 for entry in self.categories.values() if entry["status"] == "done")
+            print(
+                f"크롤링 저널을 이어서 사용합니다. (완료 {done}개, 진행 중 {len(self.categories) - done}개 카테고리)"
+            )
+
+    def save(self):
+        """ 저널을 임시 파일에 쓴 뒤 원자적으로 교체합니다. """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "signature": self.signature,
+                    "created_at": self.created_at,
+                    "categories": self.categories,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(temp_path, self.path)
+
+    def entry(self, category_name):
+        """ 카테고리의 기록을 반환합니다. (없으면 None) """
+        return self.categories.get(category_name)
+
+    def is_done(self, category_name):
+        entry = self.categories.get(category_name)
+        return entry is not None and entry["status"] == "done"
+
+    def record_page(self, category_name, next_page, count, page_size, offsets):
+        """ 카테고리의 한 페이지가 출력 파일에 기록된 뒤 호출됩니다. """
+        self.categories[category_name] = {
+            "status": "in_progress",
+            "next_page": next_page,
+            "count": count,
+            "page_size": page_size,
+            "offsets": offsets,
+        }
+        self.save()
+
+    def record_done(self, category_name, count):
+        """ 카테고리의 결과 파일이 최종 경로로 옮겨진 뒤 호출됩니다. """
+        self.categories[category_name] = {"status": "done", "count": count}
+        self.save()
+
+    def clear(self):
+        """ 실행이 모두 끝나면 저널을 지웁니다. """
+        self.categories = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def journal_for_outputs(outputs, start_page, max_page):
+    """
+    출력 디렉토리 조합별 저널을 엽니다. (예: crawl_journal/result_json+result_price_json.json)
+    .env의 EMART_JOURNAL_TTL_HOURS(기본 6)가 지나면 만료되며, 0이면 저널을 사용하지 않습니다(None 반환).
+    """
+    ttl_hours = float(os.environ.get("EMART_JOURNAL_TTL_HOURS", 6))
+    if ttl_hours <= 0:
+        return None
+    output_dirs = sorted(outputs)
+    signature = {
+        "outputs": {output_dir: outputs[output_dir] for output_dir in output_dirs},
+        "start_page": start_page,
+        "max_page": max_page,
+    }
+    path = os.path.join(JOURNAL_DIR, "+".join(output_dirs) + ".json")
+    return CrawlJournal(path, signature, ttl_hours * 3600)
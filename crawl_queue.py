@@ -0,0 +1,498 @@
+# crawl_queue.py
+# 여러 워커 프로세스(다른 서버 포함)가 나눠 처리하는 SQLite 기반 카테고리 크롤링 작업 큐
+#
+# 사용법:
+#   python crawl_queue.py coordinate [full price non_price] [--workers N]  # 작업 등록 후 완료될 때까지 결과 파일 생성
+#   python crawl_queue.py work [--processes N] [--idle-timeout 초]         # 큐에서 작업을 가져와 처리하는 워커
+#   python crawl_queue.py status                                          # 진행 상황 출력
+#
+# 같은 큐 파일(EMART_QUEUE_DB)을 공유하면 다른 서버의 워커도 작업을 가져갈 수 있습니다.
+# (네트워크 파일 시스템에서는 EMART_QUEUE_WAL=False로 설정하세요)
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from dotenv import load_dotenv
+
+import http_client
+from emart_crawler import (
+    CATEGORY_PAGE_URL,
+    JsonlCategoryWriter,
+    load_categories_from_file,
+    outputs_for_kinds,
+    page_range_from_env,
+    parse_page_for_kinds,
+)
+from emart_parser import detect_last_page
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    kinds TEXT NOT NULL,
+    page_url TEXT NOT NULL,
+    start_page INTEGER NOT NULL,
+    max_page INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS categories (
+    run_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    disp_ctg_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    page_size INTEGER,
+    hint_page INTEGER,
+    item_count INTEGER,
+    PRIMARY KEY (run_id, name)
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    item_count INTEGER,
+    products TEXT,
+    error TEXT,
+    UNIQUE (run_id, category, page)
+);
+CREATE INDEX IF NOT EXISTS tasks_by_status ON tasks (status, available_at);
+"""
+
+
+@dataclass
+class PageTask:
+    task_id: int
+    run_id: str
+    category: str
+    disp_ctg_id: str
+    page: int
+    attempts: int
+    kinds: list
+    page_url: str
+    start_page: int
+
+
+class CrawlQueue:
+    """
+    SQLite 파일에 저장되는 카테고리 페이지 작업 큐입니다.
+    워커는 작업을 임대(lease)하여 처리하고, 임대 시간 안에 끝내지 못한 작업은 다른 워커가 다시 가져갑니다.
+    각 카테고리는 첫 페이지 작업만 등록하고, 페이지를 처리한 워커가 마지막 페이지 추정값과
+    페이지가 가득 찼는지를 보고 다음 페이지 작업을 추가합니다. (CategoryCrawler와 같은 규칙)
+    Args:
+        db_path (str): 큐 파일 경로입니다. (기본값: .env의 EMART_QUEUE_DB, crawl_queue.sqlite3)
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.environ.get("EMART_QUEUE_DB", "crawl_queue.sqlite3")
+        self.lease_seconds = float(os.environ.get("EMART_QUEUE_LEASE_SECONDS", 60))
+        self.max_attempts = int(os.environ.get("EMART_QUEUE_MAX_ATTEMPTS", 3))
+        self.probe_size = int(os.environ.get("EMART_HOST_CONCURRENCY", 4))
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if os.environ.get("EMART_QUEUE_WAL", "True").lower() == "true":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """ 쓰기 잠금을 먼저 잡는 트랜잭션입니다. (여러 워커가 같은 작업을 가져가지 않도록) """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    # -- 코디네이터 -------------------------------------------------------------
+
+    def create_run(self, categories, kinds, start_page, max_page, page_url=CATEGORY_PAGE_URL):
+        """ 카테고리별 첫 페이지 작업을 등록하고 실행 ID를 반환합니다. """
+        run_id = time.strftime("%Y%m%d%H%M%S") + f"-{os.getpid()}"
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO runs (run_id, kinds, page_url, start_page, max_page, status, created_at)"
+                " VALUES (?, ?, ?, ?, ?, 'running', ?)",
+                (run_id, json.dumps(list(kinds)), page_url, start_page, max_page, now),
+            )
+            for name, disp_ctg_id in categories.items():
+                conn.execute(
+                    "INSERT INTO categories (run_id, name, disp_ctg_id, status) VALUES (?, ?, ?, 'crawling')",
+                    (run_id, name, str(disp_ctg_id)),
+                )
+                self._enqueue(conn, run_id, name, [start_page], now)
+        print(f"작업 큐에 실행 '{run_id}'를 등록했습니다. ({len(categories)}개 카테고리)")
+        return run_id
+
+    @staticmethod
+    def _enqueue(conn, run_id, category, pages, now):
+        conn.executemany(
+            "INSERT OR IGNORE INTO tasks (run_id, category, page, status, available_at)"
+            " VALUES (?, ?, ?, 'pending', ?)",
+            [(run_id, category, page, now) for page in pages],
+        )
+
+    def finalize_ready(self, run_id):
+        """
+        모든 페이지 작업이 끝난 카테고리의 결과를 페이지 순서대로 출력 디렉토리에 씁니다.
+        실패한 작업이 있는 카테고리는 결과 파일을 만들지 않습니다. (이전 결과 파일 유지)
+        Returns:
+            bool: 실행의 모든 카테고리가 끝났으면 True
+        """
+        run = self._conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        outputs = outputs_for_kinds(json.loads(run["kinds"]))
+        ready = self._conn.execute(
+            "SELECT name FROM categories c WHERE run_id = ? AND status = 'crawling'"
+            " AND NOT EXISTS (SELECT 1 FROM tasks t WHERE t.run_id = c.run_id AND t.category = c.name"
+            " AND t.status IN ('pending', 'leased'))",
+            (run_id,),
+        ).fetchall()
+
+        for row in ready:
+            name = row["name"]
+            failed = self._conn.execute(
+                "SELECT page, error FROM tasks WHERE run_id = ? AND category = ? AND status = 'failed'",
+                (run_id, name),
+            ).fetchall()
+            if failed:
+                print(
+                    f"'{name}' 카테고리 스크래핑이 실패하여 이전 결과 파일을 그대로 둡니다. "
+                    f"(실패한 페이지: {[r['page'] for r in failed]}, 오류: {failed[0]['error']})"
+                )
+                status, count = "failed", None
+            else:
+                writer = JsonlCategoryWriter(name, outputs, run["start_page"])
+                pages = self._conn.execute(
+                    "SELECT page, products FROM tasks WHERE run_id = ? AND category = ? ORDER BY page",
+                    (run_id, name),
+                )
+                for page in pages:
+                    writer.add_page(page["page"], json.loads(page["products"]))
+                count = writer.close()
+                print(f"'{name}' 카테고리 {count}개 상품을 {sorted(outputs)}에 저장했습니다.")
+                status = "done"
+            with self._transaction() as conn:
+                conn.execute(
+                    "UPDATE categories SET status = ?, item_count = ? WHERE run_id = ? AND name = ?",
+                    (status, count, run_id, name),
+                )
+                conn.execute(
+                    "UPDATE tasks SET products = NULL WHERE run_id = ? AND category = ?",
+                    (run_id, name),
+                )
+
+        remaining = self._conn.execute(
+            "SELECT COUNT(*) FROM categories WHERE run_id = ? AND status = 'crawling'", (run_id,)
+        ).fetchone()[0]
+        if remaining:
+            return False
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE runs SET status = 'finished', finished_at = ? WHERE run_id = ? AND status = 'running'",
+                (time.time(), run_id),
+            )
+        return True
+
+    def results(self, run_id):
+        """ 카테고리 이름 -> 저장한 상품 수 (실패한 카테고리는 None) """
+        rows = self._conn.execute(
+            "SELECT name, item_count FROM categories WHERE run_id = ?", (run_id,)
+        ).fetchall()
+        return {row["name"]: row["item_count"] for row in rows}
+
+    def status(self):
+        """ 실행 중인 작업의 상태별 개수입니다. """
+        rows = self._conn.execute(
+            "SELECT r.run_id, t.status, COUNT(*) AS n FROM runs r JOIN tasks t ON t.run_id = r.run_id"
+            " WHERE r.status = 'running' GROUP BY r.run_id, t.status"
+        ).fetchall()
+        summary = {}
+        for row in rows:
+            summary.setdefault(row["run_id"], {})[row["status"]] = row["n"]
+        return summary
+
+    # -- 워커 ------------------------------------------------------------------
+
+    def claim(self, owner):
+        """
+        처리할 작업 하나를 임대합니다. 없으면 None을 반환합니다.
+        임대가 만료된 작업은 다시 가져가되, 이미 시도 횟수를 모두 쓴 작업은 실패로 표시합니다.
+        (처리 중에 워커가 계속 죽는 페이지가 끝없이 다시 임대되지 않도록)
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE tasks SET status = 'failed', lease_owner = NULL,"
+                " error = COALESCE(error, '시도 횟수를 모두 쓴 뒤 임대가 만료되었습니다.')"
+                " WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts),
+            )
+            row = conn.execute(
+                "SELECT t.task_id, t.run_id, t.category, t.page, t.attempts, c.disp_ctg_id,"
+                " r.kinds, r.page_url, r.start_page"
+                " FROM tasks t"
+                " JOIN categories c ON c.run_id = t.run_id AND c.name = t.category"
+                " JOIN runs r ON r.run_id = t.run_id"
+                " WHERE r.status = 'running' AND ("
+                "   (t.status = 'pending' AND t.available_at <= ?)"
+                "   OR (t.status = 'leased' AND t.lease_expires < ?))"
+                " ORDER BY t.page, t.task_id LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?,"
+                " attempts = attempts + 1 WHERE task_id = ?",
+                (owner, now + self.lease_seconds, row["task_id"]),
+            )
+        return PageTask(
+            task_id=row["task_id"],
+            run_id=row["run_id"],
+            category=row["category"],
+            disp_ctg_id=row["disp_ctg_id"],
+            page=row["page"],
+            attempts=row["attempts"] + 1,
+            kinds=json.loads(row["kinds"]),
+            page_url=row["page_url"],
+            start_page=row["start_page"],
+        )
+
+    def complete(self, task, owner, products, last_page_hint=None):
+        """
+        작업 결과를 저장하고 필요한 다음 페이지 작업을 추가합니다.
+        임대가 만료되어 다른 워커가 가져간 작업이면 결과를 버리고 False를 반환합니다.
+        """
+        now = time.time()
+        item_count = len(products)
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE tasks SET status = 'done', item_count = ?, products = ?, lease_owner = NULL,"
+                " error = NULL WHERE task_id = ? AND status = 'leased' AND lease_owner = ?",
+                (
+                    item_count,
+                    json.dumps(products, ensure_ascii=False, separators=(",", ":")),
+                    task.task_id,
+                    owner,
+                ),
+            ).rowcount
+            if not updated:
+                return False
+
+            run = conn.execute(
+                "SELECT max_page FROM runs WHERE run_id = ?", (task.run_id,)
+            ).fetchone()
+            max_page = run["max_page"]
+            if task.page == task.start_page:
+                conn.execute(
+                    "UPDATE categories SET page_size = ?, hint_page = ? WHERE run_id = ? AND name = ?",
+                    (item_count, last_page_hint, task.run_id, task.category),
+                )
+                if item_count and last_page_hint and last_page_hint > task.page:
+                    # 추정한 마지막 페이지까지 한꺼번에 등록합니다.
+                    pages = range(task.page + 1, min(last_page_hint, max_page) + 1)
+                    self._enqueue(conn, task.run_id, task.category, pages, now)
+
+            category = conn.execute(
+                "SELECT page_size, hint_page FROM categories WHERE run_id = ? AND name = ?",
+                (task.run_id, task.category),
+            ).fetchone()
+            highest_page = conn.execute(
+                "SELECT MAX(page) FROM tasks WHERE run_id = ? AND category = ?",
+                (task.run_id, task.category),
+            ).fetchone()[0]
+            page_size = category["page_size"] or 0
+            if task.page == highest_page and item_count and item_count >= page_size:
+                # 마지막으로 등록된 페이지가 가득 차 있으면 다음 페이지들을 더 확인합니다.
+                # 추정값까지 가져온 뒤에는 한 페이지만 더 확인합니다.
+                probe_size = 1 if task.page == category["hint_page"] else self.probe_size
+                pages = range(task.page + 1, min(task.page + probe_size, max_page) + 1)
+                self._enqueue(conn, task.run_id, task.category, pages, now)
+        return True
+
+    def fail(self, task, owner, error):
+        """ 작업을 다시 대기 상태로 돌리거나, 시도 횟수를 넘었으면 실패로 표시합니다. """
+        backoff = float(os.environ.get("EMART_QUEUE_RETRY_BACKOFF", 2.0))
+        with self._transaction() as conn:
+            if task.attempts >= self.max_attempts:
+                conn.execute(
+                    "UPDATE tasks SET status = 'failed', lease_owner = NULL, error = ?"
+                    " WHERE task_id = ? AND lease_owner = ?",
+                    (str(error), task.task_id, owner),
+                )
+            else:
+                conn.execute(
+                    "UPDATE tasks SET status = 'pending', lease_owner = NULL, error = ?, available_at = ?"
+                    " WHERE task_id = ? AND lease_owner = ?",
+                    (
+                        str(error),
+                        time.time() + backoff * 2 ** (task.attempts - 1),
+                        task.task_id,
+                        owner,
+                    ),
+                )
+
+    def has_open_tasks(self):
+        """ 실행 중인 실행에 대기 중이거나 처리 중인 작업이 남아 있는지 확인합니다. """
+        row = self._conn.execute(
+            "SELECT 1 FROM tasks t JOIN runs r ON r.run_id = t.run_id"
+            " WHERE r.status = 'running' AND t.status IN ('pending', 'leased') LIMIT 1"
+        ).fetchone()
+        return row is not None
+
+
+def process_task(task):
+    """ 한 페이지 작업을 처리합니다. Returns: (상품 목록, 마지막 페이지 추정값) """
+    url = task.page_url.format(disp_ctg_id=task.disp_ctg_id, page_num=task.page)
+    print(f"--- {task.category} - {task.page} 페이지 스크래핑 시작: {url} ---")
+    response = http_client.get(url)
+    response.raise_for_status()
+    products = parse_page_for_kinds(task.kinds)(response.text, task.category)
+    last_page_hint = None
+    if task.page == task.start_page and products:
+        last_page_hint = detect_last_page(response.text, len(products))
+    print(
+        f"--- {task.category} - {task.page} 페이지 스크래핑 완료. {len(products)}개의 상품 추출. ---"
+    )
+    return products, last_page_hint
+
+
+def run_worker(db_path=None, idle_timeout=None):
+    """
+    큐에서 작업을 가져와 처리하는 워커입니다.
+    처리할 작업이 없고 진행 중인 작업도 없는 상태가 idle_timeout초 동안 이어지면 종료합니다.
+    워커를 coordinate보다 먼저 실행해도 작업이 등록될 때까지 기다리도록,
+    기본값은 .env의 EMART_QUEUE_IDLE_TIMEOUT(300초)입니다.
+    Returns:
+        int: 처리한 작업 수
+    """
+    # 부모 프로세스에서 이미 정한 환경 변수가 .env 값으로 바뀌지 않도록 덮어쓰지 않습니다.
+    load_dotenv()
+    if idle_timeout is None:
+        idle_timeout = float(os.environ.get("EMART_QUEUE_IDLE_TIMEOUT", 300))
+    queue = CrawlQueue(db_path)
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    idle_since = None
+    try:
+        while True:
+            task = queue.claim(owner)
+            if task is None:
+                if queue.has_open_tasks():
+                    # 다른 워커가 처리 중인 작업이 남아 있습니다. (다음 페이지 작업이 추가될 수 있음)
+                    idle_since = None
+                    time.sleep(0.2)
+                    continue
+                idle_since = idle_since or time.time()
+                if time.time() - idle_since >= idle_timeout:
+                    break
+                time.sleep(1.0)
+                continue
+            idle_since = None
+            try:
+                products, last_page_hint = process_task(task)
+            except Exception as e:
+                print(f"'{task.category}' {task.page} 페이지 처리 중 오류가 발생했습니다: {e}")
+                queue.fail(task, owner, e)
+                continue
+            if not queue.complete(task, owner, products, last_page_hint):
+                print(f"'{task.category}' {task.page} 페이지 작업의 임대가 만료되어 결과를 버립니다.")
+            processed += 1
+    finally:
+        queue.close()
+    print(f"워커 {owner}: {processed}개 작업 처리 후 종료합니다.")
+    return processed
+
+
+def start_local_workers(count, db_path=None):
+    """
+    이 서버에서 워커 프로세스 count개를 시작합니다.
+    작업을 등록한 뒤에 시작하므로 할 일이 없으면 기다리지 않고 바로 종료합니다. (coordinate가 종료를 기다림)
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_worker, args=(db_path, 0.0), daemon=True) for _ in range(count)
+    ]
+    for process in processes:
+        process.start()
+    return processes
+
+
+def coordinate(kinds=("full", "price", "non_price"), workers=0, db_path=None, categories=None, page_url=None):
+    """
+    카테고리 작업을 큐에 등록하고, 끝난 카테고리부터 결과 파일을 만들며 모두 끝날 때까지 기다립니다.
+    workers가 0보다 크면 이 서버에서 워커 프로세스를 함께 실행합니다.
+    Returns:
+        dict: 카테고리 이름 -> 저장한 상품 수 (실패한 카테고리는 None)
+    """
+    outputs_for_kinds(kinds)
+    load_dotenv()
+    if categories is None:
+        categories = load_categories_from_file()
+    start_page, max_page = page_range_from_env()
+
+    queue = CrawlQueue(db_path)
+    try:
+        run_id = queue.create_run(
+            categories, kinds, start_page, max_page, page_url or CATEGORY_PAGE_URL
+        )
+        processes = start_local_workers(workers, queue.db_path)
+        while not queue.finalize_ready(run_id):
+            time.sleep(0.5)
+        for process in processes:
+            process.join()
+        results = queue.results(run_id)
+    finally:
+        queue.close()
+    print("\n===== 모든 카테고리 스크래핑 프로세스 완료 =====")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="이마트몰 크롤링 작업 큐")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    coordinate_parser = subparsers.add_parser("coordinate")
+    coordinate_parser.add_argument("kinds", nargs="*", default=["full", "price", "non_price"])
+    coordinate_parser.add_argument("--workers", type=int, default=0)
+    work_parser = subparsers.add_parser("work")
+    work_parser.add_argument("--processes", type=int, default=1)
+    work_parser.add_argument(
+        "--idle-timeout", type=float, default=None, help="할 일이 없을 때 기다릴 시간(초, 기본 EMART_QUEUE_IDLE_TIMEOUT)"
+    )
+    subparsers.add_parser("status")
+    args = parser.parse_args()
+
+    if args.command == "coordinate":
+        print(json.dumps(coordinate(args.kinds, args.workers), ensure_ascii=False, indent=4))
+    elif args.command == "work":
+        if args.processes <= 1:
+            run_worker(idle_timeout=args.idle_timeout)
+        else:
+            context = multiprocessing.get_context("spawn")
+            workers = [
+                context.Process(target=run_worker, args=(None, args.idle_timeout))
+                for _ in range(args.processes)
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+    elif args.command == "status":
+        print(json.dumps(CrawlQueue().status(), ensure_ascii=False, indent=4))
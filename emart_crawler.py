@@ -0,0 +1,512 @@
+# emart_crawler.py
+# 여러 카테고리의 페이지를 asyncio로 동시에 가져오는 공용 크롤링 엔진
+
+import abc
+import asyncio
+import concurrent.futures
+import json
+import os
+import urllib.parse
+
+import requests
+from dotenv import load_dotenv
+
+import http_client
+from emart_parser import (
+    OUTPUTS,
+    detect_last_page,
+    project_products,
+    scrape_emart_category_page,
+)
+from emart_price_stream import scrape_price_page
+from crawl_journal import journal_for_outputs
+from jsonl_store import JsonlWriter
+from parse_pool import create_parse_pool, parse_queue_size_from_env
+
+CATEGORY_PAGE_URL = (
+    "https://emart.ssg.com/disp/category.ssg?dispCtgId={disp_ctg_id}&page={page_num}"
+)
+
+
+def load_categories_from_file(filepath="categories.json"):
+    """
+    지정된 JSON 파일에서 스크래핑할 카테고리 목록을 로드합니다.
+    파일이 없거나 오류가 발생하면 기본 카테고리 목록을 반환합니다.
+    """
+    if os.path.exists(filepath):
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                categories = json.load(f)
+            print(f"'{filepath}' 파일에서 카테고리 목록을 성공적으로 로드했습니다.")
+            return categories
+        except json.JSONDecodeError as e:
+            print(
+                f"경고: '{filepath}' 파일 파싱 오류: {e}. 기본 카테고리 목록을 사용합니다."
+            )
+        except Exception as e:
+            print(
+                f"경고: '{filepath}' 파일 로드 중 예상치 못한 오류: {e}. 기본 카테고리 목록을 사용합니다."
+            )
+    else:
+        print(
+            f"경고: '{filepath}' 파일을 찾을 수 없습니다. 기본 카테고리 목록을 사용합니다."
+        )
+
+    return {
+        "과일": "6000213114",
+    }
+
+
+class OrderedPageSink(abc.ABC):
+    """
+    동시에 도착하는 페이지 결과를 페이지 번호 순서대로 정리해 write_page()로 넘깁니다.
+    첫 번째 빈 페이지가 나오면 카테고리의 끝으로 보고 그 뒤 페이지는 버립니다.
+    """
+
+    def __init__(self, start_page):
+        self.next_page = start_page
+        self.finished = False
+        self.count = 0
+        # 첫 번째로 기록한 페이지의 상품 수 (한 페이지에 보이는 상품 수)
+        self.page_size = None
+        self._pending = {}
+
+    def add_page(self, page_num, products):
+        if self.finished or page_num < self.next_page:
+            return
+        self._pending[page_num] = products
+        while not self.finished and self.next_page in self._pending:
+            page_products = self._pending.pop(self.next_page)
+            if not page_products:
+                self.finished = True
+                self._pending.clear()
+                break
+            self.write_page(page_products)
+            self.count += len(page_products)
+            if self.page_size is None:
+                self.page_size = len(page_products)
+            self.next_page += 1
+            self.page_written()
+
+    @abc.abstractmethod
+    def write_page(self, products):
+        """ 순서대로 정리된 한 페이지의 상품 목록을 기록합니다. """
+
+    def page_written(self):
+        """ 한 페이지가 순서대로 기록된 뒤 호출됩니다. """
+
+    def close(self):
+        """ 카테고리를 모두 가져온 뒤 호출됩니다. 반환값이 crawl() 결과가 됩니다. """
+        return self.count
+
+    def abort(self):
+        """ 카테고리 크롤링이 실패했을 때 호출됩니다. """
+
+
+class ProductCollector(OrderedPageSink):
+    """ 상품 목록을 메모리에 모아 close() 시 반환합니다. """
+
+    def __init__(self, start_page):
+        super().__init__(start_page)
+        self.products = []
+
+    def write_page(self, products):
+        self.products.extend(products)
+
+    def close(self):
+        return self.products
+
+
+class JsonlCategoryWriter(OrderedPageSink):
+    """
+    페이지를 받는 대로 출력 디렉토리별 '<카테고리>.jsonl.part' 파일에 이어 쓰고,
+    카테고리가 끝나면 '<카테고리>.jsonl'로 원자적으로 옮깁니다.
+    journal이 주어지면 페이지마다 진행 상황을 기록하고, 중단된 기록이 있으면 그 다음 페이지부터 이어 씁니다.
+    Args:
+        outputs (dict): 출력 디렉토리 -> 남길 필드 목록 (None이면 파서 결과 그대로 저장)
+        journal (CrawlJournal): 크롤링 저널입니다. (생략 가능)
+    """
+
+    def __init__(self, category_name, outputs, start_page, journal=None):
+        super().__init__(start_page)
+        self.category_name = category_name
+        self.journal = journal
+        paths = {
+            output_dir: os.path.join(output_dir, f"{category_name}.jsonl")
+            for output_dir in outputs
+        }
+
+        entry = journal.entry(category_name) if journal else None
+        resumable = (
+            entry is not None
+            and entry["status"] == "in_progress"
+            and all(
+                output_dir in entry["offsets"]
+                and JsonlWriter.can_resume(path, entry["offsets"][output_dir])
+                for output_dir, path in paths.items()
+            )
+        )
+        if resumable:
+            self.next_page = entry["next_page"]
+            self.count = entry["count"]
+            self.page_size = entry["page_size"]
+            print(
+                f"--- {category_name}: 저널에 기록된 {self.count}개 상품 다음({self.next_page} 페이지)부터 이어서 가져옵니다. ---"
+            )
+        self.writers = [
+            (
+                output_dir,
+                JsonlWriter(path, entry["offsets"][output_dir] if resumable else None),
+                outputs[output_dir],
+            )
+            for output_dir, path in paths.items()
+        ]
+
+    def write_page(self, products):
+        for _, writer, fields in self.writers:
+            writer.write_records(
+                products if fields is None else project_products(products, fields)
+            )
+
+    def page_written(self):
+        if self.journal is not None:
+            self.journal.record_page(
+                self.category_name,
+                self.next_page,
+                self.count,
+                self.page_size,
+                {output_dir: writer.offset for output_dir, writer, _ in self.writers},
+            )
+
+    def close(self):
+        for _, writer, _ in self.writers:
+            writer.commit()
+        if self.journal is not None:
+            self.journal.record_done(self.category_name, self.count)
+        return self.count
+
+    def abort(self):
+        for _, writer, _ in self.writers:
+            writer.abort()
+
+
+class CategoryCrawler:
+    """
+    카테고리 목록 페이지를 동시에 가져와 파싱하는 크롤러입니다.
+    Args:
+        parse_page (callable): (html_content, category_name)을 받아 상품 목록을 반환하는 함수입니다.
+        concurrency (int): 전체 동시 요청 수 제한입니다.
+        host_concurrency (int): 호스트별 동시 요청 수 제한입니다.
+        parse_pool (Executor): 파싱을 실행할 프로세스 풀입니다. (None이면 이벤트 루프 스레드에서 파싱)
+        parse_queue_size (int): 파싱 중이거나 파싱을 기다리는 페이지를 동시 요청 수 외에 몇 개 더 둘지 정합니다.
+    요청 속도(초당 요청 수)는 http_client의 호스트별 AIMD 속도 제한기가 조절합니다.
+    네트워크 요청과 파싱은 서로를 기다리지 않고 동시에 진행되며, 파싱이 밀려 대기 자리가
+    모두 차면 새 페이지 요청을 멈춥니다. (역압)
+    """
+
+    def __init__(
+        self,
+        parse_page,
+        concurrency=6,
+        host_concurrency=4,
+        parse_pool=None,
+        parse_queue_size=8,
+    ):
+        self.parse_page = parse_page
+        self.concurrency = concurrency
+        self.host_concurrency = host_concurrency
+        self.parse_pool = parse_pool
+        self.parse_queue_size = parse_queue_size
+        self._global_semaphore = None
+        self._host_semaphores = {}
+        self._parse_slots = None
+
+    def _semaphore_for(self, host):
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.host_concurrency)
+        return self._host_semaphores[host]
+
+    async def fetch(self, url):
+        """ 전역/호스트별 동시 요청 제한을 지키며 URL의 HTML을 가져옵니다. """
+        host_semaphore = self._semaphore_for(urllib.parse.urlparse(url).netloc)
+        async with self._global_semaphore, host_semaphore:
+            response = await asyncio.to_thread(http_client.get, url)
+        response.raise_for_status()
+        return response.text
+
+    async def fetch_page(self, category_name, disp_ctg_id, page_num):
+        page_url = CATEGORY_PAGE_URL.format(disp_ctg_id=disp_ctg_id, page_num=page_num)
+        print(f"--- {category_name} - {page_num} 페이지 스크래핑 시작: {page_url} ---")
+        return await self.fetch(page_url)
+
+    async def parse(self, category_name, page_num, html_content):
+        """ 파서 풀이 있으면 워커 프로세스에서, 없으면 현재 스레드에서 파싱합니다. """
+        if self.parse_pool is None:
+            products = self.parse_page(html_content, category_name)
+        else:
+            products = await asyncio.get_running_loop().run_in_executor(
+                self.parse_pool, self.parse_page, html_content, category_name
+            )
+        print(
+            f"--- {category_name} - {page_num} 페이지 스크래핑 완료. {len(products)}개의 상품 추출. ---"
+        )
+        return products
+
+    async def fetch_and_parse(self, category_name, disp_ctg_id, page_num):
+        """
+        파싱 대기 자리를 먼저 확보한 뒤 페이지를 가져와 파싱합니다.
+        Returns:
+            tuple: (html_content, 상품 목록)
+        """
+        async with self._parse_slots:
+            html_content = await self.fetch_page(category_name, disp_ctg_id, page_num)
+            products = await self.parse(category_name, page_num, html_content)
+        return html_content, products
+
+    async def crawl_page(self, category_name, disp_ctg_id, page_num, sink):
+        """ 한 페이지를 가져와 결과를 sink에 넘기고 상품 수를 반환합니다. """
+        _, products = await self.fetch_and_parse(category_name, disp_ctg_id, page_num)
+        sink.add_page(page_num, products)
+        return len(products)
+
+    async def crawl_pages(self, category_name, disp_ctg_id, pages, sink):
+        """ 여러 페이지를 동시에 가져옵니다. 하나라도 실패하면 나머지를 취소하고 예외를 전달합니다. """
+        tasks = [
+            asyncio.create_task(
+                self.crawl_page(category_name, disp_ctg_id, page_num, sink)
+            )
+            for page_num in pages
+        ]
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def crawl_category(
+        self, category_name, disp_ctg_id, start_page, max_page, sink=None
+    ):
+        """
+        한 카테고리의 모든 페이지를 가져옵니다. 한 페이지라도 실패하면 None을 반환합니다.
+        첫 페이지에서 마지막 페이지를 추정해 나머지 페이지를 동시에 가져오고,
+        마지막으로 가져온 페이지가 가득 차 있으면 빈 페이지가 나올 때까지 몇 페이지씩 더 확인합니다.
+        Args:
+            start_page (int): 시작 페이지 번호입니다.
+            max_page (int): 가져올 페이지 번호의 상한입니다.
+            sink (OrderedPageSink): 페이지 결과를 받을 객체입니다. (생략 시 메모리에 모아 상품 목록을 반환)
+        Returns:
+            sink.close()의 반환값 (기본: 상품 목록)
+        """
+        if sink is None:
+            sink = ProductCollector(start_page)
+        # 저널에서 이어받은 sink는 이미 기록한 페이지 다음부터 가져옵니다.
+        start_page = sink.next_page
+        print(f"\n===== '{category_name}' 카테고리 스크래핑 시작 =====")
+        try:
+            html_content, first_page = await self.fetch_and_parse(
+                category_name, disp_ctg_id, start_page
+            )
+            page_size = sink.page_size or len(first_page)
+            sink.add_page(start_page, first_page)
+            page_sizes = [len(first_page)]
+            next_page = start_page + 1
+            # 추정값까지 가져온 뒤에는 한 페이지만 더 확인하고, 그 이후로는 여러 페이지씩 확인합니다.
+            probe_size = self.host_concurrency
+
+            if first_page:
+                last_page = detect_last_page(html_content, page_size)
+                if last_page and last_page >= next_page:
+                    last_page = min(last_page, max_page)
+                    print(
+                        f"--- {category_name}: 마지막 페이지를 {last_page} 페이지로 추정하여 나머지 페이지를 동시에 가져옵니다. ---"
+                    )
+                    page_sizes += await self.crawl_pages(
+                        category_name, disp_ctg_id, range(next_page, last_page + 1), sink
+                    )
+                    next_page = last_page + 1
+                    probe_size = 1
+
+            while next_page <= max_page and page_sizes[-1] >= max(page_size, 1):
+                window = range(next_page, min(next_page + probe_size, max_page + 1))
+                page_sizes += await self.crawl_pages(
+                    category_name, disp_ctg_id, window, sink
+                )
+                next_page = window.stop
+                probe_size = self.host_concurrency
+                if not all(page_sizes[-len(window):]):
+                    break
+            return sink.close()
+        except requests.exceptions.RequestException as e:
+            print(
+                f"'{category_name}' 카테고리 웹사이트에 연결하는 중 오류가 발생했습니다: {e}"
+            )
+        except Exception as e:
+            print(
+                f"'{category_name}' 카테고리 스크래핑 중 예상치 못한 오류가 발생했습니다: {e}"
+            )
+        sink.abort()
+        return None
+
+    async def crawl(self, categories, start_page, max_page, sink_factory=None):
+        """
+        모든 카테고리를 동시에 크롤링합니다.
+        Args:
+            sink_factory (callable): 카테고리 이름 -> OrderedPageSink (생략 시 상품 목록을 메모리에 모음)
+        Returns:
+            dict: 카테고리 이름 -> sink.close()의 반환값 (실패한 카테고리는 None)
+        """
+        self._global_semaphore = asyncio.Semaphore(self.concurrency)
+        self._host_semaphores = {}
+        # 요청 중인 페이지(동시 요청 수)와 파싱 중이거나 파싱을 기다리는 페이지(대기열 크기)만큼 자리를 둡니다.
+        self._parse_slots = asyncio.Semaphore(self.concurrency + self.parse_queue_size)
+        names = list(categories.keys())
+        results = await asyncio.gather(
+            *(
+                self.crawl_category(
+                    name,
+                    categories[name],
+                    start_page,
+                    max_page,
+                    sink_factory(name) if sink_factory else None,
+                )
+                for name in names
+            )
+        )
+        return dict(zip(names, results))
+
+
+def run_sync(coro):
+    """
+    코루틴을 동기적으로 실행합니다.
+    FastAPI 핸들러처럼 이미 이벤트 루프가 실행 중이면 별도 스레드에서 실행합니다.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+def crawler_from_env(parse_page, parse_pool=None):
+    """ .env 설정값으로 CategoryCrawler를 생성합니다. """
+    return CategoryCrawler(
+        parse_page,
+        concurrency=int(os.environ.get("EMART_CONCURRENCY", 6)),
+        host_concurrency=int(os.environ.get("EMART_HOST_CONCURRENCY", 4)),
+        parse_pool=parse_pool,
+        parse_queue_size=parse_queue_size_from_env(),
+    )
+
+
+def page_range_from_env():
+    """
+    .env에서 (시작 페이지, 페이지 상한)을 읽습니다.
+    EMART_END_PAGE가 비어 있거나 0이면 상한 없이 마지막 페이지까지 가져오며,
+    이때도 EMART_MAX_PAGES(기본 200)를 넘지는 않습니다.
+    """
+    start_page = int(os.environ.get("EMART_START_PAGE") or 1)
+    end_page = (os.environ.get("EMART_END_PAGE") or "").strip()
+    if end_page and int(end_page) > 0:
+        return start_page, int(end_page)
+    return start_page, int(os.environ.get("EMART_MAX_PAGES", 200))
+
+
+def run_category_crawl(categories, parse_page, outputs):
+    """
+    카테고리들을 동시에 크롤링하여 '<output_dir>/<카테고리>.jsonl' 파일로 저장합니다.
+    각 페이지는 한 번만 가져와 파싱하고, 페이지 순서대로 출력 디렉토리별로 투영하여 바로 파일에 이어 씁니다.
+    카테고리가 끝까지 성공하면 결과 파일이 원자적으로 교체되고, 실패하면 이전 결과 파일이 그대로 남습니다.
+    진행 상황은 크롤링 저널에 기록되어, 중단 후 다시 실행하면 끝난 카테고리는 건너뛰고
+    진행 중이던 카테고리는 다음 페이지부터 이어서 가져옵니다. (EMART_JOURNAL_TTL_HOURS 동안 유효)
+    Args:
+        categories (dict): 카테고리 이름 -> dispCtgId
+        parse_page (callable): (html_content, category_name) -> 상품 목록
+        outputs (dict): 출력 디렉토리 -> 남길 필드 목록 (None이면 파서 결과 그대로 저장)
+    Returns:
+        dict: 카테고리 이름 -> 저장한 상품 수 (실패한 카테고리는 None)
+    """
+    load_dotenv(override=True)
+    start_page, max_page = page_range_from_env()
+    journal = journal_for_outputs(outputs, start_page, max_page)
+
+    # 중단된 이전 실행에서 이미 끝난 카테고리는 건너뜁니다.
+    finished = {}
+    if journal is not None:
+        for name in categories:
+            if journal.is_done(name):
+                finished[name] = journal.entry(name)["count"]
+                print(f"'{name}' 카테고리는 이전 실행에서 이미 완료되어 건너뜁니다.")
+    remaining = {
+        name: disp_ctg_id
+        for name, disp_ctg_id in categories.items()
+        if name not in finished
+    }
+
+    parse_pool = create_parse_pool()
+    try:
+        crawler = crawler_from_env(parse_page, parse_pool)
+        crawled = run_sync(
+            crawler.crawl(
+                remaining,
+                start_page,
+                max_page,
+                lambda name: JsonlCategoryWriter(name, outputs, start_page, journal),
+            )
+        )
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+    results = {name: finished.get(name, crawled.get(name)) for name in categories}
+    if journal is not None and all(count is not None for count in results.values()):
+        journal.clear()
+
+    for category_name, count in results.items():
+        if count is None:
+            print(
+                f"\n'{category_name}' 카테고리 스크래핑이 실패하여 이전 결과 파일을 그대로 둡니다."
+            )
+            continue
+        for output_dir in outputs:
+            print(
+                f"\n'{category_name}' 카테고리 스크래핑이 완료되었습니다. 데이터가 '{output_dir}/{category_name}.jsonl' 파일에 성공적으로 저장되었습니다."
+            )
+        print(f"총 {count}개의 '{category_name}' 상품이 스크랩되었습니다.")
+    print("\n===== 모든 카테고리 스크래핑 프로세스 완료 =====")
+    return results
+
+
+def outputs_for_kinds(kinds):
+    """ 결과 종류 목록을 출력 디렉토리 -> 필드 목록으로 바꿉니다. """
+    unknown = [kind for kind in kinds if kind not in OUTPUTS]
+    if unknown:
+        raise ValueError(f"알 수 없는 결과 종류입니다: {unknown}")
+    return {OUTPUTS[kind][0]: OUTPUTS[kind][1] for kind in kinds}
+
+
+def parse_page_for_kinds(kinds):
+    """ 결과 종류에 맞는 페이지 파서를 고릅니다. """
+    # 가격 정보만 필요하면 DOM을 만들지 않는 스트리밍 추출기를 사용합니다.
+    use_stream = os.environ.get("EMART_PRICE_STREAM", "True").lower() == "true"
+    if list(kinds) == ["price"] and use_stream:
+        return scrape_price_page
+    return scrape_emart_category_page
+
+
+def run_extraction(kinds=("full", "price", "non_price")):
+    """
+    카테고리 페이지를 한 번씩만 가져와 선택한 종류의 결과 파일을 한꺼번에 생성합니다.
+    Args:
+        kinds (iterable): "full", "price", "non_price" 중 생성할 결과 종류입니다.
+    """
+    outputs = outputs_for_kinds(kinds)
+
+    load_dotenv(override=True)
+    categories_to_scrape = load_categories_from_file()
+    return run_category_crawl(categories_to_scrape, parse_page_for_kinds(kinds), outputs)
+
+
+if __name__ == "__main__":
+    import sys
+
+    run_extraction(sys.argv[1:] or ("full", "price", "non_price"))
@@ -0,0 +1,560 @@
+# emart_parser.py
+# 이마트몰 카테고리 페이지 파서 및 결과 종류별 필드 정의
+
+import math
+import os
+import re
+import sys
+import urllib.parse
+from bs4 import BeautifulSoup
+from datetime import datetime
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# 결과 종류별 저장 디렉토리와 필드 목록
+FULL_FIELDS = [
+    "id",
+    "category",
+    "product_name",
+    "product_address",
+    "original_price",
+    "selling_price",
+    "image_url",
+    "quantity",
+    "out_of_stock",
+    "last_updated",
+]
+PRICE_FIELDS = [
+    "id",
+    "original_price",
+    "selling_price",
+    "quantity",
+    "out_of_stock",
+    "last_updated",
+]
+NON_PRICE_FIELDS = [
+    "id",
+    "category",
+    "product_name",
+    "product_address",
+    "image_url",
+    "last_updated",
+]
+OUTPUTS = {
+    "full": ("result_json", FULL_FIELDS),
+    "price": ("result_price_json", PRICE_FIELDS),
+    "non_price": ("result_non_price_json", NON_PRICE_FIELDS),
+}
+
+# 카테고리 첫 페이지에서 전체 상품 수를 찾는 패턴
+# (추천/광고 스크립트의 값이나 상품명과 섞이지 않도록 둘 다 상품 목록 앞부분에서만 찾습니다)
+TOTAL_COUNT_SCRIPT_PATTERN = re.compile(
+    r"""["']?total(?:Item)?C(?:ou)?nt["']?\s*[:=]\s*["']?([\d,]+)"""
+)
+TOTAL_COUNT_TEXT_PATTERN = re.compile(r"총\s*(?:<[^>]+>\s*)*([\d,]+)\s*(?:<[^>]+>\s*)*개")
+# 페이지 이동 링크에서 페이지 번호를 찾는 패턴
+PAGE_NUMBER_PATTERN = re.compile(
+    r"(?:[?&]page=|fn_?[Pp]age\w*\(\s*['\"]?|data-page=['\"])(\d+)"
+)
+# 페이지 이동 링크의 글자로 적힌 페이지 번호 (<a>2</a>, <strong>1</strong>)
+PAGE_LINK_TEXT_PATTERN = re.compile(r"<(a|strong)\b[^>]*>\s*(\d+)\s*</\1>")
+
+
+def scrape_with_bs4(html_content, category_name):
+    """
+    제공된 이마트몰 카테고리 HTML 콘텐츠에서 상품 정보를 스크랩합니다.
+    BeautifulSoup(html.parser) 기반 기준 구현으로, 다른 파서 백엔드의 결과를 비교하는 기준입니다.
+    Args:
+        html_content (str): 이마트몰 카테고리 페이지의 HTML 콘텐츠입니다.
+        category_name (str): 현재 스크래핑 중인 카테고리 이름입니다.
+    Returns:
+        list: 추출된 정보가 담긴 딕셔너리 목록입니다.
+    """
+    soup = BeautifulSoup(html_content, "html.parser")
+    products_data = []
+
+    product_list_ul = soup.select_one("#ty_thmb_view > ul")
+    product_items = []
+    if product_list_ul:
+        product_items = product_list_ul.find_all("li")
+
+    for item in product_items:
+        id = ""
+        product_name = ""
+        product_address = ""
+        original_price = ""
+        selling_price = ""
+        image_url = ""
+        quantity = ""
+        out_of_stock = "N"
+        last_updated = datetime.now().isoformat()
+
+        brand_span = item.select_one("div.mnemitem_tit > span.mnemitem_goods_brand")
+        title_span = item.select_one("div.mnemitem_tit > span.mnemitem_goods_tit")
+        product_name_parts = []
+        if brand_span:
+            product_name_parts.append(f"[{brand_span.get_text(strip=True)}]")
+        if title_span:
+            product_name_parts.append(title_span.get_text(strip=True))
+        product_name = " ".join(product_name_parts).strip()
+
+        link_tag = item.select_one("div > a")
+        if link_tag and "href" in link_tag.attrs:
+            raw_url = link_tag["href"]
+            if raw_url.startswith("//"):
+                product_address = "https:" + raw_url
+            elif raw_url.startswith("http"):
+                product_address = raw_url
+            else:
+                product_address = "https://emart.ssg.com" + raw_url
+        else:
+            link_tag_alt = item.select_one("div.mnemitem_thmb_v2 > a")
+            if link_tag_alt and "href" in link_tag_alt.attrs:
+                raw_url_alt = link_tag_alt["href"]
+                if raw_url_alt.startswith("//"):
+                    product_address = "https:" + raw_url_alt
+                elif raw_url_alt.startswith("http"):
+                    product_address = raw_url_alt
+                else:
+                    product_address = "https://emart.ssg.com" + raw_url_alt
+
+        if product_address:
+            parsed_url = urllib.parse.urlparse(product_address)
+            parsed_query = urllib.parse.parse_qs(parsed_url.query)
+            item_id_list = parsed_query.get("itemId")
+            if item_id_list:
+                id = item_id_list[0]
+
+        selling_price_tag = item.select_one(
+            "div.mnemitem_pricewrap_v2 > div.mnemitem_price_row > div.new_price > em"
+        )
+        if not selling_price_tag:
+            selling_price_tag = item.select_one(
+                "div.mnemitem_pricewrap_v2 > div:nth-child(2) > div > em"
+            )
+        if selling_price_tag:
+            selling_price = (
+                selling_price_tag.get_text(strip=True)
+                .replace("원", "")
+                .replace(",", "")
+            )
+
+        original_price_tag = item.select_one(
+            "div.mnemitem_pricewrap_v2 > div.mnemitem_price_row.ty_oldpr > div > del > em"
+        )
+        if not original_price_tag:
+            original_price_tag = item.select_one(
+                "div.mnemitem_pricewrap_v2 > div:nth-child(1) > div > em"
+            )
+        if original_price_tag:
+            original_price = (
+                original_price_tag.get_text(strip=True)
+                .replace("원", "")
+                .replace(",", "")
+            )
+
+        img_tag = item.select_one("div.mnemitem_thmb_v2 > a > div > img")
+        if img_tag:
+            raw_image_url = ""
+            if "data-src" in img_tag.attrs:
+                raw_image_url = img_tag["data-src"]
+            elif "src" in img_tag.attrs:
+                raw_image_url = img_tag["src"]
+            if raw_image_url:
+                if raw_image_url.startswith("//"):
+                    image_url = "https:" + raw_image_url
+                elif raw_image_url.startswith("http"):
+                    image_url = raw_image_url
+                else:
+                    image_url = "https://emart.ssg.com" + raw_image_url
+
+        quantity_tag = item.select_one("div.mnemitem_pricewrap_v2 > div.unit_price")
+        if quantity_tag:
+            quantity = quantity_tag.get_text(strip=True)
+
+        sold_out_tag = item.select_one("div.mnemitem_thmb_v2 > div.mnemitem_soldout")
+        if sold_out_tag:
+            out_of_stock = "Y"
+
+        products_data.append(
+            {
+                "id": id,
+                "category": category_name,
+                "product_name": product_name,
+                "product_address": product_address,
+                "original_price": original_price,
+                "selling_price": selling_price,
+                "image_url": image_url,
+                "quantity": quantity,
+                "out_of_stock": out_of_stock,
+                "last_updated": last_updated,
+            }
+        )
+
+    return products_data
+
+
+# ---------------------------------------------------------------------------
+# C 기반 파서 백엔드 (lxml, selectolax)
+# 선택자와 값 정리 규칙은 scrape_with_bs4와 동일하게 맞춥니다.
+# ---------------------------------------------------------------------------
+
+CATEGORY_LIST_SELECTOR = "#ty_thmb_view > ul"
+ITEM_SELECTORS = {
+    "brand": "div.mnemitem_tit > span.mnemitem_goods_brand",
+    "title": "div.mnemitem_tit > span.mnemitem_goods_tit",
+    "link": "div > a",
+    "link_alt": "div.mnemitem_thmb_v2 > a",
+    "selling_price": "div.mnemitem_pricewrap_v2 > div.mnemitem_price_row > div.new_price > em",
+    "selling_price_alt": "div.mnemitem_pricewrap_v2 > div:nth-child(2) > div > em",
+    "original_price": "div.mnemitem_pricewrap_v2 > div.mnemitem_price_row.ty_oldpr > div > del > em",
+    "original_price_alt": "div.mnemitem_pricewrap_v2 > div:nth-child(1) > div > em",
+    "image": "div.mnemitem_thmb_v2 > a > div > img",
+    "quantity": "div.mnemitem_pricewrap_v2 > div.unit_price",
+    "sold_out": "div.mnemitem_thmb_v2 > div.mnemitem_soldout",
+}
+# get_text()처럼 텍스트를 모을 때 제외할 태그
+NON_TEXT_TAGS = {"script", "style", "template"}
+
+
+def _absolute_url(raw_url):
+    if raw_url.startswith("//"):
+        return "https:" + raw_url
+    if raw_url.startswith("http"):
+        return raw_url
+    return "https://emart.ssg.com" + raw_url
+
+
+def _clean_price(text):
+    return text.replace("원", "").replace(",", "")
+
+
+def _item_id_from_url(product_address):
+    if not product_address:
+        return ""
+    parsed_query = urllib.parse.parse_qs(urllib.parse.urlparse(product_address).query)
+    item_id_list = parsed_query.get("itemId")
+    return item_id_list[0] if item_id_list else ""
+
+
+def _build_product(category_name, select_one, get_text, get_attr):
+    """
+    백엔드별 노드 접근 함수로 상품 하나의 정보를 만듭니다.
+    Args:
+        select_one (callable): 선택자 키 -> 첫 번째 노드 또는 None
+        get_text (callable): 노드 -> get_text(strip=True)와 같은 문자열
+        get_attr (callable): (노드, 속성 이름) -> 속성 값 (속성이 없으면 None)
+    """
+    product_name_parts = []
+    brand_span = select_one("brand")
+    if brand_span is not None:
+        product_name_parts.append(f"[{get_text(brand_span)}]")
+    title_span = select_one("title")
+    if title_span is not None:
+        product_name_parts.append(get_text(title_span))
+    product_name = " ".join(product_name_parts).strip()
+
+    product_address = ""
+    link_tag = select_one("link")
+    raw_url = get_attr(link_tag, "href") if link_tag is not None else None
+    if raw_url is None:
+        link_tag_alt = select_one("link_alt")
+        raw_url = get_attr(link_tag_alt, "href") if link_tag_alt is not None else None
+    if raw_url is not None:
+        product_address = _absolute_url(raw_url)
+
+    selling_price = ""
+    selling_price_tag = select_one("selling_price")
+    if selling_price_tag is None:
+        selling_price_tag = select_one("selling_price_alt")
+    if selling_price_tag is not None:
+        selling_price = _clean_price(get_text(selling_price_tag))
+
+    original_price = ""
+    original_price_tag = select_one("original_price")
+    if original_price_tag is None:
+        original_price_tag = select_one("original_price_alt")
+    if original_price_tag is not None:
+        original_price = _clean_price(get_text(original_price_tag))
+
+    image_url = ""
+    img_tag = select_one("image")
+    if img_tag is not None:
+        raw_image_url = get_attr(img_tag, "data-src")
+        if raw_image_url is None:
+            raw_image_url = get_attr(img_tag, "src")
+        if raw_image_url:
+            image_url = _absolute_url(raw_image_url)
+
+    quantity = ""
+    quantity_tag = select_one("quantity")
+    if quantity_tag is not None:
+        quantity = get_text(quantity_tag)
+
+    return {
+        "id": _item_id_from_url(product_address),
+        "category": category_name,
+        "product_name": product_name,
+        "product_address": product_address,
+        "original_price": original_price,
+        "selling_price": selling_price,
+        "image_url": image_url,
+        "quantity": quantity,
+        "out_of_stock": "Y" if select_one("sold_out") is not None else "N",
+        "last_updated": datetime.now().isoformat(),
+    }
+
+
+def _xpath_class(class_name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')"
+
+
+if lxml is not None:
+    _PRICEWRAP = f"div[{_xpath_class('mnemitem_pricewrap_v2')}]"
+    _THMB = f"div[{_xpath_class('mnemitem_thmb_v2')}]"
+    _LXML_LIST_XPATH = etree.XPath("//*[@id='ty_thmb_view']/ul")
+    _LXML_ITEMS_XPATH = etree.XPath(".//li")
+    # ITEM_SELECTORS의 CSS 선택자를 같은 의미의 XPath로 옮긴 것입니다.
+    _LXML_ITEM_XPATHS = {
+        key: etree.XPath(expr)
+        for key, expr in {
+            "brand": f".//div[{_xpath_class('mnemitem_tit')}]/span[{_xpath_class('mnemitem_goods_brand')}]",
+            "title": f".//div[{_xpath_class('mnemitem_tit')}]/span[{_xpath_class('mnemitem_goods_tit')}]",
+            "link": ".//div/a",
+            "link_alt": f".//{_THMB}/a",
+            "selling_price": f".//{_PRICEWRAP}/div[{_xpath_class('mnemitem_price_row')}]/div[{_xpath_class('new_price')}]/em",
+            "selling_price_alt": f".//{_PRICEWRAP}/*[2][self::div]/div/em",
+            "original_price": f".//{_PRICEWRAP}/div[{_xpath_class('mnemitem_price_row')} and {_xpath_class('ty_oldpr')}]/div/del/em",
+            "original_price_alt": f".//{_PRICEWRAP}/*[1][self::div]/div/em",
+            "image": f".//{_THMB}/a/div/img",
+            "quantity": f".//{_PRICEWRAP}/div[{_xpath_class('unit_price')}]",
+            "sold_out": f".//{_THMB}/div[{_xpath_class('mnemitem_soldout')}]",
+        }.items()
+    }
+
+
+def _lxml_text(node):
+    parts = []
+
+    def collect(element):
+        if isinstance(element.tag, str) and element.tag not in NON_TEXT_TAGS:
+            if element.text:
+                parts.append(element.text.strip())
+            for child in element:
+                collect(child)
+        if element is not node and element.tail:
+            parts.append(element.tail.strip())
+
+    collect(node)
+    return "".join(parts)
+
+
+def scrape_with_lxml(html_content, category_name):
+    """ lxml(libxml2) 기반 파서로 scrape_with_bs4와 같은 결과를 만듭니다. """
+    root = lxml.html.document_fromstring(html_content)
+    product_list_ul = _LXML_LIST_XPATH(root)
+    if not product_list_ul:
+        return []
+
+    products_data = []
+    for item in _LXML_ITEMS_XPATH(product_list_ul[0]):
+
+        def select_one(key, item=item):
+            nodes = _LXML_ITEM_XPATHS[key](item)
+            return nodes[0] if nodes else None
+
+        products_data.append(
+            _build_product(
+                category_name, select_one, _lxml_text, lambda node, name: node.get(name)
+            )
+        )
+    return products_data
+
+
+def _selectolax_text(node):
+    parts = []
+    for child in node.traverse(include_text=True):
+        if child.tag == "-text" and child.parent.tag not in NON_TEXT_TAGS:
+            text = child.text_content.strip()
+            if text:
+                parts.append(text)
+    return "".join(parts)
+
+
+def _selectolax_attr(node, name):
+    attributes = node.attributes
+    if name not in attributes:
+        return None
+    return attributes[name] or ""
+
+
+def scrape_with_selectolax(html_content, category_name):
+    """ selectolax(lexbor) 기반 파서로 scrape_with_bs4와 같은 결과를 만듭니다. """
+    tree = LexborHTMLParser(html_content)
+    product_list_ul = tree.css_first(CATEGORY_LIST_SELECTOR)
+    if product_list_ul is None:
+        return []
+
+    products_data = []
+    for item in product_list_ul.css("li"):
+
+        def select_one(key, item=item):
+            return item.css_first(ITEM_SELECTORS[key])
+
+        products_data.append(
+            _build_product(category_name, select_one, _selectolax_text, _selectolax_attr)
+        )
+    return products_data
+
+
+PARSER_BACKENDS = {
+    "bs4": scrape_with_bs4,
+    "lxml": scrape_with_lxml,
+    "selectolax": scrape_with_selectolax,
+}
+
+
+def available_backends():
+    """ 현재 환경에 설치된 파서 백엔드 이름 목록을 반환합니다. """
+    backends = []
+    if LexborHTMLParser is not None:
+        backends.append("selectolax")
+    if lxml is not None:
+        backends.append("lxml")
+    backends.append("bs4")
+    return backends
+
+
+def resolve_backend(backend=None):
+    """
+    사용할 파서 백엔드 이름을 정합니다.
+    backend가 없으면 .env의 EMART_PARSER(auto, selectolax, lxml, bs4)를 따르며,
+    auto이거나 지정한 백엔드가 설치되어 있지 않으면 설치된 것 중 가장 빠른 백엔드를 사용합니다.
+    """
+    backend = (backend or os.environ.get("EMART_PARSER") or "auto").lower()
+    installed = available_backends()
+    if backend in installed:
+        return backend
+    if backend != "auto" and backend not in PARSER_BACKENDS:
+        print(f"경고: 알 수 없는 파서 백엔드 '{backend}'입니다. 자동 선택합니다.")
+    return installed[0]
+
+
+def scrape_emart_category_page(html_content, category_name, backend=None):
+    """
+    제공된 이마트몰 카테고리 HTML 콘텐츠에서 상품 정보를 스크랩합니다.
+    Args:
+        html_content (str): 이마트몰 카테고리 페이지의 HTML 콘텐츠입니다.
+        category_name (str): 현재 스크래핑 중인 카테고리 이름입니다.
+        backend (str): 파서 백엔드 이름입니다. (생략 시 EMART_PARSER 설정을 따름)
+    Returns:
+        list: 추출된 정보가 담긴 딕셔너리 목록입니다.
+    """
+    return PARSER_BACKENDS[resolve_backend(backend)](html_content, category_name)
+
+
+def compare_backends(html_content, backends=None):
+    """
+    한 페이지를 bs4 기준 구현과 다른 백엔드로 파싱해 결과가 같은지 비교합니다.
+    last_updated는 파싱 시각이므로 비교에서 제외합니다.
+    Returns:
+        dict: 백엔드 이름 -> 차이 목록 [(상품 순번, 필드, bs4 값, 백엔드 값)]
+    """
+    def strip_time(products):
+        return [{k: v for k, v in p.items() if k != "last_updated"} for p in products]
+
+    expected = strip_time(scrape_with_bs4(html_content, "parity"))
+    differences = {}
+    for backend in backends or available_backends():
+        if backend == "bs4":
+            continue
+        actual = strip_time(PARSER_BACKENDS[backend](html_content, "parity"))
+        diffs = []
+        if len(actual) != len(expected):
+            diffs.append((None, "count", len(expected), len(actual)))
+        for index, (want, got) in enumerate(zip(expected, actual)):
+            for field in want:
+                if want[field] != got.get(field):
+                    diffs.append((index, field, want[field], got.get(field)))
+        differences[backend] = diffs
+    return differences
+
+
+def check_parser_parity(html_paths, backends=None):
+    """
+    저장된 HTML 파일들에 대해 모든 백엔드가 bs4와 같은 결과를 내는지 확인합니다.
+    Returns:
+        bool: 모든 파일에서 결과가 같으면 True
+    """
+    all_equal = True
+    for path in html_paths:
+        with open(path, "r", encoding="utf-8") as f:
+            html_content = f.read()
+        for backend, diffs in compare_backends(html_content, backends).items():
+            if diffs:
+                all_equal = False
+                print(f"[불일치] {path} ({backend}): {len(diffs)}건")
+                for diff in diffs[:10]:
+                    print(f"    - {diff}")
+            else:
+                print(f"[일치] {path} ({backend})")
+    return all_equal
+
+
+def detect_last_page(html_content, items_per_page):
+    """
+    카테고리 첫 페이지에서 마지막 페이지 번호를 추정합니다.
+    전체 상품 수가 있으면 그 값으로 계산하고, 없으면 페이지 이동 링크의 가장 큰 번호를 사용합니다.
+    링크 묶음(예: 1~10)에 가려 실제보다 작을 수 있으므로 호출하는 쪽에서는 추정값으로만 사용합니다.
+    Args:
+        html_content (str): 카테고리 첫 페이지의 HTML 콘텐츠입니다.
+        items_per_page (int): 첫 페이지에서 추출된 상품 수입니다.
+    Returns:
+        int: 추정한 마지막 페이지 번호 (찾지 못하면 None)
+    """
+    if items_per_page > 0:
+        list_start = html_content.find("ty_thmb_view")
+        header = html_content[:list_start] if list_start >= 0 else ""
+        match = TOTAL_COUNT_SCRIPT_PATTERN.search(header) or TOTAL_COUNT_TEXT_PATTERN.search(header)
+        if match:
+            total_count = int(match.group(1).replace(",", ""))
+            if total_count > 0:
+                return math.ceil(total_count / items_per_page)
+
+    # 이벤트 루프에서 바로 호출하므로 DOM을 만들지 않고 페이지 이동 영역의 HTML만 잘라 정규식으로 찾습니다.
+    paginate_start = html_content.find("com_paginate")
+    if paginate_start >= 0:
+        paginate_end = html_content.find("</div>", paginate_start)
+        paginate = html_content[paginate_start:paginate_end if paginate_end >= 0 else None]
+        page_numbers = [int(n) for n in PAGE_NUMBER_PATTERN.findall(paginate)]
+        page_numbers += [int(n) for _, n in PAGE_LINK_TEXT_PATTERN.findall(paginate)]
+        if page_numbers:
+            return max(page_numbers)
+
+    return None
+
+
+def project_products(products, fields):
+    """
+    전체 상품 정보에서 지정된 필드만 남긴 목록을 반환합니다.
+    Args:
+        products (list): scrape_emart_category_page가 반환한 상품 목록입니다.
+        fields (list): 남길 필드 이름 목록입니다.
+    """
+    return [{field: product.get(field) for field in fields} for product in products]
+
+
+if __name__ == "__main__":
+    # 사용법: python emart_parser.py parity <HTML 파일> ...
+    if len(sys.argv) > 2 and sys.argv[1] == "parity":
+        sys.exit(0 if check_parser_parity(sys.argv[2:]) else 1)
+    print("사용법: python emart_parser.py parity <HTML 파일> ...")
@@ -0,0 +1,452 @@
+# emart_price_stream.py
+# DOM을 만들지 않고 카테고리 페이지에서 ID/가격/단위가격/품절 여부만 뽑아내는 스트리밍 추출기
+
+import html
+import os
+import random
+import re
+from datetime import datetime
+
+from emart_parser import (
+    ITEM_SELECTORS,
+    NON_TEXT_TAGS,
+    PRICE_FIELDS,
+    _absolute_url,
+    _clean_price,
+    _item_id_from_url,
+    project_products,
+    scrape_emart_category_page,
+)
+
+# 태그/텍스트 토큰 (html.parser와 마찬가지로 주석, 선언, 처리 지시문은 건너뜁니다)
+TOKEN_PATTERN = re.compile(
+    r"""<!--.*?-->|<![^>]*>|<\?[^>]*>"""
+    r"""|</\s*([a-zA-Z][^\s/>]*)[^>]*>"""
+    r"""|<([a-zA-Z][^\s/>]*)((?:[^>"']|"[^"]*"|'[^']*')*)>"""
+    r"""|[^<]+|<""",
+    re.S,
+)
+ATTRIBUTE_PATTERN = re.compile(
+    r"""([^\s=/>"']+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?"""
+)
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "keygen", "link", "meta", "param", "source", "track", "wbr",
+}
+RAW_TEXT_TAGS = {"script", "style"}
+RAW_TEXT_END_PATTERNS = {
+    tag: re.compile(r"</" + tag + r"\s*>", re.I) for tag in RAW_TEXT_TAGS
+}
+INCOMPLETE_TAG_PATTERN = re.compile(r"<(?:[a-zA-Z/!?]|$)")
+LIST_ID = "ty_thmb_view"
+# 상품 목록 전까지 찾는 패턴: script/style 시작 태그, 주석 시작, 목록 id 문자열
+PRE_LIST_PATTERN = re.compile(r"<(script|style)\b[^>]*>|<!--|" + LIST_ID, re.I)
+# 가격 작업에 필요한 선택자만 사용합니다.
+PRICE_SELECTOR_KEYS = [
+    "link",
+    "link_alt",
+    "selling_price",
+    "selling_price_alt",
+    "original_price",
+    "original_price_alt",
+    "quantity",
+    "sold_out",
+]
+TEXT_SELECTOR_KEYS = {
+    "selling_price",
+    "selling_price_alt",
+    "original_price",
+    "original_price_alt",
+    "quantity",
+}
+
+
+def _compile_selector(selector):
+    """
+    'div.a > div:nth-child(2) > em' 형태의 선택자를 (태그, 클래스 집합, n번째) 목록으로 바꿉니다.
+    """
+    compounds = []
+    for part in selector.split(">"):
+        part = part.strip()
+        nth = None
+        if ":nth-child(" in part:
+            part, nth_text = part.split(":nth-child(")
+            nth = int(nth_text.rstrip(")"))
+        tag, *classes = part.split(".")
+        compounds.append((tag or None, frozenset(classes), nth))
+    return compounds
+
+
+COMPILED_SELECTORS = {
+    key: _compile_selector(ITEM_SELECTORS[key]) for key in PRICE_SELECTOR_KEYS
+}
+# 마지막 요소의 태그별 선택자 목록 (대부분의 요소는 태그만 보고 바로 건너뜁니다)
+SELECTORS_BY_TAG = {}
+for _key, _compounds in COMPILED_SELECTORS.items():
+    SELECTORS_BY_TAG.setdefault(_compounds[-1][0], []).append((_key, _compounds))
+
+
+class _Frame:
+    __slots__ = ("tag", "classes", "index", "child_count")
+
+    def __init__(self, tag, classes, index):
+        self.tag = tag
+        self.classes = classes
+        self.index = index
+        self.child_count = 0
+
+
+class _ItemState:
+    """ 목록의 <li> 하나에 대해 선택자별 첫 번째 일치 결과를 모읍니다. """
+
+    __slots__ = ("depth", "matches", "capturing", "record_index")
+
+    def __init__(self, depth, record_index):
+        self.depth = depth
+        self.matches = {}
+        # 선택자 키 -> (텍스트를 모으는 요소의 스택 깊이, 텍스트 조각 목록)
+        self.capturing = {}
+        self.record_index = record_index
+
+
+class PriceStreamExtractor:
+    """
+    카테고리 페이지 HTML을 조각(chunk) 단위로 받아 가격 정보만 추출합니다.
+    BeautifulSoup(html.parser)처럼 닫는 태그는 가장 가까운 같은 이름의 열린 태그까지 닫고,
+    get_text(strip=True)처럼 텍스트 조각을 각각 공백 제거한 뒤 이어 붙입니다.
+    사용법:
+        extractor = PriceStreamExtractor()
+        for chunk in chunks:
+            extractor.feed(chunk)
+        records = extractor.close()
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._raw_tag = None
+        self._started = False
+        self._finished = False
+        self._stack = []
+        self._list_depth = None
+        self._items = []
+        self._records = []
+
+    def feed(self, chunk):
+        if self._finished:
+            return
+        self._buffer += chunk
+        self._process(final=False)
+
+    def close(self):
+        if not self._finished:
+            self._process(final=True)
+        self._finished = True
+        timestamp = datetime.now().isoformat()
+        return [self._to_record(matches, timestamp) for matches in self._records]
+
+    # -- 토큰 처리 ---------------------------------------------------------
+
+    def _find_list_start(self, final):
+        """
+        id="ty_thmb_view" 요소의 시작 위치를 찾습니다. 그 전까지는 토큰화하지 않고,
+        script/style/주석 안에 들어 있는 같은 문자열은 건너뜁니다.
+        """
+        buffer = self._buffer
+        position = 0
+        while True:
+            if self._raw_tag is not None:
+                end_match = RAW_TEXT_END_PATTERNS[self._raw_tag].search(buffer, position)
+                if end_match is None:
+                    # 닫는 태그가 조각 경계에 걸칠 수 있으므로 끝부분만 남깁니다.
+                    self._buffer = "" if final else buffer[-16:]
+                    return False
+                self._raw_tag = None
+                position = end_match.end()
+                continue
+
+            match = PRE_LIST_PATTERN.search(buffer, position)
+            if match is None:
+                # 다음 조각과 이어질 수 있는 마지막 태그부터만 남깁니다.
+                keep_from = buffer.rfind("<", position)
+                self._buffer = "" if final or keep_from < 0 else buffer[keep_from:]
+                return False
+            if match.group(1):
+                self._raw_tag = match.group(1).lower()
+                position = match.end()
+                continue
+            if match.group(0) == "<!--":
+                comment_end = buffer.find("-->", match.end())
+                if comment_end < 0:
+                    self._buffer = "" if final else buffer[match.start():]
+                    return False
+                position = comment_end + 3
+                continue
+
+            tag_start = buffer.rfind("<", position, match.start())
+            tag_match = TOKEN_PATTERN.match(buffer, tag_start) if tag_start >= 0 else None
+            if tag_match is not None and tag_match.group(0) == "<" and not final:
+                # 태그가 아직 다 도착하지 않았습니다.
+                self._buffer = buffer[tag_start:]
+                return False
+            if (
+                tag_match is None
+                or tag_match.group(2) is None
+                or tag_match.end() <= match.start()
+            ):
+                position = match.end()
+                continue
+            if self._parse_attributes(tag_match.group(3)).get("id") == LIST_ID:
+                self._buffer = buffer[tag_start:]
+                self._started = True
+                self._stack = []
+                self._list_depth = None
+                return True
+            position = match.end()
+
+    def _process(self, final):
+        while not self._finished:
+            if not self._started and not self._find_list_start(final):
+                return
+            self._tokenize(final)
+            if self._started or self._finished:
+                return
+            # #ty_thmb_view가 ul 없이 닫혔으면 남은 부분에서 다시 찾습니다.
+
+    def _tokenize(self, final):
+        buffer = self._buffer
+        length = len(buffer)
+        position = 0
+        while position < length and self._started and not self._finished:
+            if self._raw_tag is not None:
+                end_match = RAW_TEXT_END_PATTERNS[self._raw_tag].search(buffer, position)
+                if end_match is None:
+                    if not final:
+                        break
+                    self._handle_text(buffer[position:])
+                    position = length
+                    break
+                self._handle_text(buffer[position:end_match.start()])
+                self._raw_tag = None
+                position = end_match.start()
+                continue
+
+            match = TOKEN_PATTERN.match(buffer, position)
+            token = match.group(0)
+            if not final:
+                if token == "<" and INCOMPLETE_TAG_PATTERN.match(buffer, position):
+                    # 아직 '>'가 도착하지 않은 태그입니다.
+                    break
+                if match.end() == length and not token.startswith("<"):
+                    # 끝에 걸친 텍스트는 다음 조각과 합쳐서 처리합니다.
+                    break
+            position = match.end()
+            end_tag, start_tag = match.group(1), match.group(2)
+            if start_tag is not None:
+                self._handle_start(start_tag.lower(), match.group(3))
+            elif end_tag is not None:
+                self._handle_end(end_tag.lower())
+            elif token == "<" or not token.startswith("<"):
+                self._handle_text(token)
+        self._buffer = "" if self._finished else buffer[position:]
+
+    @staticmethod
+    def _parse_attributes(attribute_text):
+        attributes = {}
+        for name, double, single, bare in ATTRIBUTE_PATTERN.findall(attribute_text or ""):
+            name = name.lower()
+            if name not in attributes:
+                attributes[name] = html.unescape(double or single or bare)
+        return attributes
+
+    # -- 요소 스택 --------------------------------------------------------------
+
+    def _handle_start(self, tag, attribute_text):
+        attributes = self._parse_attributes(attribute_text)
+        parent = self._stack[-1] if self._stack else None
+        index = 1
+        if parent is not None:
+            parent.child_count += 1
+            index = parent.child_count
+        frame = _Frame(tag, frozenset(attributes.get("class", "").split()), index)
+        is_void = tag in VOID_TAGS or attribute_text.rstrip().endswith("/")
+
+        self._stack.append(frame)
+        depth = len(self._stack) - 1
+        if self._list_depth is None:
+            if depth == 1 and tag == "ul":
+                self._list_depth = depth
+        elif depth > self._list_depth:
+            candidates = SELECTORS_BY_TAG.get(tag)
+            if candidates:
+                for item in self._items:
+                    self._match_selectors(item, candidates, attributes)
+            if tag == "li":
+                self._items.append(_ItemState(depth, len(self._records)))
+                self._records.append(None)
+
+        if is_void:
+            self._pop_to(len(self._stack) - 1)
+        elif tag in RAW_TEXT_TAGS:
+            self._raw_tag = tag
+
+    def _handle_end(self, tag):
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth].tag == tag:
+                self._pop_to(depth)
+                return
+        # 열린 적 없는 태그의 닫는 태그는 무시합니다.
+
+    def _pop_to(self, depth):
+        """ 스택에서 depth 위치의 요소와 그 안쪽 요소들을 닫습니다. """
+        while len(self._stack) > depth:
+            closing_depth = len(self._stack) - 1
+            for item in self._items:
+                for key, (capture_depth, parts) in list(item.capturing.items()):
+                    if capture_depth == closing_depth:
+                        item.matches[key] = ("text", "".join(parts))
+                        del item.capturing[key]
+            while self._items and self._items[-1].depth == closing_depth:
+                item = self._items.pop()
+                self._records[item.record_index] = item.matches
+            self._stack.pop()
+            if self._list_depth is not None and closing_depth == self._list_depth:
+                # 첫 번째 상품 목록(#ty_thmb_view > ul)만 사용합니다.
+                self._finished = True
+            elif closing_depth == 0:
+                # #ty_thmb_view 안에 ul이 없었습니다. 다음 #ty_thmb_view를 찾습니다.
+                self._started = False
+
+    def _handle_text(self, text):
+        if not any(item.capturing for item in self._items):
+            return
+        if any(frame.tag in NON_TEXT_TAGS for frame in self._stack):
+            return
+        stripped = html.unescape(text).strip()
+        if not stripped:
+            return
+        for item in self._items:
+            for _, parts in item.capturing.values():
+                parts.append(stripped)
+
+    def _match_selectors(self, item, candidates, attributes):
+        stack = self._stack
+        for key, compounds in candidates:
+            if key in item.matches or key in item.capturing:
+                continue
+            count = len(compounds)
+            # 첫 번째 요소는 <li> 안쪽에 있어야 합니다.
+            if len(stack) - count <= item.depth:
+                continue
+            matched = True
+            for offset, (tag, classes, nth) in enumerate(compounds):
+                frame = stack[len(stack) - count + offset]
+                if (
+                    (tag is not None and frame.tag != tag)
+                    or not classes <= frame.classes
+                    or (nth is not None and frame.index != nth)
+                ):
+                    matched = False
+                    break
+            if not matched:
+                continue
+            if key in TEXT_SELECTOR_KEYS:
+                item.capturing[key] = (len(stack) - 1, [])
+            else:
+                item.matches[key] = ("attributes", attributes)
+
+    # -- 결과 ---------------------------------------------------------------
+
+    @staticmethod
+    def _to_record(matches, timestamp):
+        matches = matches or {}
+
+        def text_of(*keys):
+            for key in keys:
+                if key in matches:
+                    return _clean_price(matches[key][1])
+            return ""
+
+        raw_url = None
+        if "link" in matches:
+            raw_url = matches["link"][1].get("href")
+        if raw_url is None and "link_alt" in matches:
+            raw_url = matches["link_alt"][1].get("href")
+        product_address = _absolute_url(raw_url) if raw_url is not None else ""
+
+        return {
+            "id": _item_id_from_url(product_address),
+            "original_price": text_of("original_price", "original_price_alt"),
+            "selling_price": text_of("selling_price", "selling_price_alt"),
+            "quantity": matches["quantity"][1] if "quantity" in matches else "",
+            "out_of_stock": "Y" if "sold_out" in matches else "N",
+            "last_updated": timestamp,
+        }
+
+
+def extract_prices(html_content):
+    """
+    카테고리 페이지에서 가격 정보(PRICE_FIELDS)만 DOM 없이 추출합니다.
+    Args:
+        html_content (str 또는 iterable): 전체 HTML 문자열 또는 HTML 조각들입니다.
+    """
+    extractor = PriceStreamExtractor()
+    if isinstance(html_content, str):
+        extractor.feed(html_content)
+    else:
+        for chunk in html_content:
+            extractor.feed(chunk)
+    return extractor.close()
+
+
+def cross_check(html_content, records=None):
+    """
+    스트리밍 추출 결과를 전체 파서 결과와 비교합니다. (last_updated 제외)
+    Returns:
+        list: 차이 목록 [(상품 순번, 필드, 전체 파서 값, 스트리밍 값)]
+    """
+    if records is None:
+        records = extract_prices(html_content)
+    expected = project_products(scrape_emart_category_page(html_content, ""), PRICE_FIELDS)
+    diffs = []
+    if len(expected) != len(records):
+        diffs.append((None, "count", len(expected), len(records)))
+    for index, (want, got) in enumerate(zip(expected, records)):
+        for field in PRICE_FIELDS:
+            if field != "last_updated" and want[field] != got[field]:
+                diffs.append((index, field, want[field], got[field]))
+    return diffs
+
+
+def scrape_price_page(html_content, category_name):
+    """
+    가격 작업용 페이지 파서입니다. (크롤링 엔진용)
+    EMART_PRICE_CROSSCHECK_RATE 비율(기본 0.05)의 페이지는 전체 파서로도 파싱해 비교하고,
+    차이가 있으면 경고를 출력한 뒤 전체 파서 결과를 사용합니다.
+    """
+    records = extract_prices(html_content)
+    sample_rate = float(os.environ.get("EMART_PRICE_CROSSCHECK_RATE", 0.05))
+    if sample_rate > 0 and random.random() < sample_rate:
+        diffs = cross_check(html_content, records)
+        if diffs:
+            print(
+                f"경고: '{category_name}' 페이지의 스트리밍 가격 추출 결과가 전체 파서와 {len(diffs)}건 다릅니다. 전체 파서 결과를 사용합니다."
+            )
+            for diff in diffs[:5]:
+                print(f"    - {diff}")
+            return project_products(
+                scrape_emart_category_page(html_content, category_name), PRICE_FIELDS
+            )
+    return records
+
+
+if __name__ == "__main__":
+    import sys
+
+    # 사용법: python emart_price_stream.py <HTML 파일> ...  (전체 파서와 결과 비교)
+    all_equal = True
+    for path in sys.argv[1:]:
+        with open(path, "r", encoding="utf-8") as f:
+            diffs = cross_check(f.read())
+        all_equal = all_equal and not diffs
+        print(f"[{'일치' if not diffs else '불일치'}] {path} {diffs[:10] if diffs else ''}")
+    sys.exit(0 if all_equal else 1)
@@ -2,12 +2,18 @@
 
 import firebase_admin
 from firebase_admin import credentials, firestore
-import json
 import os
-import glob
 import sys
 import requests
+from concurrent.futures import ThreadPoolExecutor
+import http_client
 from dotenv import load_dotenv
+from firestore_bulk import BulkWriter, get_documents, read_chunk_size_from_env
+from firestore_metrics import metered_client
+from jsonl_store import JsonlWriter, iter_records, list_result_files
+from price_history import last_price_from_doc, record_price_change
+from product_dedup import SqliteProductDeduplicator
+from upload_state import open_state_store, product_fingerprint
 
 def initialize_firebase():
     """ Firebase Admin SDK를 초기화합니다. """
@@ -24,165 +30,397 @@ def get_db():
     """ Firestore 클라이언트 인스턴스를 반환합니다. """
     return firestore.client()
 
-def update_price_history(db, product_id, out_of_stock, quantity, last_updated, price_info):
+def _chunks(records, size):
+    """ 기록을 size개씩 묶어 돌려줍니다. """
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def update_price_history(writer, db, last_price, product_id, out_of_stock, quantity, last_updated, price_info):
     """
-    가격을 비교하여, 변경 시에만 price_history를 업데이트하고 상태를 반환합니다.
+    마지막 가격 기록(last_price)과 비교하여, 변경 시에만 월별 가격 이력 버킷에 기록을 추가하는 쓰기 작업을
+    writer에 넣고 상태를 반환합니다. (price_history.py)
     - 'updated': 가격이 변경되어 history가 추가됨
     - 'skipped': 가격이 동일하여 history는 추가되지 않음 (상위 필드는 갱신됨)
     """
-    price_ref = db.collection("emart_price").document(product_id)
-    
-    try:
-        doc = price_ref.get()
-        price_history = doc.to_dict().get("price_history", []) if doc.exists else []
-
-        price_has_changed = True
-        if price_history:
-            last_record = price_history[-1]
-            if (last_record.get("original_price") == price_info.get("original_price") and
-                last_record.get("selling_price") == price_info.get("selling_price")):
-                price_has_changed = False
-
-        top_level_update_data = {
-            "id": product_id, "out_of_stock": out_of_stock,
-            "quantity": quantity, "last_updated": last_updated,
-        }
+    price_has_changed = True
+    if last_price:
+        if (last_price.get("original_price") == price_info.get("original_price") and
+            last_price.get("selling_price") == price_info.get("selling_price")):
+            price_has_changed = False
+
+    top_level_update_data = {
+        "id": product_id, "out_of_stock": out_of_stock,
+        "quantity": quantity, "last_updated": last_updated,
+    }
+
+    if price_has_changed:
+        record_price_change(writer, db, product_id, price_info, top_level_update_data)
+        return "updated"
+    else:
+        writer.set(db.collection("emart_price").document(product_id), top_level_update_data, merge=True)
+        return "skipped"
+
+def _update_product(writer, product_ref, data, created_in_run):
+    """ 기존 상품 문서를 갱신합니다. 이번 실행에서 만든 문서는 생성 배치보다 먼저 커밋되어도 되도록 병합해서 씁니다. """
+    if created_in_run:
+        writer.set(product_ref, data, merge=True)
+    else:
+        writer.update(product_ref, data)
+
+def beacon_for_directory(directory_path):
+    """ 결과 디렉토리에 따라 올릴 컬렉션을 정합니다. (1: 가격과 상품, 2: 가격만, 3: 상품만) """
+    return 1 if directory_path == "result_json" else 2 if directory_path == "result_price_json" else 3
+
+class FirestoreUploadSession:
+    """
+    상품 기록을 Firestore의 emart_price, emart_product 컬렉션에 올리는 한 번의 업로드 작업입니다.
+    기록은 EMART_FIRESTORE_READ_CHUNK(기본 300)개씩 묶어 기존 문서를 한 번에 조회(get_all)하고,
+    쓰기 작업은 500개 단위 배치로 묶어 병렬로 커밋합니다. (firestore_bulk.BulkWriter)
+    로컬 업로드 상태 저장소(upload_state.py)에 있는 상품은 Firestore를 읽지 않고 변경 여부를 판단합니다.
+    Args:
+        db: Firestore 클라이언트입니다.
+        beacon (int): 1이면 가격과 상품, 2면 가격만, 3이면 상품 정보만 올립니다.
+    """
+
+    def __init__(self, db, beacon):
+        self.db = db
+        self.beacon = beacon
+
+        # --- [추가] 상세 카운터 초기화 ---
+        self.price_updated_count = 0
+        self.price_skipped_count = 0
+        self.product_new_count = 0
+        self.product_updated_count = 0
+        self.product_skipped_count = 0
+        self.firestore_read_count = 0
+
+        # 이번 실행에서 조회했거나 쓴 문서의 상태입니다. 같은 상품이 여러 카테고리에 있어도
+        # 앞서 쓴 내용을 기준으로 비교하도록, 쓰기 작업을 넣을 때마다 함께 갱신합니다.
+        # (ID -> 마지막 가격 기록 / 상품 정보 지문, 문서가 없으면 None)
+        self.known_prices = {}
+        self.known_products = {}
+        # 이번 실행에서 새로 만든 상품 문서 (배치는 병렬로 커밋되므로 이후 변경은 병합해서 씁니다)
+        self.created_product_ids = set()
+        self.product_collection = db.collection("emart_product")
+        self.read_chunk_size = read_chunk_size_from_env()
+        self.state_store = open_state_store()
+        self.writer = BulkWriter(db)
+
+        # 마지막 commit() 이후 쓴 상태 (커밋이 확인되면 상태 저장소에 기록)
+        self._uploaded_prices = {}
+        self._uploaded_fingerprints = {}
+        self._failed_before = 0
+
+    def _prefetch(self, product_ids):
+        """ 처음 보는 상품의 기존 문서를 한 번에 조회합니다. (상태 저장소에 있는 상품은 읽지 않습니다) """
+        if self.beacon in (1, 2):
+            missing = [pid for pid in product_ids if pid not in self.known_prices]
+            if self.state_store and missing:
+                self.known_prices.update(self.state_store.get_prices(missing))
+                missing = [pid for pid in missing if pid not in self.known_prices]
+            self.firestore_read_count += len(set(missing))
+            price_docs = get_documents(
+                self.db, "emart_price", missing, field_paths=["current_price", "price_history"]
+            )
+            for pid, data in price_docs.items():
+                self.known_prices[pid] = last_price_from_doc(data)
+        if self.beacon in (1, 3):
+            missing = [pid for pid in product_ids if pid not in self.known_products]
+            if self.state_store and missing:
+                self.known_products.update(self.state_store.get_product_fingerprints(missing))
+                missing = [pid for pid in missing if pid not in self.known_products]
+            self.firestore_read_count += len(set(missing))
+            for pid, data in get_documents(self.db, "emart_product", missing).items():
+                self.known_products[pid] = (
+                    product_fingerprint(data.get("product_name"), data.get("image_url"))
+                    if data is not None else None
+                )
+
+    def upload_records(self, records):
+        """ 상품 기록들의 쓰기 작업을 넣습니다. 커밋이 끝났는지 확인하려면 commit()을 호출하세요. """
+        for chunk in _chunks(records, self.read_chunk_size):
+            products = [product for product in chunk if product.get("id")]
+            self._prefetch([product["id"] for product in products])
+            for product in products:
+                self._upload_product(product)
+
+    def _upload_product(self, product):
+        product_id = product["id"]
+
+        # --- 가격 정보 처리 및 카운팅 ---
+        if self.beacon in (1, 2):
+            price_info = {
+                "original_price": product.get("original_price"),
+                "selling_price": product.get("selling_price"),
+                "last_updated": product.get("last_updated"),
+            }
+            result = update_price_history(
+                self.writer, self.db, self.known_prices.get(product_id), product_id,
+                product.get("out_of_stock"), product.get("quantity"),
+                product.get("last_updated"), price_info
+            )
+            self.known_prices[product_id] = price_info
+            self._uploaded_prices[product_id] = price_info
+            if result == "updated":
+                self.price_updated_count += 1
+                print(f"가격 ID '{product_id}'가 업데이트 되었습니다 [{self.price_updated_count}]")
+            elif result == "skipped":
+                self.price_skipped_count += 1
+                print(f"가격 ID '{product_id}'가 패스 되었습니다 [{self.price_skipped_count}]")
+
+        # --- 상품 정보 처리 및 카운팅 ---
+        if self.beacon in (1, 3):
+            product_ref = self.product_collection.document(product_id)
+            existing_fingerprint = self.known_products.get(product_id)
+            fingerprint = product_fingerprint(product.get("product_name"), product.get("image_url"))
+            created_in_run = product_id in self.created_product_ids
+
+            if existing_fingerprint is not None:
+                if existing_fingerprint != fingerprint:
+                    update_data = {
+                        "product_name": product.get("product_name"),
+                        "image_url": product.get("image_url"),
+                        "last_updated": product.get("last_updated"),
+                        "is_emb": "R"
+                    }
+                    if product.get("categories"):
+                        update_data["categories"] = product["categories"]
+                    _update_product(self.writer, product_ref, update_data, created_in_run)
+                    self.product_updated_count += 1
+                    print(f"상품 ID '{product_id}'가 업데이트 되었습니다 [{self.product_updated_count}]")
+                else:
+                    update_data = {"last_updated": product.get("last_updated")}
+                    if product.get("categories"):
+                        update_data["categories"] = product["categories"]
+                    _update_product(self.writer, product_ref, update_data, created_in_run)
+                    self.product_skipped_count += 1
+                    print(f"상품 ID '{product_id}'가 패스 되었습니다 [{self.product_skipped_count}]")
+            else:
+                product_data = {
+                    k: v for k, v in product.items() 
+                    if k in ["id", "category", "categories", "image_url", "last_updated", "product_address", "product_name"]
+                }
+                product_data["is_emb"] = "R"
+                self.writer.set(product_ref, product_data)
+                self.created_product_ids.add(product_id)
+                self.product_new_count += 1
+                print(
+                    f"상품 ID '{product_id}'가 새로 생성 되었습니다 [{self.product_new_count}]"
+                )
+            self.known_products[product_id] = fingerprint
+            self._uploaded_fingerprints[product_id] = fingerprint
 
-        if price_has_changed:
-            price_history.append(price_info)
-            top_level_update_data["price_history"] = price_history
-            price_ref.set(top_level_update_data, merge=True)
-            return "updated"
+    def update_product_categories(self, categories_by_id):
+        """ 상품 문서의 카테고리 목록(categories)과 대표 카테고리(category)를 고칩니다. """
+        if self.beacon not in (1, 3):
+            return
+        for product_id, categories in categories_by_id.items():
+            self.writer.set(
+                self.product_collection.document(product_id),
+                {"category": categories[0], "categories": categories},
+                merge=True,
+            )
+
+    def send_pending(self):
+        """ 배치가 가득 차지 않았어도 쌓인 쓰기 작업을 커밋하기 시작합니다. (기다리지 않음) """
+        self.writer.flush(wait_done=False)
+
+    def commit(self):
+        """
+        지금까지 넣은 쓰기 작업이 모두 커밋될 때까지 기다리고, 성공하면 상태 저장소에 기록합니다.
+        Returns:
+            bool: 마지막 commit() 이후의 쓰기 작업이 모두 성공했으면 True
+        """
+        self.writer.flush()
+        uploaded_ids = set(self._uploaded_prices) | set(self._uploaded_fingerprints)
+        succeeded = self.writer.failed_count == self._failed_before
+        if succeeded:
+            if self.state_store:
+                self.state_store.record_prices(self._uploaded_prices)
+                self.state_store.record_product_fingerprints(self._uploaded_fingerprints)
         else:
-            price_ref.set(top_level_update_data, merge=True)
-            return "skipped"
+            # 어떤 쓰기가 반영됐는지 알 수 없으므로 다음 업로드 때 Firestore에서 다시 읽습니다.
+            for pid in uploaded_ids:
+                self.known_prices.pop(pid, None)
+                self.known_products.pop(pid, None)
+            if self.state_store:
+                self.state_store.forget(uploaded_ids)
+        self._uploaded_prices = {}
+        self._uploaded_fingerprints = {}
+        self._failed_before = self.writer.failed_count
+        return succeeded
+
+    def close(self):
+        self.writer.close()
+        if self.state_store:
+            self.state_store.close()
+
+    def counters(self):
+        """ 요약 카운터 (여러 세션의 결과를 더할 때 사용합니다) """
+        return {
+            "price_updated": self.price_updated_count,
+            "price_skipped": self.price_skipped_count,
+            "product_new": self.product_new_count,
+            "product_updated": self.product_updated_count,
+            "product_skipped": self.product_skipped_count,
+            "write_committed": self.writer.committed_count,
+            "write_failed": self.writer.failed_count,
+            "firestore_read": self.firestore_read_count,
+        }
+
+    def print_summary(self):
+        print_upload_summary(self.beacon, self.counters())
 
+def print_upload_summary(beacon, counters):
+    # --- [추가] 최종 결과 상세 출력 ---
+    print("\n===== Firestore 업로드 최종 결과 =====")
+    if beacon in (1, 2):
+        print("--- 가격 정보 (emart_price) ---")
+        print(f"  - 가격 변경되어 history 추가: {counters['price_updated']}개")
+        print(f"  - 가격 동일하여 history 생략: {counters['price_skipped']}개")
+    if beacon in (1, 3):
+        print("--- 상품 정보 (emart_product) ---")
+        print(f"  - 신규 추가된 상품: {counters['product_new']}개")
+        print(f"  - 이름/이미지 변경된 상품: {counters['product_updated']}개")
+        print(f"  - 변경 없어 시간만 갱신된 상품: {counters['product_skipped']}개")
+    print(f"--- Firestore 쓰기: 커밋 {counters['write_committed']}개, 실패 {counters['write_failed']}개 ---")
+    print(f"--- Firestore 문서 읽기: {counters['firestore_read']}개 (나머지는 로컬 상태 저장소 사용) ---")
+    print("======================================")
+
+def upload_workers_from_env():
+    """ 카테고리를 동시에 올릴 작업 스레드 수입니다. (.env의 EMART_UPLOAD_WORKERS, 기본 4) """
+    return max(1, int(os.environ.get("EMART_UPLOAD_WORKERS", 4)))
+
+def _upload_category_group(db, beacon, category, records):
+    """
+    한 카테고리(합친 기록의 우선 카테고리)의 상품을 자기 세션으로 올립니다.
+    상태 저장소의 SQLite 연결은 스레드마다 따로 써야 하므로 세션을 작업 스레드 안에서 만듭니다.
+    Returns:
+        tuple: (모든 쓰기 작업 성공 여부, 요약 카운터)
+    """
+    session = FirestoreUploadSession(db, beacon)
+    try:
+        session.upload_records(records)
+        succeeded = session.commit()
     except Exception as e:
-        print(f"상품 ID '{product_id}'의 가격 업데이트 중 오류 발생: {e}")
-        return "error"
+        print(f"'{category}' 카테고리 업로드 중 오류가 발생했습니다: {e}")
+        succeeded = False
+    finally:
+        session.close()
+    if not succeeded:
+        print(f"경고: '{category}' 카테고리의 일부 쓰기 작업이 실패했습니다.")
+    return succeeded, session.counters()
+
+def notify_embedding_server():
+    """ 업로드가 끝났음을 임베딩 서버에 알립니다. """
+    print("\n>> 모든 업로드 작업 완료. 임베딩 서버에 시작 신호를 보냅니다...")
+    load_dotenv()
+    emb_server_url = os.environ.get("EMB_SERVER")
+    if emb_server_url:
+        try:
+            response = http_client.get(f"{emb_server_url}", timeout=10)
+            response.raise_for_status()
+            print(f"임베딩 서버에 성공적으로 신호를 보냈습니다. (상태 코드: {response.status_code})")
+        except requests.exceptions.RequestException as e:
+            print(f"오류: 임베딩 서버({emb_server_url})에 연결할 수 없습니다: {e}")
+    else:
+        print("경고: .env 파일에 EMB_SERVER 환경변수가 설정되지 않았습니다.")
+
+def _keep_uncommitted_records(json_file, failed_ids):
+    """ 결과 파일에서 커밋하지 못한 상품의 기록만 남깁니다. (다음 업로드는 그 상품만 다시 올림) """
+    kept_path = os.path.splitext(json_file)[0] + ".jsonl"
+    with JsonlWriter(kept_path) as writer:
+        writer.write_records(
+            record for record in iter_records(json_file) if record.get("id") in failed_ids
+        )
+    return kept_path
 
 def upload_json_to_firestore(directory_path):
-    """ 지정된 디렉토리의 모든 JSON 파일을 Firestore에 업로드합니다. """
+    """
+    지정된 디렉토리의 모든 결과 파일(.jsonl, 이전 형식 .json)을 Firestore에 업로드합니다.
+    여러 카테고리 파일에 나온 상품은 먼저 상품 ID별로 하나로 합친 뒤(product_dedup.py),
+    우선 카테고리별로 나눠 EMART_UPLOAD_WORKERS개 스레드에서 각자의 FirestoreUploadSession으로 올립니다.
+    합친 기록은 임시 SQLite 파일에 두고 한 줄씩 읽으므로 결과 파일이 많아도 메모리 사용량이 일정합니다.
+    쓰기 속도는 모든 스레드가 함께 쓰는 예산(firestore_bulk.get_write_budget)으로 제한하고,
+    카테고리별 결과는 하나의 요약으로 합칩니다. 파일에 나온 상품이 모두 커밋된 파일은 지우고,
+    커밋하지 못한 상품이 있는 파일에는 그 상품의 기록만 남깁니다.
+    """
     try:
         initialize_firebase()
     except Exception as e:
         return {"status": "error", "error": str(e)}
 
-    db = get_db()
-    beacon = 1 if directory_path == "result_json" else 2 if directory_path == "result_price_json" else 3
+    # 읽기/쓰기 수는 작업이 끝나면 firestore_reports/에 보고서로 남깁니다.
+    db = metered_client(get_db(), f"upload_{os.path.basename(os.path.normpath(directory_path))}")
 
     try:
-        json_files = glob.glob(os.path.join(directory_path, "*.json"))
+        json_files = list_result_files(directory_path)
         if not json_files:
-            return {"status": "warning", "message": f"'{directory_path}' 폴더에 JSON 파일이 없습니다."}
+            return {"status": "warning", "message": f"'{directory_path}' 폴더에 결과 파일이 없습니다."}
 
-        # --- [추가] 상세 카운터 초기화 ---
-        price_updated_count = 0
-        price_skipped_count = 0
-        product_new_count = 0
-        product_updated_count = 0
-        product_skipped_count = 0
-
-        for json_file in json_files:
-            with open(json_file, "r", encoding="utf-8") as f:
-                products = json.load(f)
+        with SqliteProductDeduplicator() as dedup:
+            # 파일 이름이 카테고리 이름입니다. (<카테고리>.jsonl)
+            for json_file in json_files:
+                category = os.path.splitext(os.path.basename(json_file))[0]
+                for record in iter_records(json_file):
+                    dedup.add(record, category, source=json_file)
+                dedup.flush()
+            print(
+                f"\n{len(json_files)}개 파일의 {dedup.record_count}개 기록에서 카테고리 간 중복 "
+                f"{dedup.duplicate_count}개를 합쳐 {dedup.record_count - dedup.duplicate_count}개 상품을 업로드합니다."
+            )
 
-            print(f"\n파일 '{json_file}'의 데이터를 Firestore에 업로드합니다.")
+            # 합친 기록을 우선 카테고리별로 나눠 작업 스레드에서 동시에 올립니다.
+            # 상품 ID는 한 묶음에만 들어가므로 스레드끼리 같은 문서를 쓰지 않습니다.
+            groups = list(dedup.group_sizes())
+            beacon = beacon_for_directory(directory_path)
+            workers = min(upload_workers_from_env(), len(groups)) or 1
+            print(f"{len(groups)}개 카테고리를 {workers}개 작업 스레드로 업로드합니다.")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(
+                    lambda group: _upload_category_group(db, beacon, group, dedup.records(group)), groups
+                ))
 
-            for product in products:
-                product_id = product.get("id")
-                if not product_id:
-                    continue
-
-                # --- 가격 정보 처리 및 카운팅 ---
-                if beacon in (1, 2):
-                    price_info = {
-                        "original_price": product.get("original_price"),
-                        "selling_price": product.get("selling_price"),
-                        "last_updated": product.get("last_updated"),
-                    }
-                    result = update_price_history(
-                        db, product_id, product.get("out_of_stock"),
-                        product.get("quantity"), product.get("last_updated"), price_info
-                    )
-                    if result == "updated":
-                        price_updated_count += 1
-                        print(f"가격 ID '{product_id}'가 업데이트 되었습니다 [{price_updated_count}]")
-                    elif result == "skipped":
-                        price_skipped_count += 1
-                        print(f"가격 ID '{product_id}'가 패스 되었습니다 [{price_skipped_count}]")
-
-                # --- 상품 정보 처리 및 카운팅 ---
-                if beacon in (1, 3):
-                    product_ref = db.collection("emart_product").document(product_id)
-                    doc = product_ref.get()
-
-                    if doc.exists:
-                        existing_data = doc.to_dict()
-                        if (existing_data.get("product_name") != product.get("product_name") or
-                            existing_data.get("image_url") != product.get("image_url")):
-                            update_data = {
-                                "product_name": product.get("product_name"),
-                                "image_url": product.get("image_url"),
-                                "last_updated": product.get("last_updated"),
-                                "is_emb": "R"
-                            }
-                            product_ref.update(update_data)
-                            product_updated_count += 1
-                            print(f"상품 ID '{product_id}'가 업데이트 되었습니다 [{product_updated_count}]")
-                        else:
-                            product_ref.update({"last_updated": product.get("last_updated")})
-                            product_skipped_count += 1
-                            print(f"상품 ID '{product_id}'가 패스 되었습니다 [{product_skipped_count}]")
+            counters = {}
+            for _, group_counters in results:
+                for key, value in group_counters.items():
+                    counters[key] = counters.get(key, 0) + value
+            failed_groups = [group for group, (succeeded, _) in zip(groups, results) if not succeeded]
+            failed_files = []
+            for json_file in json_files:
+                failed_ids = dedup.ids_in_groups(json_file, failed_groups) if failed_groups else set()
+                try:
+                    if failed_ids:
+                        failed_files.append(_keep_uncommitted_records(json_file, failed_ids))
                     else:
-                        product_data = {
-                            k: v for k, v in product.items() 
-                            if k in ["id", "category", "image_url", "last_updated", "product_address", "product_name"]
-                        }
-                        product_data["is_emb"] = "R"
-                        product_ref.set(product_data)
-                        product_new_count += 1
-                        print(
-                            f"상품 ID '{product_id}'가 새로 생성 되었습니다 [{product_new_count}]"
-                        )
-
-            try:
-                os.remove(json_file)
-            except OSError as e:
-                print(f"파일 삭제 중 오류 발생: {e}")
-
-        # --- [추가] 최종 결과 상세 출력 ---
-        print("\n===== Firestore 업로드 최종 결과 =====")
-        if beacon in (1, 2):
-            print("--- 가격 정보 (emart_price) ---")
-            print(f"  - 가격 변경되어 history 추가: {price_updated_count}개")
-            print(f"  - 가격 동일하여 history 생략: {price_skipped_count}개")
-        if beacon in (1, 3):
-            print("--- 상품 정보 (emart_product) ---")
-            print(f"  - 신규 추가된 상품: {product_new_count}개")
-            print(f"  - 이름/이미지 변경된 상품: {product_updated_count}개")
-            print(f"  - 변경 없어 시간만 갱신된 상품: {product_skipped_count}개")
-        print("======================================")
+                        os.remove(json_file)
+                except OSError as e:
+                    print(f"파일 정리 중 오류 발생: {e}")
+            if failed_files:
+                print(f"경고: 일부 쓰기 작업이 실패하여 {len(failed_files)}개 파일에 커밋하지 못한 상품을 남겨 둡니다.")
 
-        # 모든 파일 처리 후 임베딩 서버 호출
-        print("\n>> 모든 업로드 작업 완료. 임베딩 서버에 시작 신호를 보냅니다...")
-        load_dotenv()
-        emb_server_url = os.environ.get("EMB_SERVER")
-        if emb_server_url:
-            try:
-                response = requests.get(f"{emb_server_url}", timeout=10)
-                response.raise_for_status()
-                print(f"임베딩 서버에 성공적으로 신호를 보냈습니다. (상태 코드: {response.status_code})")
-            except requests.exceptions.RequestException as e:
-                print(f"오류: 임베딩 서버({emb_server_url})에 연결할 수 없습니다: {e}")
-        else:
-            print("경고: .env 파일에 EMB_SERVER 환경변수가 설정되지 않았습니다.")
+        print_upload_summary(beacon, counters)
+        if failed_files:
+            return {
+                "status": "error",
+                "error": f"{counters.get('write_failed', 0)}개 쓰기 작업이 실패했습니다. 다시 업로드할 파일: {failed_files}",
+            }
 
+        # 모든 파일 처리 후 임베딩 서버 호출
+        notify_embedding_server()
         return {"status": "success", "message": "All files uploaded successfully."}
 
     except Exception as e:
         print(f"Firestore 업로드 중 오류가 발생했습니다: {e}")
         return {"status": "error", "error": str(e)}
+    finally:
+        db.meter.finish()
 
 def upload_all_products_to_firebase():
     return upload_json_to_firestore("result_json")
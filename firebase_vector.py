@@ -1,6 +1,8 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
-import requests
+import http_client
+from firestore_bulk import scan_pages
+from firestore_metrics import metered_client
 import dotenv,os
 
 dotenv.load_dotenv()
@@ -10,22 +12,15 @@ cred = credentials.Certificate("repository/serviceAccountKey.json")
 firebase_admin.initialize_app(cred)
 
 # 2. Firestore 클라이언트 생성
-db = firestore.client()
+db = metered_client(firestore.client(), "firebase_vector")
 server = str(os.environ.get("EMB_SERVER"))
 
 rag_products_ref = db.collection("rag_products")
 batch_size = 500
-last_doc = None
 
 i=0
 
-while True:
-    query = rag_products_ref.limit(batch_size)
-    if last_doc:
-        query = query.start_after(last_doc)
-    docs = list(query.stream())
-    if not docs:
-        break
+for docs in scan_pages(rag_products_ref, page_size=batch_size):
     for doc in docs:
         i+=1
         if i>10 :
@@ -39,7 +34,7 @@ while True:
                 print(f"문서 {doc.id}에 벡터화할 문자열이 없습니다.")
                 continue
             try:
-                response = requests.post(f"{server}/string2vec", json={"query": string_for_vec})
+                response = http_client.post(f"{server}/string2vec", json={"query": string_for_vec})
                 response.raise_for_status()
                 embedding_vector = response.json().get("results")
                 if embedding_vector:
@@ -51,7 +46,7 @@ while True:
                 print(f"문서 {doc.id} 벡터화 실패: {e}")
         else:
             print(f"문서 {doc.id}에는 이미 embedding이 존재합니다.")
-    last_doc = docs[-1]
         
 
-print("batch 처리 및 벡터화 완료.")
\ No newline at end of file
+print("batch 처리 및 벡터화 완료.")
+db.meter.finish()
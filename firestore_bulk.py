@@ -0,0 +1,356 @@
+# firestore_bulk.py
+# Firestore 문서를 여러 개씩 읽고, 쓰기 작업을 500개 단위 배치로 묶어 병렬로 커밋하는 도구
+# 큰 컬렉션은 start_after 커서로 한 페이지씩 읽습니다. (scan_pages, iter_documents)
+
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from google.api_core import exceptions as api_exceptions
+from google.cloud.firestore_v1.field_path import FieldPath
+from google.cloud.firestore_v1.transforms import Increment
+
+from rate_limiter import AdaptiveRateLimiter
+
+# Firestore 배치 하나에 담을 수 있는 최대 쓰기 작업 수
+FIRESTORE_BATCH_LIMIT = 500
+
+# 중단된 스캔의 커서를 남기는 디렉토리
+CHECKPOINT_DIR = "scan_checkpoints"
+
+# 다시 시도하면 성공할 수 있는 오류
+RETRYABLE_ERRORS = (
+    api_exceptions.Aborted,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.InternalServerError,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.ServiceUnavailable,
+)
+# 클라이언트에서는 실패했어도 서버에서는 커밋됐을 수 있는 오류
+# (Increment처럼 두 번 적용하면 값이 바뀌는 작업이 든 배치는 이 오류에서 다시 시도하지 않습니다)
+AMBIGUOUS_ERRORS = (
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.InternalServerError,
+)
+
+
+def _has_increment(data):
+    """ 쓰기 데이터에 firestore.Increment 변환이 들어 있는지 확인합니다. """
+    if isinstance(data, Increment):
+        return True
+    if isinstance(data, dict):
+        return any(_has_increment(value) for value in data.values())
+    return False
+
+
+_write_budget = None
+_write_budget_lock = threading.Lock()
+
+
+def get_write_budget():
+    """
+    프로세스 안의 모든 BulkWriter가 함께 쓰는 쓰기 속도 예산(초당 쓰기 작업 수)입니다.
+    .env의 EMART_FIRESTORE_WRITE_RATE(기본 1000)로 정하며, 0이면 제한하지 않고 None을 돌려줍니다.
+    """
+    global _write_budget
+    with _write_budget_lock:
+        if _write_budget is None:
+            rate = float(os.environ.get("EMART_FIRESTORE_WRITE_RATE", 1000))
+            if rate <= 0:
+                return None
+            # 속도를 바꾸지 않는 고정 토큰 버킷으로 씁니다. (배치 하나만큼 모아둘 수 있음)
+            _write_budget = AdaptiveRateLimiter(
+                initial_rate=rate, min_rate=rate, max_rate=rate, burst=FIRESTORE_BATCH_LIMIT
+            )
+        return _write_budget
+
+
+def read_chunk_size_from_env():
+    """ 한 번에 읽을 문서 수입니다. (.env의 EMART_FIRESTORE_READ_CHUNK, 기본 300) """
+    return max(1, int(os.environ.get("EMART_FIRESTORE_READ_CHUNK", 300)))
+
+
+def scan_page_size_from_env():
+    """ 커서로 한 번에 읽을 문서 수입니다. (.env의 EMART_FIRESTORE_SCAN_PAGE_SIZE, 기본 500) """
+    return max(1, int(os.environ.get("EMART_FIRESTORE_SCAN_PAGE_SIZE", 500)))
+
+
+def cursor_after(snapshot, order_fields=()):
+    """
+    snapshot 다음 문서부터 읽기 위한 커서입니다. (order_fields 값들과 문서 ID 목록, JSON으로 저장할 수 있습니다)
+    order_fields는 스캔할 때 select로 함께 읽어야 합니다.
+    """
+    data = snapshot.to_dict() or {}
+    values = []
+    for field in order_fields:
+        value = data
+        for part in field.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        values.append(value)
+    return values + [snapshot.id]
+
+
+def scan_pages(query, order_fields=(), page_size=None, cursor=None, limit=None):
+    """
+    query를 order_fields와 문서 ID 순서로 정렬해 page_size(기본 EMART_FIRESTORE_SCAN_PAGE_SIZE)개씩
+    start_after 커서로 읽고, 페이지(스냅샷 목록)를 하나씩 돌려주는 생성기입니다.
+    한 번에 한 페이지만 메모리에 두므로 컬렉션 크기와 상관없이 메모리 사용량이 일정합니다.
+    페이지를 처리하는 동안 문서가 바뀌거나 지워져도 커서는 마지막 문서의 값으로 이어집니다.
+    Args:
+        order_fields (list): 정렬할 필드입니다. 범위 조건(<, >=)을 건 필드가 있으면 그 필드가 맨 앞이어야 합니다.
+        cursor (list): cursor_after()로 얻은 커서입니다. 주면 그 다음부터 읽습니다.
+        limit (int): 최대로 읽을 문서 수입니다. (생략하면 끝까지)
+    """
+    page_size = page_size or scan_page_size_from_env()
+    for field in order_fields:
+        query = query.order_by(field)
+    query = query.order_by(FieldPath.document_id())
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        page_query = query.limit(size)
+        if cursor is not None:
+            page_query = page_query.start_after(tuple(cursor))
+        page = list(page_query.stream())
+        if not page:
+            return
+        yield page
+        if len(page) < size:
+            return
+        cursor = cursor_after(page[-1], order_fields)
+        if remaining is not None:
+            remaining -= len(page)
+
+
+def iter_documents(query, order_fields=(), page_size=None, cursor=None, limit=None):
+    """ scan_pages의 페이지를 문서 하나씩 풀어 돌려주는 생성기입니다. """
+    for page in scan_pages(query, order_fields, page_size, cursor, limit):
+        yield from page
+
+
+class ScanCheckpoint:
+    """
+    긴 스캔의 커서를 '<CHECKPOINT_DIR>/<이름>.json'에 남겨, 중단된 뒤 다시 실행할 때 이어서 읽게 합니다.
+    페이지 처리가 끝날 때마다 save()하고, 스캔이 끝나면 clear()합니다.
+    """
+
+    def __init__(self, name, directory=CHECKPOINT_DIR):
+        self.path = os.path.join(directory, f"{name}.json")
+
+    def load(self):
+        """ 저장된 커서입니다. (없거나 읽지 못하면 None) """
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)["cursor"]
+        except (OSError, KeyError, json.JSONDecodeError) as e:
+            print(f"경고: 스캔 체크포인트 '{self.path}'을(를) 읽지 못해 처음부터 읽습니다: {e}")
+            return None
+
+    def save(self, cursor):
+        """ 커서를 임시 파일에 쓴 뒤 원자적으로 교체합니다. """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"cursor": cursor, "saved_at": time.time()}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def get_documents(db, collection, doc_ids, chunk_size=None, field_paths=None):
+    """
+    컬렉션의 여러 문서를 get_all로 chunk_size개씩 묶어 읽습니다.
+    field_paths를 주면 해당 필드만 읽습니다.
+    Returns:
+        dict: 문서 ID -> 문서 데이터 (없는 문서는 None)
+    """
+    chunk_size = chunk_size or read_chunk_size_from_env()
+    collection_ref = db.collection(collection)
+    doc_ids = list(dict.fromkeys(doc_ids))
+    documents = {}
+    for start in range(0, len(doc_ids), chunk_size):
+        refs = [collection_ref.document(doc_id) for doc_id in doc_ids[start:start + chunk_size]]
+        # get_all은 요청한 순서대로 돌려주지 않으므로 ID로 모읍니다.
+        for snapshot in db.get_all(refs, field_paths=field_paths):
+            documents[snapshot.id] = snapshot.to_dict() if snapshot.exists else None
+    return documents
+
+
+class BulkWriter:
+    """
+    set/update/delete 작업을 FIRESTORE_BATCH_LIMIT(500)개씩 WriteBatch로 묶어
+    스레드 풀에서 병렬로 커밋합니다. 일시적인 오류는 백오프하며 다시 시도하고,
+    끝내 실패한 배치의 작업 수는 failed_count에 더합니다.
+    Increment가 든 배치는 서버에서 커밋됐을 수도 있는 오류(AMBIGUOUS_ERRORS)면 두 번 더하지 않도록
+    다시 시도하지 않고 실패로 셉니다. (호출하는 쪽은 실패한 상품을 다음 실행에서 Firestore를 다시 읽어 비교합니다)
+    Args:
+        db: Firestore 클라이언트입니다.
+        threads (int): 동시에 커밋할 배치 수입니다. (기본값: .env의 EMART_FIRESTORE_WRITE_THREADS, 4)
+        batch_size (int): 배치 하나에 담을 작업 수입니다. (최대 500)
+        rate_budget (AdaptiveRateLimiter): 커밋 전에 작업 수만큼 토큰을 받을 속도 예산입니다.
+            (기본값: get_write_budget()의 프로세스 공유 예산)
+    """
+
+    def __init__(self, db, threads=None, batch_size=FIRESTORE_BATCH_LIMIT, rate_budget=None):
+        self.db = db
+        self.rate_budget = rate_budget or get_write_budget()
+        self.threads = threads or int(os.environ.get("EMART_FIRESTORE_WRITE_THREADS", 4))
+        self.batch_size = min(batch_size, FIRESTORE_BATCH_LIMIT)
+        self.max_attempts = int(os.environ.get("EMART_FIRESTORE_MAX_ATTEMPTS", 5))
+        self.committed_count = 0
+        self.failed_count = 0
+        # delete(label=...)로 표시한 작업 가운데 실패한 수 (표시 -> 작업 수)
+        self.failed_by_label = {}
+        self.errors = []
+        self._executor = ThreadPoolExecutor(max_workers=self.threads)
+        self._in_flight = set()
+        self._batch = db.batch()
+        self._batch_ops = 0
+        self._batch_has_increment = False
+        self._batch_labels = {}
+
+    def set(self, ref, data, merge=False):
+        self._batch.set(ref, data, merge=merge)
+        self._batch_has_increment = self._batch_has_increment or _has_increment(data)
+        self._added()
+
+    def update(self, ref, data):
+        self._batch.update(ref, data)
+        self._batch_has_increment = self._batch_has_increment or _has_increment(data)
+        self._added()
+
+    def delete(self, ref, label=None):
+        """ label을 주면 이 작업이 실패했을 때 failed_by_label[label]에 따로 셉니다. (같은 writer를 함께 쓸 때) """
+        self._batch.delete(ref)
+        if label is not None:
+            self._batch_labels[label] = self._batch_labels.get(label, 0) + 1
+        self._added()
+
+    def _added(self):
+        self._batch_ops += 1
+        if self._batch_ops >= self.batch_size:
+            self._submit()
+
+    def _submit(self):
+        if not self._batch_ops:
+            return
+        # 커밋을 기다리는 배치가 너무 많이 쌓이지 않도록, 스레드 수의 두 배를 넘으면 하나가 끝날 때까지 기다립니다.
+        while len(self._in_flight) >= self.threads * 2:
+            done, self._in_flight = wait(self._in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                self._collect(future)
+        future = self._executor.submit(
+            self._commit, self._batch, self._batch_ops, self._batch_has_increment
+        )
+        future.labels = self._batch_labels
+        self._in_flight.add(future)
+        self._batch = self.db.batch()
+        self._batch_ops = 0
+        self._batch_has_increment = False
+        self._batch_labels = {}
+
+    def _commit(self, batch, op_count, has_increment=False):
+        for attempt in range(1, self.max_attempts + 1):
+            if self.rate_budget is not None:
+                self.rate_budget.acquire(op_count)
+            try:
+                batch.commit()
+                return op_count, None
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_attempts:
+                    return op_count, e
+                if has_increment and isinstance(e, AMBIGUOUS_ERRORS):
+                    print(f"Firestore 배치 커밋 결과를 알 수 없어({e}), Increment가 두 번 더해지지 않도록 다시 시도하지 않습니다.")
+                    return op_count, e
+                delay = min(30.0, 2 ** (attempt - 1)) * (0.5 + random.random())
+                print(f"Firestore 배치 커밋 실패({e}), {delay:.1f}초 후 다시 시도합니다. ({attempt}/{self.max_attempts})")
+                time.sleep(delay)
+            except Exception as e:
+                return op_count, e
+
+    def _collect(self, future):
+        op_count, error = future.result()
+        if error is None:
+            self.committed_count += op_count
+        else:
+            self.failed_count += op_count
+            for label, count in future.labels.items():
+                self.failed_by_label[label] = self.failed_by_label.get(label, 0) + count
+            self.errors.append(error)
+            print(f"Firestore 배치 커밋 중 오류가 발생했습니다 ({op_count}개 작업): {error}")
+
+    def flush(self, wait_done=True):
+        """ 쌓인 작업을 모두 커밋하고 끝날 때까지 기다립니다. (wait_done=False면 커밋만 시작합니다) """
+        self._submit()
+        if not wait_done:
+            return
+        done, _ = wait(self._in_flight)
+        self._in_flight = set()
+        for future in done:
+            self._collect(future)
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+
+def bulk_delete(db, refs, subcollections=(), writer=None, chunk_size=None, list_threads=8):
+    """
+    문서들을 스트리밍으로 삭제합니다. refs를 chunk_size(기본 EMART_FIRESTORE_READ_CHUNK)개씩 나눠 처리하므로
+    한꺼번에 메모리에 올리지 않습니다. subcollections에 적은 하위 컬렉션의 문서도 함께 지우며,
+    하위 문서 목록은 list_threads개 스레드에서 동시에 읽습니다.
+    삭제는 BulkWriter로 500개씩 묶어 병렬로 커밋하고, 경합(Aborted) 등 일시적인 오류는 다시 시도합니다.
+    하위 문서 목록을 읽는 것도 사용량에 세도록, refs는 계측 클라이언트(db)로 만든 참조를 넘기세요.
+    Args:
+        writer (BulkWriter): 함께 쓸 BulkWriter입니다. 생략하면 새로 만들어 끝날 때 닫습니다.
+            (실패 수는 이 호출의 삭제 작업만 셉니다)
+    Returns:
+        dict: 삭제한 문서 수(deleted)와 끝내 실패한 삭제 수(failed)
+    """
+    chunk_size = chunk_size or read_chunk_size_from_env()
+    own_writer = writer is None
+    if own_writer:
+        writer = BulkWriter(db)
+    # 같은 writer에 있는 다른 쓰기 작업의 실패와 구분하도록 이 호출의 삭제 작업에 표시를 붙입니다.
+    label = object()
+    requested = 0
+    refs = iter(refs)
+    try:
+        with ThreadPoolExecutor(max_workers=list_threads) as executor:
+            while True:
+                chunk = list(itertools.islice(refs, chunk_size))
+                if not chunk:
+                    break
+                for name in subcollections:
+                    listed = executor.map(lambda ref: list(ref.collection(name).list_documents()), chunk)
+                    for child_refs in listed:
+                        for child_ref in child_refs:
+                            writer.delete(child_ref, label)
+                            requested += 1
+                for ref in chunk:
+                    writer.delete(ref, label)
+                    requested += 1
+        writer.flush()
+    finally:
+        if own_writer:
+            writer.close()
+    failed = writer.failed_by_label.pop(label, 0)
+    return {"deleted": requested - failed, "failed": failed}
@@ -0,0 +1,336 @@
+# firestore_metrics.py
+# Firestore 클라이언트를 감싸 작업(job)별로 읽기/쓰기/삭제/배치 커밋 수와 지연 시간을 세는 계측 도구
+#
+# 사용법:
+#   db = metered_client(get_db(), "upload_result_price_json")
+#   ... db를 평소의 Firestore 클라이언트처럼 사용 ...
+#   db.meter.finish()   # 요약을 출력하고 '<EMART_FIRESTORE_REPORT_DIR>/<시각>_<작업>.json'에 보고서를 씁니다.
+#
+# 청구 기준에 맞춰 셉니다:
+#   - 쿼리(stream/get)는 돌려받은 문서 수만큼 읽기이며, 결과가 없는 쿼리도 읽기 1회로 셉니다.
+#   - 배치의 쓰기/삭제는 커밋이 성공했을 때만 셉니다. (실패한 커밋은 failed_commits)
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+REPORT_DIR_DEFAULT = "firestore_reports"
+COUNTER_KEYS = ("reads", "writes", "deletes", "queries", "batch_commits", "failed_commits", "rpcs")
+
+# 진행 중인 작업의 계측기 (GET /api/firestore_usage에서 보여줍니다)
+_active_meters = set()
+_active_lock = threading.Lock()
+
+
+def report_dir_from_env():
+    return os.environ.get("EMART_FIRESTORE_REPORT_DIR", REPORT_DIR_DEFAULT)
+
+
+def unit_prices_from_env():
+    """ 문서 10만 개당 요금(USD)입니다. (.env의 EMART_FIRESTORE_PRICE_READ/WRITE/DELETE) """
+    return {
+        "reads": float(os.environ.get("EMART_FIRESTORE_PRICE_READ", 0.06)),
+        "writes": float(os.environ.get("EMART_FIRESTORE_PRICE_WRITE", 0.18)),
+        "deletes": float(os.environ.get("EMART_FIRESTORE_PRICE_DELETE", 0.02)),
+    }
+
+
+class FirestoreMeter:
+    """
+    한 작업에서 일어난 Firestore 작업 수와 지연 시간을 컬렉션별로 모읍니다. (스레드 안전)
+    Args:
+        job (str): 작업 이름입니다. 보고서 파일 이름에 들어갑니다.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.started_at = datetime.now()
+        self._started = time.monotonic()
+        self._collections = {}
+        self._lock = threading.Lock()
+        self.report_path = None
+        with _active_lock:
+            _active_meters.add(self)
+
+    def record(self, collection, seconds=None, **counts):
+        """ 컬렉션의 카운터를 더합니다. seconds를 주면 RPC 한 번의 지연 시간으로 기록합니다. """
+        with self._lock:
+            stats = self._collections.get(collection)
+            if stats is None:
+                stats = dict.fromkeys(COUNTER_KEYS, 0)
+                stats["latency_seconds"] = 0.0
+                self._collections[collection] = stats
+            for key, value in counts.items():
+                stats[key] += value
+            if seconds is not None:
+                stats["rpcs"] += 1
+                stats["latency_seconds"] += seconds
+
+    def snapshot(self):
+        """ 지금까지의 컬렉션별 카운터, 합계, 예상 요금입니다. """
+        with self._lock:
+            collections = {name: dict(stats) for name, stats in self._collections.items()}
+        totals = dict.fromkeys(COUNTER_KEYS, 0)
+        totals["latency_seconds"] = 0.0
+        for stats in collections.values():
+            for key in totals:
+                totals[key] += stats[key]
+            stats["avg_latency_ms"] = round(stats["latency_seconds"] * 1000 / stats["rpcs"], 1) if stats["rpcs"] else 0.0
+            stats["latency_seconds"] = round(stats["latency_seconds"], 3)
+        totals["latency_seconds"] = round(totals["latency_seconds"], 3)
+        prices = unit_prices_from_env()
+        cost = sum(totals[key] * price / 100000 for key, price in prices.items())
+        return {
+            "job": self.job,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "duration_seconds": round(time.monotonic() - self._started, 1),
+            "totals": totals,
+            "estimated_cost_usd": round(cost, 6),
+            "collections": collections,
+        }
+
+    def finish(self):
+        """
+        작업을 끝내고 요약을 출력한 뒤 보고서 파일을 씁니다. 보고서를 쓰지 못해도 작업 결과에는 영향을 주지 않습니다.
+        Returns:
+            dict: 보고서 내용
+        """
+        with _active_lock:
+            _active_meters.discard(self)
+        report = self.snapshot()
+        report["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        totals = report["totals"]
+        print(
+            f"--- Firestore 사용량 ({self.job}): 읽기 {totals['reads']}개, 쓰기 {totals['writes']}개, "
+            f"삭제 {totals['deletes']}개, 배치 커밋 {totals['batch_commits']}회, "
+            f"예상 요금 ${report['estimated_cost_usd']:.4f} ---"
+        )
+        report_dir = report_dir_from_env()
+        if not report_dir:
+            return report
+        try:
+            os.makedirs(report_dir, exist_ok=True)
+            path = os.path.join(report_dir, f"{self.started_at:%Y%m%d-%H%M%S}_{self.job}.json")
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, path)
+            self.report_path = path
+        except OSError as e:
+            print(f"경고: Firestore 사용량 보고서를 쓰지 못했습니다: {e}")
+        return report
+
+
+def _unwrap(ref):
+    return ref._target if isinstance(ref, _MeteredDocument) else ref
+
+
+def _collection_of(ref):
+    if isinstance(ref, _MeteredDocument):
+        return ref._collection
+    parent = getattr(ref, "parent", None)
+    return getattr(parent, "id", None) or "unknown"
+
+
+class _MeteredQuery:
+    """ CollectionReference/Query를 감쌉니다. 쿼리를 이어 붙이는 메서드는 감싼 결과를 돌려줍니다. """
+
+    def __init__(self, target, meter, collection):
+        self._target = target
+        self._meter = meter
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def document(self, *args, **kwargs):
+        return _MeteredDocument(self._target.document(*args, **kwargs), self._meter, self._collection)
+
+    def stream(self, *args, **kwargs):
+        started = time.monotonic()
+        count = 0
+        try:
+            for snapshot in self._target.stream(*args, **kwargs):
+                count += 1
+                yield snapshot
+        finally:
+            self._meter.record(
+                self._collection, time.monotonic() - started, reads=max(count, 1), queries=1
+            )
+
+    def get(self, *args, **kwargs):
+        return list(self.stream(*args, **kwargs))
+
+    def list_documents(self, *args, **kwargs):
+        started = time.monotonic()
+        refs = list(self._target.list_documents(*args, **kwargs))
+        self._meter.record(self._collection, time.monotonic() - started, reads=max(len(refs), 1), queries=1)
+        return [_MeteredDocument(ref, self._meter, self._collection) for ref in refs]
+
+
+def _chained(name):
+    def method(self, *args, **kwargs):
+        return _MeteredQuery(getattr(self._target, name)(*args, **kwargs), self._meter, self._collection)
+    method.__name__ = name
+    return method
+
+
+# 쿼리를 이어 붙이는 메서드
+for _name in (
+    "where", "order_by", "limit", "limit_to_last", "offset", "select",
+    "start_at", "start_after", "end_at", "end_before",
+):
+    setattr(_MeteredQuery, _name, _chained(_name))
+
+
+class _MeteredDocument:
+    """ DocumentReference를 감쌉니다. """
+
+    def __init__(self, target, meter, collection):
+        self._target = target
+        self._meter = meter
+        self._collection = collection
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def collection(self, collection_id):
+        return _MeteredQuery(self._target.collection(collection_id), self._meter, collection_id)
+
+    def _call(self, method, counter, *args, **kwargs):
+        started = time.monotonic()
+        result = getattr(self._target, method)(*args, **kwargs)
+        self._meter.record(self._collection, time.monotonic() - started, **{counter: 1})
+        return result
+
+    def get(self, *args, **kwargs):
+        return self._call("get", "reads", *args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        return self._call("set", "writes", *args, **kwargs)
+
+    def create(self, *args, **kwargs):
+        return self._call("create", "writes", *args, **kwargs)
+
+    def update(self, *args, **kwargs):
+        return self._call("update", "writes", *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._call("delete", "deletes", *args, **kwargs)
+
+
+class _MeteredBatch:
+    """ WriteBatch를 감쌉니다. 쓰기/삭제는 커밋이 성공한 뒤에 셉니다. (같은 배치를 다시 커밋해도 됨) """
+
+    def __init__(self, target, meter):
+        self._target = target
+        self._meter = meter
+        self._pending = []
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def set(self, ref, *args, **kwargs):
+        self._pending.append((_collection_of(ref), "writes"))
+        return self._target.set(_unwrap(ref), *args, **kwargs)
+
+    def create(self, ref, *args, **kwargs):
+        self._pending.append((_collection_of(ref), "writes"))
+        return self._target.create(_unwrap(ref), *args, **kwargs)
+
+    def update(self, ref, *args, **kwargs):
+        self._pending.append((_collection_of(ref), "writes"))
+        return self._target.update(_unwrap(ref), *args, **kwargs)
+
+    def delete(self, ref, *args, **kwargs):
+        self._pending.append((_collection_of(ref), "deletes"))
+        return self._target.delete(_unwrap(ref), *args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        if not self._pending:
+            return self._target.commit(*args, **kwargs)
+        # 배치가 여러 컬렉션에 걸치면 지연 시간과 커밋 횟수는 첫 작업의 컬렉션에 기록합니다.
+        first_collection = self._pending[0][0]
+        started = time.monotonic()
+        try:
+            result = self._target.commit(*args, **kwargs)
+        except Exception:
+            self._meter.record(first_collection, time.monotonic() - started, failed_commits=1)
+            raise
+        self._meter.record(first_collection, time.monotonic() - started, batch_commits=1)
+        counts = {}
+        for collection, counter in self._pending:
+            counts.setdefault(collection, {}).setdefault(counter, 0)
+            counts[collection][counter] += 1
+        for collection, collection_counts in counts.items():
+            self._meter.record(collection, **collection_counts)
+        self._pending = []
+        return result
+
+
+class MeteredClient:
+    """
+    Firestore 클라이언트를 감싸 모든 읽기/쓰기를 meter에 기록합니다.
+    감싸지 않은 기능은 원래 클라이언트의 것을 그대로 사용합니다.
+    """
+
+    def __init__(self, client, meter):
+        self._target = client
+        self.meter = meter
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def collection(self, collection_id):
+        return _MeteredQuery(self._target.collection(collection_id), self.meter, collection_id)
+
+    def batch(self):
+        return _MeteredBatch(self._target.batch(), self.meter)
+
+    def get_all(self, references, *args, **kwargs):
+        references = list(references)
+        collections = {_unwrap(ref).id: _collection_of(ref) for ref in references}
+        started = time.monotonic()
+        snapshots = list(self._target.get_all([_unwrap(ref) for ref in references], *args, **kwargs))
+        elapsed = time.monotonic() - started
+        counts = {}
+        for snapshot in snapshots:
+            collection = collections.get(snapshot.id, "unknown")
+            counts[collection] = counts.get(collection, 0) + 1
+        for index, (collection, count) in enumerate(counts.items()):
+            self.meter.record(collection, elapsed if index == 0 else None, reads=count)
+        return iter(snapshots)
+
+
+def metered_client(client, job):
+    """ client를 새 작업 계측기와 함께 감쌉니다. 작업이 끝나면 client.meter.finish()를 호출하세요. """
+    return MeteredClient(client, FirestoreMeter(job))
+
+
+def active_usage():
+    """ 진행 중인 작업들의 현재 사용량입니다. """
+    with _active_lock:
+        meters = list(_active_meters)
+    return [meter.snapshot() for meter in meters]
+
+
+def recent_reports(limit=20, job=None):
+    """ 보고서 디렉토리의 최근 보고서를 새것부터 돌려줍니다. job을 주면 그 작업의 보고서만 돌려줍니다. """
+    report_dir = report_dir_from_env()
+    if not report_dir or not os.path.isdir(report_dir):
+        return []
+    names = sorted(
+        (name for name in os.listdir(report_dir) if name.endswith(".json")), reverse=True
+    )
+    if job:
+        names = [name for name in names if name.split("_", 1)[-1] == f"{job}.json"]
+    reports = []
+    for name in names[:limit]:
+        try:
+            with open(os.path.join(report_dir, name), "r", encoding="utf-8") as f:
+                reports.append(json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"경고: Firestore 사용량 보고서 '{name}'을(를) 읽지 못했습니다: {e}")
+    return reports
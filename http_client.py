@@ -0,0 +1,207 @@
+# http_client.py
+# 모든 스크래퍼가 함께 사용하는 HTTP 클라이언트 (커넥션 풀, 압축, 선택적 HTTP/2)
+
+import os
+import threading
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import rate_limiter
+
+try:
+    import brotli  # noqa: F401  (설치되어 있으면 urllib3/httpx가 br 응답을 자동으로 해제합니다)
+
+    _ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    _ACCEPT_ENCODING = "gzip, deflate"
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+    "Accept-Encoding": _ACCEPT_ENCODING,
+    "Accept-Language": "ko-KR,ko;q=0.9,en-US;q=0.8,en;q=0.7",
+}
+# (연결 타임아웃, 읽기 타임아웃) 초
+DEFAULT_TIMEOUT = (5, 15)
+# 속도 제한기에 감속 신호를 보내는 응답 코드와 자동 재시도 대상 메서드
+THROTTLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRY_METHODS = {"GET", "HEAD"}
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class Http2Response:
+    """
+    httpx 응답을 requests 응답처럼 다룰 수 있게 감싸는 클래스입니다.
+    raise_for_status()는 requests.exceptions.HTTPError를 발생시키므로
+    호출하는 쪽의 예외 처리를 그대로 사용할 수 있습니다.
+    """
+
+    def __init__(self, response):
+        self._response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+
+    @property
+    def text(self):
+        return self._response.text
+
+    @property
+    def content(self):
+        return self._response.content
+
+    def json(self):
+        return self._response.json()
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error for url: {self.url}", response=self
+            )
+
+
+class Http2Session:
+    """
+    httpx.Client(http2=True)를 requests.Session과 같은 방식으로 호출할 수 있게 감싼 세션입니다.
+    같은 호스트(emart.ssg.com, 이미지 CDN)에 대한 요청은 하나의 연결로 다중화됩니다.
+    """
+
+    def __init__(self, pool_size):
+        self._client = httpx.Client(
+            http2=True,
+            headers=DEFAULT_HEADERS,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=pool_size, max_keepalive_connections=pool_size
+            ),
+        )
+
+    def request(self, method, url, timeout=None, **kwargs):
+        connect_timeout, read_timeout = _split_timeout(timeout)
+        try:
+            response = self._client.request(
+                method,
+                url,
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                **kwargs,
+            )
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e))
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e))
+        return Http2Response(response)
+
+    def close(self):
+        self._client.close()
+
+
+def _split_timeout(timeout):
+    if timeout is None:
+        return DEFAULT_TIMEOUT
+    if isinstance(timeout, tuple):
+        return timeout
+    return DEFAULT_TIMEOUT[0], timeout
+
+
+def _build_requests_session(pool_size):
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    # 연결 단계 오류만 재시도합니다. (HTTP 상태 코드 재시도는 호출하는 쪽에서 처리)
+    retry = Retry(
+        total=2,
+        connect=2,
+        read=0,
+        status=0,
+        backoff_factor=0.5,
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_client():
+    """
+    프로세스 전체에서 공유하는 HTTP 클라이언트를 반환합니다.
+    .env의 EMART_HTTP2=True이고 httpx[http2]가 설치되어 있으면 HTTP/2 클라이언트를 사용합니다.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                pool_size = int(os.environ.get("EMART_HTTP_POOL_SIZE", 20))
+                use_http2 = os.environ.get("EMART_HTTP2", "False").lower() == "true"
+                if use_http2 and httpx is not None:
+                    try:
+                        _client = Http2Session(pool_size)
+                        print("HTTP/2 클라이언트를 사용합니다.")
+                    except ImportError:
+                        print("경고: h2 패키지가 없어 HTTP/1.1 클라이언트를 사용합니다.")
+                if _client is None:
+                    _client = _build_requests_session(pool_size)
+    return _client
+
+
+def reset_client():
+    """ 공유 클라이언트를 닫고 다음 요청 시 설정을 다시 읽어 새로 만들도록 합니다. """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+
+
+def request(method, url, timeout=None, **kwargs):
+    """
+    호스트별 AIMD 속도 제한기를 거쳐 요청을 보냅니다.
+    429/5xx 응답은 속도 제한기에 감속 신호로 전달되고(Retry-After 준수),
+    GET/HEAD 요청은 EMART_MAX_RETRIES 횟수까지 다시 시도합니다.
+    재시도가 모두 실패하면 마지막 응답을 그대로 반환합니다.
+    """
+    limiter = rate_limiter.get_limiter(urllib.parse.urlparse(url).netloc)
+    max_retries = int(os.environ.get("EMART_MAX_RETRIES", 5))
+    attempt = 0
+    while True:
+        limiter.acquire()
+        response = get_client().request(
+            method, url, timeout=timeout or DEFAULT_TIMEOUT, **kwargs
+        )
+        if response.status_code not in THROTTLE_STATUS_CODES:
+            limiter.on_success()
+            return response
+
+        limiter.on_throttle(
+            rate_limiter.parse_retry_after(response.headers.get("Retry-After"))
+        )
+        if method not in RETRY_METHODS or attempt >= max_retries:
+            return response
+        attempt += 1
+        print(
+            f"  -> ⏳ {response.status_code} 응답: 속도를 {limiter.current_rate:.2f}회/초로 낮추고 재시도합니다. ({attempt}/{max_retries})"
+        )
+
+
+def get(url, timeout=None, **kwargs):
+    """ 공유 클라이언트로 GET 요청을 보냅니다. (requests.get과 같은 방식으로 사용) """
+    return request("GET", url, timeout=timeout, **kwargs)
+
+
+def head(url, timeout=None, **kwargs):
+    """ 공유 클라이언트로 HEAD 요청을 보냅니다. """
+    return request("HEAD", url, timeout=timeout, **kwargs)
+
+
+def post(url, timeout=None, **kwargs):
+    """ 공유 클라이언트로 POST 요청을 보냅니다. """
+    return request("POST", url, timeout=timeout, **kwargs)
@@ -0,0 +1,113 @@
+# jsonl_store.py
+# 스크래핑 결과를 JSON Lines(한 줄에 상품 하나) 형식으로 쓰고 읽는 도구
+
+import glob
+import json
+import os
+
+PART_SUFFIX = ".part"
+
+
+class JsonlWriter:
+    """
+    상품 기록을 '<경로>.part' 임시 파일에 한 줄씩 이어 쓰고,
+    commit() 시점에 최종 경로로 원자적으로 옮깁니다. (os.replace)
+    중간에 실패하면 최종 파일은 이전 상태 그대로 남고, 이미 쓴 기록은 .part 파일에 남습니다.
+    Args:
+        path (str): 최종 파일 경로입니다. (예: result_json/과일.jsonl)
+        resume_offset (int): 주어지면 기존 .part 파일을 이 위치(바이트)까지 남기고 이어 씁니다.
+    """
+
+    def __init__(self, path, resume_offset=None):
+        self.path = path
+        self.part_path = path + PART_SUFFIX
+        self.count = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if resume_offset is None:
+            self._file = open(self.part_path, "w", encoding="utf-8")
+        else:
+            # 마지막으로 기록이 확인된 위치 뒤에 남은 (중간에 끊긴) 내용은 잘라냅니다.
+            self._file = open(self.part_path, "r+", encoding="utf-8")
+            self._file.truncate(resume_offset)
+            self._file.seek(resume_offset)
+
+    @property
+    def offset(self):
+        """ 지금까지 기록한 바이트 수입니다. (이어 쓰기 위치로 사용) """
+        return self._file.tell()
+
+    @staticmethod
+    def can_resume(path, resume_offset):
+        """ .part 파일이 resume_offset 위치까지 남아 있어 이어 쓸 수 있는지 확인합니다. """
+        part_path = path + PART_SUFFIX
+        return os.path.exists(part_path) and os.path.getsize(part_path) >= resume_offset
+
+    def write_records(self, records):
+        """ 기록들을 한 줄에 하나씩 이어 쓰고 디스크로 내보냅니다. """
+        for record in records:
+            self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+            self._file.write("\n")
+            self.count += 1
+        self._file.flush()
+
+    def commit(self):
+        """ 임시 파일을 닫고 최종 경로로 옮깁니다. 같은 이름의 이전 .json 결과 파일은 지웁니다. """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.part_path, self.path)
+        legacy_path = os.path.splitext(self.path)[0] + ".json"
+        if legacy_path != self.path and os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+    def abort(self):
+        """ 최종 파일을 건드리지 않고 임시 파일만 닫습니다. """
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+
+def list_result_files(directory):
+    """
+    디렉토리의 결과 파일(.jsonl, 이전 형식 .json) 경로 목록을 반환합니다.
+    작성 중인 .part 파일은 제외합니다.
+    """
+    paths = glob.glob(os.path.join(directory, "*.jsonl"))
+    paths += glob.glob(os.path.join(directory, "*.json"))
+    return sorted(paths)
+
+
+def iter_records(path):
+    """
+    결과 파일의 상품 기록을 하나씩 돌려줍니다.
+    .jsonl 파일은 한 줄씩 읽어 파일 전체를 메모리에 올리지 않으며,
+    이전 형식(.json 배열) 파일도 그대로 읽을 수 있습니다.
+    """
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+
+
+def count_records(path):
+    """ 결과 파일의 상품 수를 셉니다. (.jsonl은 줄 수만 셉니다) """
+    if path.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip())
+    return sum(1 for _ in iter_records(path))
@@ -1,8 +1,9 @@
 import os
 import uvicorn
 from fastapi import FastAPI, Request
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 import json
+import asyncio
 from firebase_uploader import (upload_all_products_to_firebase,upload_id_price_to_firebase,upload_other_info_to_firebase)
 from dotenv import load_dotenv, set_key, dotenv_values
 
@@ -11,6 +12,11 @@ from dotenv import load_dotenv, set_key, dotenv_values
 from emart_json import run_scraper as run_all_scraper
 from emart_price_json import run_scraper as run_price_scraper
 from emart_non_price_json import run_scraper as run_non_price_scraper
+from emart_crawler import run_extraction
+from scrape_by_id import iter_products_by_ids, scrape_products_by_ids
+from upload_pipeline import pipeline_enabled, run_upload_pipeline
+import firestore_metrics
+import rate_limiter
 
 # run_image 엔드포인트를 위해 emart_image.py의 run_emart_image를 임포트
 from emart_image import run_emart_image
@@ -22,6 +28,12 @@ def scheduler_all():
     """ 전체 상품 스크래핑 및 업로드 작업 """
     try:
         print("===== 정기 작업 시작 (매일 10시): 모든 상품 스크래핑 =====")
+        load_dotenv(override=True)
+        if pipeline_enabled():
+            # 파일을 거치지 않고 스크래핑하는 대로 바로 업로드합니다.
+            run_upload_pipeline("full")
+            print("===== 모든 정기 작업 완료 =====")
+            return
         run_all_scraper()
         print("===== 스크래핑 완료. 파이어베이스 업로드를 시작합니다. =====")
         upload_all_products_to_firebase()
@@ -33,6 +45,12 @@ def scheduler_price():
     """ 가격 정보 스크래핑 및 업로드 작업 """
     try:
         print("===== 정기 작업 시작 (매시 정각): 상품 가격 스크래핑 =====")
+        load_dotenv(override=True)
+        if pipeline_enabled():
+            # 파일을 거치지 않고 스크래핑하는 대로 바로 업로드합니다.
+            run_upload_pipeline("price")
+            print("===== 모든 정기 작업 완료 =====")
+            return
         run_price_scraper()
         print("===== 스크래핑 완료. 가격 파이어베이스 업로드를 시작합니다. =====")
         upload_id_price_to_firebase()
@@ -50,6 +68,16 @@ def scheduler_old_products():
     except Exception as e:
         print(f"정기 작업(오래된 상품) 중 오류 발생: {e}")
 
+def scheduler_refresh():
+    """ 변동성 기반 상품 갱신 작업 (시간당 요청 예산만큼) """
+    try:
+        print("===== 정기 작업 시작 (매시 45분): 변동성 기반 상품 갱신 =====")
+        from refresh_scheduler import run_refresh
+        run_refresh()
+        print("===== 변동성 기반 상품 갱신 완료 =====")
+    except Exception as e:
+        print(f"정기 작업(변동성 기반 갱신) 중 오류 발생: {e}")
+
 # http://127.0.0.1:8000/docs
 # http://127.0.0.1:8000/redoc
 # uvicorn main1:app --reload --port 8427
@@ -63,6 +91,7 @@ async def lifespan(app: FastAPI):
     scheduler.add_job(scheduler_price, "cron", hour="0-9,12-23", minute=30)
     scheduler.add_job(scheduler_all, 'cron', hour=10, minute=30)
     scheduler.add_job(scheduler_old_products, 'cron', hour=11, minute=30)
+    scheduler.add_job(scheduler_refresh, 'cron', minute=45)
 
     is_scheduler_enabled = (
         os.environ.get("SCHEDULER_ENABLED", "False").lower() == "true"
@@ -159,6 +188,72 @@ async def run_other_info():
         return {"status": "error", "error": str(e)}
 
 
+@app.post("/run_extraction")
+async def run_extraction_json(request: Request):
+    """
+    페이지를 한 번씩만 가져와 선택한 결과(full, price, non_price)를 한꺼번에 저장합니다.
+    요청 본문 예: {"outputs": ["full", "price"]} (생략 시 세 종류 모두 생성)
+    """
+    try:
+        try:
+            data = await request.json()
+        except json.JSONDecodeError:
+            data = {}
+        outputs = data.get("outputs") or ["full", "price", "non_price"]
+        run_extraction(outputs)
+        return {"status": "success"}
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
+@app.post("/run_pipeline")
+async def run_pipeline(request: Request):
+    """
+    카테고리를 스크래핑하면서 상품을 바로 Firestore에 업로드합니다.
+    요청 본문 예: {"kind": "price"} (full, price, non_price 중 하나, 생략 시 price)
+    """
+    try:
+        try:
+            data = await request.json()
+        except json.JSONDecodeError:
+            data = {}
+        return run_upload_pipeline(data.get("kind") or "price")
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
+@app.post("/scrape_by_ids")
+async def scrape_by_ids(request: Request):
+    """
+    상품 ID 목록의 상세 페이지를 동시에 스크래핑하여 입력 순서대로 반환합니다.
+    요청 본문 예: {"ids": ["1000012345678", ...], "concurrency": 8, "stream": false}
+    stream이 true이면 결과를 완료되는 대로 한 줄에 하나씩(JSON Lines) 보냅니다.
+    """
+    try:
+        data = await request.json()
+        ids = data.get("ids") or []
+        if not isinstance(ids, list):
+            return {"status": "error", "error": "ids는 상품 ID 목록이어야 합니다."}
+        ids = [str(pid) for pid in ids]
+        concurrency = data.get("concurrency")
+
+        if data.get("stream"):
+            def generate():
+                for pid, product in iter_products_by_ids(ids, concurrency):
+                    result = product if product else {"id": pid, "error": "스크래핑 실패"}
+                    yield json.dumps(result, ensure_ascii=False) + "\n"
+
+            return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+        products = await asyncio.to_thread(scrape_products_by_ids, ids, concurrency)
+        scraped_ids = {product["id"] for product in products}
+        clean_ids = [pid.strip().strip(",") for pid in ids]
+        failed = [pid for pid in clean_ids if pid and pid not in scraped_ids]
+        return {"status": "success", "products": products, "failed": failed}
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+
 @app.post("/run_image")
 async def run_image():
     """emart_image.py의 run_emart_image 함수를 실행합니다."""
@@ -217,6 +312,33 @@ async def pause_scheduler():
         return {"status": "error", "error": str(e)}
 
 
+@app.get("/api/rate_limits")
+async def get_rate_limits():
+    """ 호스트별 현재 요청 속도(초당 요청 수)와 정상/제한 응답 수를 반환합니다. """
+    return rate_limiter.snapshot()
+
+
+@app.get("/api/firestore_usage")
+async def get_firestore_usage(limit: int = 20, job: str = None):
+    """
+    진행 중인 작업과 최근 작업의 Firestore 읽기/쓰기/삭제/배치 커밋 수, 지연 시간, 예상 요금을 반환합니다.
+    job을 주면 그 작업(예: upload_result_price_json, pipeline_price)의 보고서만 반환합니다.
+    """
+    return {
+        "active": firestore_metrics.active_usage(),
+        "reports": firestore_metrics.recent_reports(limit, job),
+    }
+
+
+@app.get("/api/refresh_schedule")
+async def get_refresh_schedule():
+    """ 변동성 기반 갱신 스케줄의 주기별 상품 수, 지금 확인할 상품 수, 누적 확인/변동 수를 반환합니다. """
+    from refresh_scheduler import RefreshScheduleStore, refresh_settings_from_env
+
+    with RefreshScheduleStore(refresh_settings_from_env()["db_path"]) as store:
+        return store.stats()
+
+
 @app.get("/api/settings")
 async def get_current_settings():
     """
@@ -0,0 +1,36 @@
+# parse_pool.py
+# HTML 파싱을 여러 CPU 코어에서 실행하기 위한 프로세스 풀 설정
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def parse_workers_from_env():
+    """
+    .env의 EMART_PARSE_WORKERS 값을 읽습니다. 비어 있으면 CPU 코어 수를 사용하고,
+    0 또는 1이면 프로세스 풀 없이 현재 프로세스에서 파싱합니다.
+    """
+    value = (os.environ.get("EMART_PARSE_WORKERS") or "").strip()
+    if not value:
+        return os.cpu_count() or 1
+    return max(0, int(value))
+
+
+def parse_queue_size_from_env():
+    """ 파싱을 기다리며 메모리에 둘 수 있는 HTML 페이지 수입니다. (.env의 EMART_PARSE_QUEUE_SIZE, 기본 8) """
+    return max(1, int(os.environ.get("EMART_PARSE_QUEUE_SIZE", 8)))
+
+
+def create_parse_pool(workers=None):
+    """
+    파서 워커 프로세스 풀을 만듭니다. 워커가 1개 이하이면 None을 반환합니다.
+    웹 서버처럼 스레드가 이미 실행 중인 프로세스에서도 안전하도록 spawn 방식으로 워커를 시작합니다.
+    """
+    if workers is None:
+        workers = parse_workers_from_env()
+    if workers <= 1:
+        return None
+    return ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    )
@@ -0,0 +1,341 @@
+# parser_benchmark.py
+# 저장된 HTML 페이지(fixtures/)로 파서 구현들의 속도/메모리/결과를 오프라인에서 측정하는 벤치마크
+#
+# 사용법:
+#   python parser_benchmark.py record category <이름> <dispCtgId> [페이지 번호 ...]
+#   python parser_benchmark.py record item <상품 ID> ...
+#   python parser_benchmark.py run               # 측정 결과만 출력
+#   python parser_benchmark.py baseline          # 측정 결과를 기준값 파일로 저장
+#   python parser_benchmark.py check             # 기준값보다 느려졌거나 결과가 바뀌면 종료 코드 1
+#
+# 처리량과 메모리는 같은 프로세스에서 함께 잰 기준 구현(bs4) 대비 비율로 비교하므로,
+# 측정한 컴퓨터가 달라도 기준값 파일을 그대로 쓸 수 있습니다.
+#   python parser_benchmark.py scaling           # 파서 워커 프로세스 수에 따른 처리량 측정
+
+import argparse
+import gc
+import glob
+import hashlib
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import http_client
+from emart_crawler import CATEGORY_PAGE_URL
+from emart_parser import PARSER_BACKENDS, available_backends
+from emart_price_stream import extract_prices
+from parse_pool import create_parse_pool
+from scrape_by_id import parse_product_detail
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+BASELINE_FILE = os.path.join(FIXTURE_DIR, "benchmark_baseline.json")
+ITEM_PAGE_URL = "https://emart.ssg.com/item/itemView.ssg?itemId={product_id}"
+# 기준값 대비 허용 오차 (기준 구현 대비 처리량 비율의 감소, 최대 메모리 비율의 증가)
+DEFAULT_TOLERANCE = 0.25
+# 비율을 계산할 때 나누는 기준 구현 (종류마다 같은 프로세스에서 함께 측정)
+REFERENCE_PARSER = "bs4"
+
+
+def category_parsers():
+    """ 카테고리 목록 페이지 파서 구현: 이름 -> (html_content) -> 결과 목록 """
+    parsers = {}
+    for backend in available_backends():
+        parse = PARSER_BACKENDS[backend]
+        parsers[backend] = lambda html_content, parse=parse: parse(html_content, "benchmark")
+    parsers["stream"] = extract_prices
+    return parsers
+
+
+def item_parsers():
+    """ 상품 상세 페이지(itemView.ssg) 파서 구현: 이름 -> (html_content) -> 결과 목록 """
+    return {"bs4": lambda html_content: [parse_product_detail(html_content, "benchmark")]}
+
+
+def load_fixtures(kind):
+    paths = sorted(glob.glob(os.path.join(FIXTURE_DIR, kind, "*.html")))
+    fixtures = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            fixtures.append((os.path.basename(path), f.read()))
+    return fixtures
+
+
+def record_fixture(kind, name, url):
+    """ 페이지를 한 번 내려받아 fixtures/<kind>/<name>.html로 저장합니다. """
+    response = http_client.get(url)
+    response.raise_for_status()
+    output_dir = os.path.join(FIXTURE_DIR, kind)
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"{name}.html")
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write(response.text)
+    print(f"'{url}' 페이지를 '{output_file}' 파일로 저장했습니다. ({len(response.text):,}자)")
+
+
+def _result_digest(results):
+    """ 파싱 결과의 해시입니다. last_updated는 파싱 시각이므로 제외합니다. """
+    digest = hashlib.sha256()
+    for name, products in results:
+        stripped = [{k: v for k, v in p.items() if k != "last_updated"} for p in products]
+        digest.update(name.encode("utf-8"))
+        digest.update(json.dumps(stripped, ensure_ascii=False, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _time_round(parse, fixtures, item_counts, per_item_latencies):
+    """ 모든 페이지를 한 번 파싱하는 시간(초)입니다. 상품당 파싱 시간은 per_item_latencies에 더합니다. """
+    round_time = 0.0
+    for (_, html_content), item_count in zip(fixtures, item_counts):
+        started = time.perf_counter()
+        parse(html_content)
+        elapsed = time.perf_counter() - started
+        round_time += elapsed
+        if item_count:
+            per_item_latencies.extend([elapsed / item_count] * item_count)
+    return round_time
+
+
+def benchmark_parsers(parsers, fixtures, repeats):
+    """
+    파서 구현들을 모든 페이지에 대해 repeats번 실행해 측정합니다.
+    한 바퀴마다 모든 구현을 번갈아 실행하므로, 측정 도중 컴퓨터 부하가 바뀌어도 구현들이 똑같이 영향을 받습니다.
+    처리량은 전체 페이지를 한 번 도는 시간의 중앙값으로 계산하고,
+    상품당 파싱 시간은 각 페이지의 파싱 시간을 그 페이지의 상품 수로 나눈 값입니다.
+    기준 구현(REFERENCE_PARSER)이 있으면 같은 바퀴의 기준 구현 대비 처리량 비율의 중앙값(relative_speed)과
+    최대 메모리 비율(relative_memory)을 함께 남깁니다.
+    최대 메모리는 tracemalloc으로 따로 한 번 측정합니다. (시간 측정에는 포함하지 않음)
+    Returns:
+        dict: 구현 이름 -> 측정 결과
+    """
+    results = {
+        name: [(fixture_name, parse(html_content)) for fixture_name, html_content in fixtures]  # 예열
+        for name, parse in parsers.items()
+    }
+    item_counts = {name: [len(products) for _, products in results[name]] for name in parsers}
+
+    per_item_latencies = {name: [] for name in parsers}
+    round_times = {name: [] for name in parsers}
+    gc.collect()
+    for _ in range(repeats):
+        for name, parse in parsers.items():
+            round_times[name].append(
+                _time_round(parse, fixtures, item_counts[name], per_item_latencies[name])
+            )
+
+    report = {}
+    for name, parse in parsers.items():
+        peak_bytes = 0
+        for _, html_content in fixtures:
+            tracemalloc.start()
+            parse(html_content)
+            peak_bytes = max(peak_bytes, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        latencies = sorted(per_item_latencies[name])
+        round_time = statistics.median(round_times[name])
+        report[name] = {
+            "pages": len(fixtures),
+            "items": sum(item_counts[name]),
+            "pages_per_sec": round(len(fixtures) / round_time, 1) if round_time else 0.0,
+            "items_per_sec": round(sum(item_counts[name]) / round_time, 1) if round_time else 0.0,
+            "item_latency_us": {
+                f"p{percent}": round(_percentile(latencies, percent) * 1e6, 1)
+                for percent in (50, 90, 99)
+            },
+            "peak_memory_kb": round(peak_bytes / 1024, 1),
+            "digest": _result_digest(results[name]),
+        }
+
+    reference = report.get(REFERENCE_PARSER)
+    if reference is not None:
+        for name, result in report.items():
+            speed_ratios = [
+                reference_time / own_time
+                for reference_time, own_time in zip(round_times[REFERENCE_PARSER], round_times[name])
+                if own_time
+            ]
+            result["relative_speed"] = round(statistics.median(speed_ratios), 3) if speed_ratios else None
+            result["relative_memory"] = (
+                round(result["peak_memory_kb"] / reference["peak_memory_kb"], 3)
+                if reference["peak_memory_kb"] else None
+            )
+    return report
+
+
+def run_benchmarks(repeats):
+    """
+    Returns:
+        dict: "category/<구현>", "item/<구현>" -> 측정 결과
+    """
+    report = {}
+    for kind, parsers in (("category", category_parsers()), ("item", item_parsers())):
+        fixtures = load_fixtures(kind)
+        if not fixtures:
+            print(f"경고: '{FIXTURE_DIR}/{kind}'에 저장된 페이지가 없어 건너뜁니다.")
+            continue
+        for name, result in benchmark_parsers(parsers, fixtures, repeats).items():
+            report[f"{kind}/{name}"] = result
+    return report
+
+
+def print_report(report):
+    print(
+        f"{'구현':<22}{'페이지':>6}{'상품':>6}{'페이지/초':>12}{'상품/초':>12}"
+        f"{'p50(us)':>10}{'p90(us)':>10}{'p99(us)':>10}{'최대메모리(KB)':>16}{'속도비':>8}  결과 해시"
+    )
+    for name, result in report.items():
+        latency = result["item_latency_us"]
+        print(
+            f"{name:<22}{result['pages']:>6}{result['items']:>6}"
+            f"{result['pages_per_sec']:>12}{result['items_per_sec']:>12}"
+            f"{latency['p50']:>10}{latency['p90']:>10}{latency['p99']:>10}"
+            f"{result['peak_memory_kb']:>16}{str(result.get('relative_speed', '-')):>8}  {result['digest']}"
+        )
+
+
+def check_regressions(report, baseline, tolerance):
+    """
+    기준값과 비교해 회귀 목록을 반환합니다.
+    기준 구현(REFERENCE_PARSER) 대비 처리량 비율이 tolerance 비율보다 많이 줄었거나,
+    최대 메모리 비율이 그만큼 늘었거나, 파싱 결과 해시가 달라졌으면 회귀로 봅니다.
+    절대 처리량은 컴퓨터마다 다르므로 비교하지 않습니다.
+    """
+    regressions = []
+    for name, expected in baseline.items():
+        actual = report.get(name)
+        if actual is None:
+            print(f"참고: '{name}' 구현을 이 환경에서 측정하지 않아 비교를 건너뜁니다.")
+            continue
+        if actual["digest"] != expected["digest"]:
+            regressions.append(
+                f"{name}: 파싱 결과가 기준값과 다릅니다. ({expected['digest']} -> {actual['digest']})"
+            )
+        if name.endswith(f"/{REFERENCE_PARSER}"):
+            continue
+        expected_speed, actual_speed = expected.get("relative_speed"), actual.get("relative_speed")
+        if expected_speed and actual_speed and actual_speed < expected_speed * (1 - tolerance):
+            regressions.append(
+                f"{name}: {REFERENCE_PARSER} 대비 처리량이 {expected_speed}배 -> {actual_speed}배로 줄었습니다."
+            )
+        expected_memory, actual_memory = expected.get("relative_memory"), actual.get("relative_memory")
+        if expected_memory and actual_memory and actual_memory > expected_memory * (1 + tolerance):
+            regressions.append(
+                f"{name}: {REFERENCE_PARSER} 대비 최대 메모리가 {expected_memory}배 -> {actual_memory}배로 늘었습니다."
+            )
+    return regressions
+
+
+def measure_pool_scaling(backend, worker_counts, pages):
+    """
+    카테고리 페이지 pages개를 파서 프로세스 풀로 파싱하며 워커 수별 처리량(페이지/초)을 측정합니다.
+    워커 1개는 프로세스 풀 없이 현재 프로세스에서 파싱한 값입니다.
+    """
+    fixtures = [html_content for _, html_content in load_fixtures("category")]
+    if not fixtures:
+        print(f"경고: '{FIXTURE_DIR}/category'에 저장된 페이지가 없습니다.")
+        return {}
+    parse = PARSER_BACKENDS[backend]
+    html_pages = list(itertools.islice(itertools.cycle(fixtures), pages))
+    names = itertools.repeat("benchmark")
+
+    results = {}
+    for workers in worker_counts:
+        pool = create_parse_pool(workers)
+        try:
+            if pool is None:
+                started = time.perf_counter()
+                for html_content in html_pages:
+                    parse(html_content, "benchmark")
+            else:
+                # 워커 프로세스 시작 시간은 측정에서 제외합니다.
+                list(pool.map(parse, fixtures * workers, names))
+                started = time.perf_counter()
+                list(pool.map(parse, html_pages, names, chunksize=1))
+            elapsed = time.perf_counter() - started
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        results[workers] = round(pages / elapsed, 1)
+        print(f"워커 {workers}개: {results[workers]} 페이지/초")
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="이마트몰 파서 벤치마크")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record = subparsers.add_parser("record", help="페이지를 내려받아 fixtures/에 저장")
+    record_kinds = record.add_subparsers(dest="kind", required=True)
+    record_category = record_kinds.add_parser("category")
+    record_category.add_argument("name")
+    record_category.add_argument("disp_ctg_id")
+    record_category.add_argument("pages", nargs="*", type=int, default=[1])
+    record_item = record_kinds.add_parser("item")
+    record_item.add_argument("product_ids", nargs="+")
+
+    for command in ("run", "baseline", "check"):
+        sub = subparsers.add_parser(command)
+        sub.add_argument("--repeats", type=int, default=20)
+        sub.add_argument("--baseline-file", default=BASELINE_FILE)
+        sub.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+
+    scaling = subparsers.add_parser("scaling", help="파서 워커 수에 따른 처리량 측정")
+    scaling.add_argument("--backend", default="bs4", choices=sorted(PARSER_BACKENDS))
+    scaling.add_argument(
+        "--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1})
+    )
+    scaling.add_argument("--pages", type=int, default=200)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "scaling":
+        print(f"CPU 코어 수: {os.cpu_count()}, 파서: {args.backend}, 페이지: {args.pages}")
+        measure_pool_scaling(args.backend, args.workers, args.pages)
+        return 0
+
+    if args.command == "record":
+        if args.kind == "category":
+            for page_num in args.pages:
+                url = CATEGORY_PAGE_URL.format(disp_ctg_id=args.disp_ctg_id, page_num=page_num)
+                record_fixture("category", f"{args.name}_{page_num}", url)
+        else:
+            for product_id in args.product_ids:
+                record_fixture("item", product_id, ITEM_PAGE_URL.format(product_id=product_id))
+        return 0
+
+    report = run_benchmarks(args.repeats)
+    print_report(report)
+
+    if args.command == "baseline":
+        with open(args.baseline_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"\n기준값을 '{args.baseline_file}' 파일에 저장했습니다.")
+    elif args.command == "check":
+        if not os.path.exists(args.baseline_file):
+            print(f"\n오류: 기준값 파일 '{args.baseline_file}'이 없습니다. 먼저 baseline을 실행하세요.")
+            return 1
+        with open(args.baseline_file, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = check_regressions(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n===== 성능/결과 회귀 {len(regressions)}건 =====")
+            for regression in regressions:
+                print(f"  - {regression}")
+            return 1
+        print("\n===== 기준값 대비 회귀 없음 =====")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,245 @@
+# price_history.py
+# 상품 가격 이력을 월별 버킷 문서에 저장하고 읽는 도구
+#
+# 저장 구조:
+#   emart_price/{상품 ID}                                   현재 가격(current_price)과 요약 통계(price_stats)
+#   emart_price/{상품 ID}/price_history_monthly/{YYYY-MM}   그 달의 가격 변경 기록(records)
+#
+# 사용법:
+#   python price_history.py migrate [--dry-run] [--page-size 300] [--resume]   # 문서 안의 price_history 배열을 월별 버킷으로 옮깁니다.
+#   python price_history.py show <상품 ID> [--from YYYY-MM] [--to YYYY-MM]
+
+import argparse
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from firebase_admin import firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
+
+from firestore_bulk import BulkWriter, ScanCheckpoint, cursor_after, scan_pages
+
+PRICE_COLLECTION = "emart_price"
+PRICE_BUCKET_COLLECTION = "price_history_monthly"
+# 예전 구조에서 가격 문서 안에 쌓던 배열 필드
+LEGACY_HISTORY_FIELD = "price_history"
+
+
+def bucket_id(last_updated):
+    """ 기록 시각(ISO 문자열)이 속한 달의 버킷 ID(YYYY-MM)입니다. 읽을 수 없으면 이번 달을 사용합니다. """
+    try:
+        return datetime.fromisoformat(last_updated).strftime("%Y-%m")
+    except (TypeError, ValueError):
+        return datetime.now().strftime("%Y-%m")
+
+
+def bucket_collection(db, product_id):
+    return db.collection(PRICE_COLLECTION).document(product_id).collection(PRICE_BUCKET_COLLECTION)
+
+
+def _as_number(price):
+    try:
+        return int(str(price).replace(",", ""))
+    except (TypeError, ValueError):
+        return None
+
+
+def _stats_update(records):
+    """ 가격 기록들을 price_stats에 더하는 필드 변환입니다. (문서를 읽지 않고 갱신) """
+    stats = {"change_count": firestore.Increment(len(records))}
+    selling_prices = [p for p in (_as_number(r.get("selling_price")) for r in records) if p is not None]
+    if selling_prices:
+        stats["min_selling_price"] = firestore.Minimum(min(selling_prices))
+        stats["max_selling_price"] = firestore.Maximum(max(selling_prices))
+    last_changed = max((r.get("last_updated") or "" for r in records), default="")
+    if last_changed:
+        stats["last_changed"] = last_changed
+    return stats
+
+
+def last_price_from_doc(data):
+    """ 가격 문서에서 마지막 가격 기록을 꺼냅니다. (아직 옮기지 않은 예전 문서는 배열의 마지막 기록) """
+    if not data:
+        return None
+    if data.get("current_price"):
+        return data["current_price"]
+    legacy_history = data.get(LEGACY_HISTORY_FIELD) or []
+    return legacy_history[-1] if legacy_history else None
+
+
+def record_price_change(writer, db, product_id, price_info, fields=None):
+    """
+    가격 변경 기록 하나를 그 달의 버킷 문서에 추가하고, 가격 문서의 현재 가격과 요약 통계를 갱신하는
+    쓰기 작업을 writer(BulkWriter 또는 WriteBatch)에 넣습니다.
+    Args:
+        fields (dict): 가격 문서에 함께 쓸 필드입니다. (예: out_of_stock, quantity, last_updated)
+    """
+    month = bucket_id(price_info.get("last_updated"))
+    writer.set(
+        bucket_collection(db, product_id).document(month),
+        {"id": product_id, "month": month, "records": firestore.ArrayUnion([price_info])},
+        merge=True,
+    )
+    parent_data = dict(fields or {})
+    parent_data["current_price"] = price_info
+    parent_data["price_stats"] = _stats_update([price_info])
+    writer.set(db.collection(PRICE_COLLECTION).document(product_id), parent_data, merge=True)
+
+
+def price_bucket_refs(db, product_id):
+    """ 상품의 모든 버킷 문서 참조입니다. (가격 문서를 지울 때 함께 지워야 합니다) """
+    return list(bucket_collection(db, product_id).list_documents())
+
+
+def read_price_history(db, product_id, start_month=None, end_month=None):
+    """
+    상품의 가격 변경 기록을 시간 순서대로 돌려줍니다. 월 범위(YYYY-MM)를 주면 그 버킷만 읽습니다.
+    아직 옮기지 않은 예전 문서의 price_history 배열도 함께 읽습니다.
+    """
+    query = bucket_collection(db, product_id)
+    if start_month:
+        query = query.where(filter=FieldFilter("month", ">=", start_month))
+    if end_month:
+        query = query.where(filter=FieldFilter("month", "<=", end_month))
+
+    records = []
+    for bucket in query.stream():
+        records += (bucket.to_dict() or {}).get("records", [])
+
+    parent = db.collection(PRICE_COLLECTION).document(product_id).get(field_paths=[LEGACY_HISTORY_FIELD])
+    if parent.exists:
+        for record in (parent.to_dict() or {}).get(LEGACY_HISTORY_FIELD) or []:
+            month = bucket_id(record.get("last_updated"))
+            if (not start_month or month >= start_month) and (not end_month or month <= end_month):
+                records.append(record)
+
+    # 옮기는 도중에 양쪽에 모두 있는 기록은 한 번만 돌려줍니다.
+    unique = OrderedDict()
+    for record in records:
+        key = (record.get("last_updated"), record.get("original_price"), record.get("selling_price"))
+        unique.setdefault(key, record)
+    return sorted(unique.values(), key=lambda record: record.get("last_updated") or "")
+
+
+def read_price_histories(db, product_ids, start_month=None, end_month=None, threads=8):
+    """ 여러 상품의 가격 기록을 스레드 풀에서 동시에 읽습니다. Returns: 상품 ID -> 기록 목록 """
+    product_ids = list(dict.fromkeys(product_ids))
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        histories = executor.map(
+            lambda pid: read_price_history(db, pid, start_month, end_month), product_ids
+        )
+        return dict(zip(product_ids, histories))
+
+
+def migrate_price_history(db, page_size=300, dry_run=False, resume=False):
+    """
+    가격 문서 안의 price_history 배열을 월별 버킷 문서로 옮기고 배열 필드를 지웁니다.
+    버킷 쓰기가 모두 커밋된 뒤에만 가격 문서를 갱신하므로, 중간에 실패해도 다시 실행하면 이어서 옮깁니다.
+    (버킷에는 ArrayUnion으로 추가하므로 같은 기록이 두 번 들어가지 않습니다)
+    실패 없이 끝난 페이지까지의 커서를 체크포인트로 남기므로, resume=True면 이미 확인한 문서를 다시 읽지 않습니다.
+    Returns:
+        dict: 확인한 문서 수, 옮긴 문서 수, 옮긴 기록 수, 실패한 쓰기 작업 수
+    """
+    collection_ref = db.collection(PRICE_COLLECTION)
+    query = collection_ref.select([LEGACY_HISTORY_FIELD, "current_price"])
+    checkpoint = ScanCheckpoint("price_history_migrate")
+    cursor = checkpoint.load() if resume and not dry_run else None
+    if cursor:
+        print(f"체크포인트에서 이어서 옮깁니다. (마지막 문서: {cursor[-1]})")
+
+    scanned_count = migrated_count = record_count = 0
+    with BulkWriter(db) as writer:
+        for docs in scan_pages(query, page_size=page_size, cursor=cursor):
+            scanned_count += len(docs)
+
+            to_migrate = []
+            for doc in docs:
+                data = doc.to_dict() or {}
+                legacy_history = data.get(LEGACY_HISTORY_FIELD) or []
+                if legacy_history:
+                    to_migrate.append((doc.id, data, legacy_history))
+            if not to_migrate:
+                if not dry_run and not writer.failed_count:
+                    checkpoint.save(cursor_after(docs[-1]))
+                continue
+            if dry_run:
+                migrated_count += len(to_migrate)
+                record_count += sum(len(history) for _, _, history in to_migrate)
+                continue
+
+            # 1단계: 버킷 문서에 기록 추가
+            failed_before = writer.failed_count
+            for product_id, _, legacy_history in to_migrate:
+                buckets = OrderedDict()
+                for record in legacy_history:
+                    buckets.setdefault(bucket_id(record.get("last_updated")), []).append(record)
+                for month, records in buckets.items():
+                    writer.set(
+                        bucket_collection(db, product_id).document(month),
+                        {"id": product_id, "month": month, "records": firestore.ArrayUnion(records)},
+                        merge=True,
+                    )
+            writer.flush()
+            if writer.failed_count > failed_before:
+                print("경고: 일부 버킷 쓰기가 실패하여 이번 묶음의 가격 문서는 그대로 둡니다. 다시 실행하세요.")
+                continue
+
+            # 2단계: 가격 문서에 현재 가격과 통계를 쓰고 배열 필드 삭제
+            for product_id, data, legacy_history in to_migrate:
+                parent_data = {
+                    "price_stats": _stats_update(legacy_history),
+                    LEGACY_HISTORY_FIELD: firestore.DELETE_FIELD,
+                }
+                if data.get("current_price"):
+                    # 이미 새 구조로 기록된 최신 가격이 있으면 그대로 둡니다.
+                    parent_data["price_stats"].pop("last_changed", None)
+                else:
+                    parent_data["current_price"] = legacy_history[-1]
+                writer.set(collection_ref.document(product_id), parent_data, merge=True)
+                record_count += len(legacy_history)
+            writer.flush()
+            migrated_count += len(to_migrate)
+            # 실패한 페이지가 없을 때만 체크포인트를 옮깁니다. (실패한 페이지는 다음 실행에서 다시 읽음)
+            if not writer.failed_count:
+                checkpoint.save(cursor_after(docs[-1]))
+            print(f"가격 문서 {scanned_count}개 확인, {migrated_count}개 옮김 ({record_count}개 기록)")
+
+    if not dry_run and not writer.failed_count:
+        checkpoint.clear()
+    result = {
+        "scanned": scanned_count,
+        "migrated": migrated_count,
+        "records": record_count,
+        "failed_writes": writer.failed_count,
+    }
+    print(f"\n===== 가격 이력 옮기기 {'(확인만)' if dry_run else ''} 완료: {result} =====")
+    return result
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from firebase_uploader import get_db, initialize_firebase
+    from firestore_metrics import metered_client
+
+    parser = argparse.ArgumentParser(description="이마트몰 가격 이력 월별 버킷 도구")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="옮길 문서 수만 셉니다.")
+    migrate_parser.add_argument("--page-size", type=int, default=300)
+    migrate_parser.add_argument("--resume", action="store_true", help="중단된 곳부터 이어서 옮깁니다.")
+    show_parser = subparsers.add_parser("show")
+    show_parser.add_argument("product_id")
+    show_parser.add_argument("--from", dest="start_month")
+    show_parser.add_argument("--to", dest="end_month")
+    args = parser.parse_args()
+
+    load_dotenv(override=True)
+    initialize_firebase()
+    db = metered_client(get_db(), f"price_history_{args.command}")
+    if args.command == "migrate":
+        migrate_price_history(db, args.page_size, args.dry_run, args.resume)
+    elif args.command == "show":
+        history = read_price_history(db, args.product_id, args.start_month, args.end_month)
+        print(json.dumps(history, ensure_ascii=False, indent=4))
+    db.meter.finish()
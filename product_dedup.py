@@ -0,0 +1,311 @@
+# product_dedup.py
+# 여러 카테고리에 함께 올라온 상품을 상품 ID(itemId) 기준으로 하나로 합치는 도구
+#
+# 합치는 규칙:
+#   - 가격/재고 필드(original_price, selling_price, quantity, out_of_stock, last_updated)는
+#     last_updated가 가장 늦은 기록의 값을 사용합니다.
+#   - 그 밖의 필드(category, product_name, image_url 등)는 우선순위가 가장 높은 카테고리의 기록을 사용하고,
+#     비어 있는 값은 다른 기록에서 채웁니다.
+#   - 카테고리 우선순위는 .env의 EMART_DEDUP_PRECEDENCE(쉼표로 구분한 카테고리 이름)에 적은 순서,
+#     그다음 categories.json에 적힌 순서입니다. 둘 다에 없는 카테고리는 처음 본 순서대로 뒤에 둡니다.
+#   - 합친 기록의 categories에는 상품이 나온 모든 카테고리를 우선순위 순서대로 남깁니다.
+#
+# ProductDeduplicator는 합친 기록을 메모리에 두고(스트리밍 파이프라인용),
+# SqliteProductDeduplicator는 임시 SQLite 파일에 두어 결과 파일이 많아도 메모리 사용량이 일정합니다. (업로더용)
+
+import json
+import os
+import sqlite3
+import tempfile
+
+PRICE_STATE_FIELDS = ("original_price", "selling_price", "quantity", "out_of_stock", "last_updated")
+
+
+def category_order_from_env(filepath="categories.json"):
+    """ 카테고리 우선순위 목록입니다. (EMART_DEDUP_PRECEDENCE, 그다음 categories.json 순서) """
+    order = [
+        name.strip()
+        for name in os.environ.get("EMART_DEDUP_PRECEDENCE", "").split(",")
+        if name.strip()
+    ]
+    if os.path.exists(filepath):
+        try:
+            with open(filepath, "r", encoding="utf-8") as f:
+                order += [name for name in json.load(f) if name not in order]
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"경고: '{filepath}'에서 카테고리 순서를 읽지 못했습니다: {e}")
+    return order
+
+
+def merge_records(merged, primary_rank, record, rank):
+    """
+    지금까지 합친 기록(merged, 우선 카테고리 순위 primary_rank)에 새 기록(record, 카테고리 순위 rank)을 합칩니다.
+    Returns:
+        tuple: (합친 기록, 우선 카테고리 순위)
+    """
+    if rank < primary_rank:
+        base, other = dict(record), merged
+        primary_rank = rank
+    else:
+        base, other = merged, record
+    for key, value in other.items():
+        if base.get(key) in (None, "") and value not in (None, ""):
+            base[key] = value
+    # 가격/재고는 가장 최근에 가져온 기록을 따릅니다.
+    latest = max((merged, record), key=lambda r: r.get("last_updated") or "")
+    for key in PRICE_STATE_FIELDS:
+        if key in latest:
+            base[key] = latest[key]
+    return base, primary_rank
+
+
+class ProductDeduplicator:
+    """
+    한 번의 실행에서 나온 상품 기록을 상품 ID별로 합칩니다. (규칙은 파일 머리말 참고)
+    Args:
+        category_order (list): 카테고리 우선순위 목록입니다. (생략 시 category_order_from_env())
+    """
+
+    def __init__(self, category_order=None):
+        if category_order is None:
+            category_order = category_order_from_env()
+        self._ranks = {name: rank for rank, name in enumerate(category_order)}
+        # 상품 ID -> [합친 기록, 우선 카테고리 순위, 카테고리 목록]
+        self._products = {}
+        self.record_count = 0
+
+    def rank(self, category):
+        """ 카테고리의 우선순위입니다. (작을수록 우선) 처음 보는 카테고리는 목록 뒤에 붙입니다. """
+        if category not in self._ranks:
+            self._ranks[category] = len(self._ranks)
+        return self._ranks[category]
+
+    @property
+    def duplicate_count(self):
+        """ 합쳐져 사라진 기록 수입니다. """
+        return self.record_count - len(self._products)
+
+    def add(self, record, category):
+        """
+        기록 하나를 더합니다.
+        Returns:
+            bool: 이번 실행에서 처음 나온 상품이면 True
+        """
+        product_id = record.get("id")
+        if not product_id:
+            return False
+        self.record_count += 1
+        rank = self.rank(category)
+        entry = self._products.get(product_id)
+        if entry is None:
+            self._products[product_id] = [dict(record), rank, [category]]
+            return True
+
+        merged, primary_rank, categories = entry
+        if category not in categories:
+            categories.append(category)
+        entry[0], entry[1] = merge_records(merged, primary_rank, record, rank)
+        return False
+
+    def categories_of(self, product_id):
+        """ 상품이 나온 카테고리 목록 (우선순위 순서) """
+        entry = self._products.get(product_id)
+        return sorted(entry[2], key=self.rank) if entry else []
+
+    def records(self):
+        """ 합친 기록을 처음 나온 순서대로 돌려줍니다. (categories 필드 포함) """
+        for merged, _, categories in self._products.values():
+            record = dict(merged)
+            record["categories"] = sorted(categories, key=self.rank)
+            if "category" in record:
+                record["category"] = record["categories"][0]
+            yield record
+
+    def multi_category_ids(self):
+        """ 두 개 이상의 카테고리에 나온 상품 ID 목록입니다. """
+        return [pid for pid, entry in self._products.items() if len(entry[2]) > 1]
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    record TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    primary_category TEXT NOT NULL,
+    categories TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS products_by_primary ON products (primary_category, seq);
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT NOT NULL,
+    id TEXT NOT NULL,
+    PRIMARY KEY (source, id)
+) WITHOUT ROWID;
+"""
+
+# SQLite 한 쿼리에 넣을 값 수 (변수 개수 제한보다 작게)
+_QUERY_CHUNK = 500
+
+
+class SqliteProductDeduplicator(ProductDeduplicator):
+    """
+    ProductDeduplicator와 같은 규칙으로 합치되, 합친 기록을 임시 SQLite 파일에 두어
+    메모리에는 카테고리 순위만 남깁니다. 기록이 어느 결과 파일(source)에서 왔는지도 함께 남겨,
+    업로드가 끝난 뒤 파일별로 지워도 되는지 알 수 있습니다.
+    records()는 호출한 스레드에서 따로 연결을 열어 읽으므로 작업 스레드에서 바로 사용할 수 있습니다.
+    Args:
+        category_order (list): 카테고리 우선순위 목록입니다. (생략 시 category_order_from_env())
+        path (str): SQLite 파일 경로입니다. 생략하면 임시 파일을 만들고 close() 때 지웁니다.
+    """
+
+    def __init__(self, category_order=None, path=None):
+        super().__init__(category_order)
+        self._owns_file = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="emart_dedup_", suffix=".sqlite3")
+            os.close(fd)
+        self.path = path
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.executescript(SQLITE_SCHEMA)
+        self._product_count = 0
+
+    def close(self):
+        self._conn.close()
+        if self._owns_file:
+            for suffix in ("", "-journal", "-wal", "-shm"):
+                try:
+                    os.remove(self.path + suffix)
+                except FileNotFoundError:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    @property
+    def duplicate_count(self):
+        return self.record_count - self._product_count
+
+    def add(self, record, category, source=None):
+        """
+        기록 하나를 더합니다. 쓰기는 flush()를 호출할 때 한꺼번에 커밋합니다.
+        Args:
+            source (str): 기록이 나온 결과 파일 경로입니다.
+        Returns:
+            bool: 이번 실행에서 처음 나온 상품이면 True
+        """
+        product_id = record.get("id")
+        if not product_id:
+            return False
+        self.record_count += 1
+        rank = self.rank(category)
+        if source is not None:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO sources (source, id) VALUES (?, ?)", (source, product_id)
+            )
+        row = self._conn.execute(
+            "SELECT record, rank, primary_category, categories FROM products WHERE id = ?", (product_id,)
+        ).fetchone()
+        if row is None:
+            self._conn.execute(
+                "INSERT INTO products (id, seq, record, rank, primary_category, categories)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    product_id,
+                    self._product_count,
+                    json.dumps(record, ensure_ascii=False),
+                    rank,
+                    category,
+                    json.dumps([category], ensure_ascii=False),
+                ),
+            )
+            self._product_count += 1
+            return True
+
+        merged, primary_rank = merge_records(json.loads(row[0]), row[1], record, rank)
+        primary_category = category if primary_rank < row[1] else row[2]
+        categories = json.loads(row[3])
+        if category not in categories:
+            categories.append(category)
+        self._conn.execute(
+            "UPDATE products SET record = ?, rank = ?, primary_category = ?, categories = ? WHERE id = ?",
+            (
+                json.dumps(merged, ensure_ascii=False),
+                primary_rank,
+                primary_category,
+                json.dumps(categories, ensure_ascii=False),
+                product_id,
+            ),
+        )
+        return False
+
+    def flush(self):
+        """ 지금까지 더한 기록을 SQLite 파일에 커밋합니다. """
+        self._conn.commit()
+
+    def categories_of(self, product_id):
+        row = self._conn.execute("SELECT categories FROM products WHERE id = ?", (product_id,)).fetchone()
+        return sorted(json.loads(row[0]), key=self.rank) if row else []
+
+    def group_sizes(self):
+        """ 우선 카테고리 -> 상품 수 """
+        return dict(
+            self._conn.execute(
+                "SELECT primary_category, COUNT(*) FROM products GROUP BY primary_category ORDER BY MIN(seq)"
+            ).fetchall()
+        )
+
+    def records(self, primary_category=None):
+        """
+        합친 기록을 처음 나온 순서대로 돌려줍니다. primary_category를 주면 그 카테고리가 우선인 상품만 돌려줍니다.
+        (categories 필드 포함, 호출한 스레드에서 새 연결로 읽습니다)
+        """
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            if primary_category is None:
+                cursor = conn.execute("SELECT record, categories FROM products ORDER BY seq")
+            else:
+                cursor = conn.execute(
+                    "SELECT record, categories FROM products WHERE primary_category = ? ORDER BY seq",
+                    (primary_category,),
+                )
+            while True:
+                rows = cursor.fetchmany(_QUERY_CHUNK)
+                if not rows:
+                    break
+                for record_json, categories_json in rows:
+                    record = json.loads(record_json)
+                    record["categories"] = sorted(json.loads(categories_json), key=self.rank)
+                    if "category" in record:
+                        record["category"] = record["categories"][0]
+                    yield record
+        finally:
+            conn.close()
+
+    def multi_category_ids(self):
+        return [
+            row[0]
+            for row in self._conn.execute(
+                "SELECT id FROM products WHERE json_array_length(categories) > 1 ORDER BY seq"
+            )
+        ]
+
+    def ids_in_groups(self, source, primary_categories):
+        """ source 파일에 나온 상품 가운데 우선 카테고리가 primary_categories에 드는 상품 ID 집합입니다. """
+        primary_categories = list(primary_categories)
+        ids = set()
+        for start in range(0, len(primary_categories), _QUERY_CHUNK):
+            chunk = primary_categories[start:start + _QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            ids.update(
+                row[0]
+                for row in self._conn.execute(
+                    "SELECT s.id FROM sources s JOIN products p ON p.id = s.id"
+                    f" WHERE s.source = ? AND p.primary_category IN ({placeholders})",
+                    [source, *chunk],
+                )
+            )
+        return ids
@@ -0,0 +1,145 @@
+# rate_limiter.py
+# 호스트별 AIMD(가산 증가/승산 감소) 토큰 버킷 요청 속도 제한기
+
+import email.utils
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+
+class AdaptiveRateLimiter:
+    """
+    스레드 안전한 토큰 버킷 속도 제한기입니다.
+    정상 응답이 이어지면 초당 요청 수를 조금씩 늘리고(가산 증가),
+    429/5xx 응답을 받으면 절반으로 줄입니다(승산 감소).
+    Retry-After가 주어지면 그 시간 동안 새 요청을 내보내지 않습니다.
+    Args:
+        initial_rate (float): 시작 속도(초당 요청 수)입니다.
+        min_rate (float): 속도 하한입니다.
+        max_rate (float): 속도 상한입니다.
+        increase (float): 정상 응답이 1초 동안 이어질 때마다 늘릴 속도입니다.
+        decrease_factor (float): 제한 응답을 받았을 때 곱할 비율입니다.
+        burst (float): 버킷에 모아둘 수 있는 최대 토큰 수입니다.
+    """
+
+    def __init__(
+        self,
+        initial_rate=2.0,
+        min_rate=0.2,
+        max_rate=10.0,
+        increase=0.2,
+        decrease_factor=0.5,
+        burst=2.0,
+    ):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.burst = burst
+        self._rate = min(max(initial_rate, min_rate), max_rate)
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._cooldown_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self.success_count = 0
+        self.throttle_count = 0
+
+    @property
+    def current_rate(self):
+        """ 현재 허용 속도(초당 요청 수)입니다. """
+        return self._rate
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._tokens = min(self.burst, self._tokens + elapsed * self._rate)
+
+    def acquire(self, cost=1):
+        """
+        요청을 보낼 수 있을 때까지 대기한 뒤 토큰 cost개를 사용합니다.
+        cost가 버킷보다 크면 토큰을 빚으로 가져가고, 다음 요청이 그만큼 더 기다립니다.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._cooldown_until:
+                    wait_time = self._cooldown_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= cost
+                    return
+                else:
+                    wait_time = (1 - self._tokens) / self._rate
+            time.sleep(wait_time)
+
+    def on_success(self):
+        """ 정상 응답: 속도를 가산적으로 늘립니다. """
+        with self._lock:
+            self.success_count += 1
+            self._rate = min(self.max_rate, self._rate + self.increase / self._rate)
+
+    def on_throttle(self, retry_after=None):
+        """
+        429/5xx 응답: 속도를 승산적으로 줄이고, Retry-After가 있으면 그동안 요청을 멈춥니다.
+        같은 순간에 몰려온 여러 제한 응답으로 속도가 연쇄적으로 떨어지지 않도록
+        감소는 1초에 한 번만 적용합니다.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.throttle_count += 1
+            if now - self._last_decrease >= 1.0:
+                self._rate = max(self.min_rate, self._rate * self.decrease_factor)
+                self._last_decrease = now
+            if retry_after:
+                self._cooldown_until = max(self._cooldown_until, now + retry_after)
+            self._tokens = min(self._tokens, 0.0)
+
+    def snapshot(self):
+        return {
+            "rate": round(self._rate, 3),
+            "successes": self.success_count,
+            "throttled": self.throttle_count,
+        }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(host):
+    """ 호스트별 공유 속도 제한기를 반환합니다. 설정은 .env의 EMART_RATE_* 값을 사용합니다. """
+    with _limiters_lock:
+        if host not in _limiters:
+            _limiters[host] = AdaptiveRateLimiter(
+                initial_rate=float(os.environ.get("EMART_RATE_INITIAL", 2.0)),
+                min_rate=float(os.environ.get("EMART_RATE_MIN", 0.2)),
+                max_rate=float(os.environ.get("EMART_RATE_MAX", 10.0)),
+            )
+        return _limiters[host]
+
+
+def snapshot():
+    """ 모든 호스트의 현재 속도와 응답 통계를 반환합니다. """
+    with _limiters_lock:
+        return {host: limiter.snapshot() for host, limiter in _limiters.items()}
+
+
+def parse_retry_after(value):
+    """
+    Retry-After 헤더 값을 대기 초로 변환합니다. (초 단위 숫자 또는 HTTP 날짜 형식)
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
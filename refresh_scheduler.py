@@ -0,0 +1,455 @@
+# refresh_scheduler.py
+# 상품마다 가격/재고 변동성에 맞춘 주기로 상세 페이지를 다시 확인하는 갱신 스케줄러
+#
+# 상품별 확인 주기와 다음 확인 시각은 로컬 SQLite 파일(EMART_REFRESH_DB)에 보관합니다.
+# next_due 색인이 우선순위 큐 역할을 하여, 한 번 실행할 때마다 확인 시각이 가장 이른 상품부터
+# 시간당 요청 예산(EMART_REFRESH_BUDGET_PER_HOUR)만큼만 상세 페이지를 가져옵니다.
+#
+# 주기 정하기:
+#   - 처음 등록할 때는 최근 EMART_REFRESH_HISTORY_MONTHS개월의 가격 변경 기록(price_history_monthly)에서
+#     평균 변경 간격을 구하고, 그 절반을 주기로 합니다. (기록이 없으면 EMART_REFRESH_DEFAULT_HOURS)
+#   - 확인할 때마다 가격이나 재고(out_of_stock)가 바뀌었으면 주기를 절반으로 줄이고, 그대로면 1.5배로 늘립니다.
+#   - 주기는 EMART_REFRESH_MIN_HOURS ~ EMART_REFRESH_MAX_HOURS 사이로 제한합니다.
+#
+# 사용법:
+#   python refresh_scheduler.py run [--budget N]   # 확인할 때가 된 상품을 예산만큼 갱신 (정기 작업: 매시 45분)
+#   python refresh_scheduler.py seed               # Firestore의 가격 문서에서 새 상품을 등록
+#   python refresh_scheduler.py status             # 주기별 상품 수와 지금 확인할 상품 수
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from dotenv import load_dotenv
+
+from firebase_uploader import get_db, initialize_firebase, update_price_history
+from firestore_bulk import BulkWriter, get_documents, scan_pages
+from firestore_metrics import metered_client
+from price_history import PRICE_COLLECTION, last_price_from_doc, read_price_histories
+from scrape_by_id import iter_products_by_ids
+from update_old_products import delete_products
+from upload_state import open_state_store
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id TEXT PRIMARY KEY,
+    interval REAL NOT NULL,
+    next_due REAL NOT NULL,
+    last_checked REAL,
+    original_price TEXT,
+    selling_price TEXT,
+    out_of_stock TEXT,
+    checks INTEGER NOT NULL DEFAULT 0,
+    changes INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS products_by_due ON products (next_due);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# 확인할 때마다 주기에 곱할 비율 (바뀌었을 때 / 그대로일 때)
+CHANGED_FACTOR = 0.5
+UNCHANGED_FACTOR = 1.5
+
+
+def refresh_settings_from_env():
+    """ .env의 EMART_REFRESH_* 설정입니다. (주기는 초 단위로 바꿔 돌려줍니다) """
+    return {
+        "db_path": os.environ.get("EMART_REFRESH_DB", "refresh_schedule.sqlite3"),
+        "budget_per_hour": int(os.environ.get("EMART_REFRESH_BUDGET_PER_HOUR", 300)),
+        "min_interval": float(os.environ.get("EMART_REFRESH_MIN_HOURS", 1)) * 3600,
+        "max_interval": float(os.environ.get("EMART_REFRESH_MAX_HOURS", 168)) * 3600,
+        "default_interval": float(os.environ.get("EMART_REFRESH_DEFAULT_HOURS", 24)) * 3600,
+        "history_months": int(os.environ.get("EMART_REFRESH_HISTORY_MONTHS", 3)),
+        "reseed_hours": float(os.environ.get("EMART_REFRESH_RESEED_HOURS", 24)),
+        "time_budget": float(os.environ.get("EMART_REFRESH_TIME_BUDGET", 3000)),
+    }
+
+
+def interval_from_history(records, settings, now=None):
+    """
+    가격 변경 기록(시간 순서)에서 확인 주기(초)를 정합니다. 평균 변경 간격의 절반이며, 기록이 두 개보다 적으면 기본 주기입니다.
+    예전 갱신 작업은 가격이 그대로여도 기록을 남겼으므로, 바로 앞 기록과 가격이 같은 기록은 변경으로 세지 않습니다.
+    """
+    now = now or time.time()
+    times = []
+    previous_price = None
+    for record in records:
+        price = (record.get("original_price"), record.get("selling_price"))
+        if price == previous_price:
+            continue
+        previous_price = price
+        try:
+            times.append(datetime.fromisoformat(record.get("last_updated")).timestamp())
+        except (TypeError, ValueError):
+            continue
+    if len(times) < 2:
+        interval = settings["default_interval"]
+    else:
+        # 마지막 변경 뒤로 지난 시간도 관찰 기간에 넣어, 한동안 바뀌지 않은 상품은 주기가 길어지게 합니다.
+        span = max(now, times[-1]) - times[0]
+        interval = span / (len(times) - 1) / 2
+    return min(settings["max_interval"], max(settings["min_interval"], interval))
+
+
+def next_interval(interval, changed, settings):
+    """ 확인 결과에 따라 다음 주기(초)를 정합니다. """
+    interval *= CHANGED_FACTOR if changed else UNCHANGED_FACTOR
+    return min(settings["max_interval"], max(settings["min_interval"], interval))
+
+
+class RefreshScheduleStore:
+    """
+    상품별 확인 주기, 다음 확인 시각, 마지막으로 확인한 가격/재고를 저장합니다.
+    Args:
+        path (str): SQLite 파일 경로입니다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def known_ids(self, ids):
+        """ ids 가운데 이미 등록된 ID 집합입니다. """
+        ids = list(ids)
+        known = set()
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            known.update(
+                row[0]
+                for row in self._conn.execute(
+                    f"SELECT id FROM products WHERE id IN ({placeholders})", chunk
+                )
+            )
+        return known
+
+    def add(self, entries):
+        """
+        새 상품을 등록합니다. 처음 확인 시각은 주기 안에서 고르게 흩어, 한 시간에 요청이 몰리지 않게 합니다.
+        entries: (ID, 주기, 마지막 가격 dict, 재고) 목록
+        """
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO products"
+                " (id, interval, next_due, original_price, selling_price, out_of_stock)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        pid,
+                        interval,
+                        now + random.uniform(0, interval),
+                        (last_price or {}).get("original_price"),
+                        (last_price or {}).get("selling_price"),
+                        out_of_stock,
+                    )
+                    for pid, interval, last_price, out_of_stock in entries
+                ],
+            )
+
+    def all_ids(self):
+        return {row[0] for row in self._conn.execute("SELECT id FROM products")}
+
+    def remove(self, ids):
+        with self._conn:
+            self._conn.executemany("DELETE FROM products WHERE id = ?", [(pid,) for pid in ids])
+
+    def due(self, limit, now=None):
+        """ 확인 시각이 지난 상품을 가장 이른 것부터 limit개 돌려줍니다. """
+        return self._conn.execute(
+            "SELECT * FROM products WHERE next_due <= ? ORDER BY next_due LIMIT ?",
+            (now or time.time(), limit),
+        ).fetchall()
+
+    def record_checks(self, results):
+        """ results: (ID, 새 주기, 바뀌었는지, 가격 dict 또는 None, 재고 또는 None) 목록 """
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE products SET interval = ?, next_due = ?, last_checked = ?,"
+                " original_price = COALESCE(?, original_price), selling_price = COALESCE(?, selling_price),"
+                " out_of_stock = COALESCE(?, out_of_stock), checks = checks + 1, changes = changes + ?"
+                " WHERE id = ?",
+                [
+                    (
+                        interval,
+                        now + interval,
+                        now,
+                        (price or {}).get("original_price"),
+                        (price or {}).get("selling_price"),
+                        out_of_stock,
+                        1 if changed else 0,
+                        pid,
+                    )
+                    for pid, interval, changed, price, out_of_stock in results
+                ],
+            )
+
+    def postpone(self, ids, seconds):
+        """ 확인에 실패한 상품을 seconds초 뒤에 다시 확인합니다. (주기는 그대로) """
+        next_due = time.time() + seconds
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE products SET next_due = ? WHERE id = ?", [(next_due, pid) for pid in ids]
+            )
+
+    def get_meta(self, key):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def stats(self):
+        now = time.time()
+        buckets = {}
+        for row in self._conn.execute("SELECT interval FROM products"):
+            hours = row[0] / 3600
+            label = "1시간 이하" if hours <= 1 else "6시간 이하" if hours <= 6 else "하루 이하" if hours <= 24 else "하루 초과"
+            buckets[label] = buckets.get(label, 0) + 1
+        total, due_now, checks, changes = self._conn.execute(
+            "SELECT COUNT(*), SUM(next_due <= ?), SUM(checks), SUM(changes) FROM products", (now,)
+        ).fetchone()
+        return {
+            "path": self.path,
+            "products": total,
+            "due_now": due_now or 0,
+            "checks": checks or 0,
+            "changes": changes or 0,
+            "intervals": buckets,
+            "seeded_at": self.get_meta("seeded_at"),
+        }
+
+
+def seed_from_firestore(db, store, settings=None, chunk_size=300):
+    """
+    가격 문서를 커서로 훑어 아직 등록되지 않은 상품만 등록합니다. 새 상품은 최근 가격 변경 기록으로 첫 주기를 정합니다.
+    이미 등록된 상품의 주기는 그대로 두고, 가격 문서가 지워진 상품(품절 삭제 등)은 스케줄에서 뺍니다.
+    Returns:
+        int: 새로 등록한 상품 수
+    """
+    settings = settings or refresh_settings_from_env()
+    start_month = (datetime.now() - timedelta(days=31 * settings["history_months"])).strftime("%Y-%m")
+    query = db.collection(PRICE_COLLECTION).select(["current_price", "price_history", "out_of_stock"])
+    added_count = 0
+    seen_ids = set()
+    for docs in scan_pages(query, page_size=chunk_size):
+        seen_ids.update(doc.id for doc in docs)
+        known = store.known_ids(doc.id for doc in docs)
+        new_docs = [doc for doc in docs if doc.id not in known]
+        if not new_docs:
+            continue
+        histories = read_price_histories(db, [doc.id for doc in new_docs], start_month)
+        entries = []
+        for doc in new_docs:
+            data = doc.to_dict() or {}
+            entries.append(
+                (
+                    doc.id,
+                    interval_from_history(histories.get(doc.id, []), settings),
+                    last_price_from_doc(data),
+                    data.get("out_of_stock"),
+                )
+            )
+        store.add(entries)
+        added_count += len(entries)
+        print(f"갱신 스케줄에 새 상품 {added_count}개를 등록했습니다.")
+    removed_ids = store.all_ids() - seen_ids
+    if removed_ids:
+        store.remove(removed_ids)
+        print(f"가격 문서가 없는 상품 {len(removed_ids)}개를 갱신 스케줄에서 뺐습니다.")
+    store.set_meta("seeded_at", datetime.now().isoformat(timespec="seconds"))
+    return added_count
+
+
+def _seed_is_due(store, settings):
+    seeded_at = store.get_meta("seeded_at")
+    if not seeded_at:
+        return True
+    age = datetime.now() - datetime.fromisoformat(seeded_at)
+    return age.total_seconds() >= settings["reseed_hours"] * 3600
+
+
+def run_refresh(budget=None):
+    """
+    확인할 때가 된 상품을 우선순위(다음 확인 시각) 순서로 예산만큼 상세 페이지에서 다시 가져와 Firestore에 반영하고,
+    가격/재고 변동에 따라 상품별 주기를 조정합니다. 마지막 등록 후 EMART_REFRESH_RESEED_HOURS가 지났으면
+    먼저 새 상품을 등록합니다.
+    오래된 상품 갱신(update_old_products.py)과 같은 규칙으로 상품 문서의 last_updated를 갱신하여 같은 상품을
+    두 작업이 다시 가져오지 않게 하고, 품절 상품은 모든 컬렉션에서 삭제한 뒤 스케줄에서 뺍니다.
+    가격만 올린 상품(상품 문서가 없는 상품)은 가격 문서만 갱신합니다.
+    Args:
+        budget (int): 이번 실행에서 보낼 최대 상세 페이지 요청 수 (기본값: EMART_REFRESH_BUDGET_PER_HOUR)
+    Returns:
+        dict: 상태와 확인/변경/실패한 상품 수
+    """
+    load_dotenv(override=True)
+    settings = refresh_settings_from_env()
+    budget = settings["budget_per_hour"] if budget is None else budget
+    try:
+        initialize_firebase()
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+    db = metered_client(get_db(), "refresh_scheduler")
+    store = RefreshScheduleStore(settings["db_path"])
+    state_store = open_state_store()
+    try:
+        if _seed_is_due(store, settings):
+            print("갱신 스케줄에 새 상품을 등록합니다...")
+            seed_from_firestore(db, store, settings)
+
+        due_rows = store.due(budget) if budget > 0 else []
+        if not due_rows:
+            print("지금 확인할 상품이 없습니다.")
+            return {"status": "success", "checked": 0, "changed": 0, "failed": 0}
+        print(f"===== 변동성 기반 갱신 시작: {len(due_rows)}개 상품 (예산 {budget}개) =====")
+
+        rows_by_id = {row["id"]: row for row in due_rows}
+        # 업로더가 더 최근 가격을 알고 있으면 그 가격과 비교합니다. (같은 변경을 두 번 기록하지 않도록)
+        known_prices = state_store.get_prices(rows_by_id) if state_store else {}
+        deadline = time.monotonic() + settings["time_budget"] if settings["time_budget"] > 0 else None
+
+        checks = []
+        failed_ids = []
+        sold_out_ids = []
+        checked_prices = {}
+        product_collection_ref = db.collection("emart_product")
+        # 스케줄은 가격 문서에서 등록하므로 상품 문서가 없는 상품(가격만 올린 상품)도 있습니다.
+        # 없는 문서를 update하면 같은 배치의 쓰기가 모두 실패하므로, 상품 문서가 있는 상품만 last_updated를 갱신합니다.
+        product_doc_ids = {
+            pid
+            for pid, data in get_documents(db, "emart_product", list(rows_by_id), field_paths=["last_updated"]).items()
+            if data is not None
+        }
+        with BulkWriter(db) as writer:
+            for product_id, data in iter_products_by_ids(list(rows_by_id), deadline=deadline):
+                row = rows_by_id[product_id]
+                if not data:
+                    failed_ids.append(product_id)
+                    continue
+                if data.get("out_of_stock") == "Y":
+                    sold_out_ids.append(product_id)
+                    print(f"  -> ID: {product_id} 품절로 간주되어 삭제됩니다.")
+                    continue
+                last_price = known_prices.get(product_id) or {
+                    "original_price": row["original_price"],
+                    "selling_price": row["selling_price"],
+                }
+                price_info = {
+                    "original_price": data["original_price"],
+                    "selling_price": data["selling_price"],
+                    "last_updated": data["last_updated"],
+                }
+                status = update_price_history(
+                    writer, db, last_price, product_id, data["out_of_stock"],
+                    data["quantity"], data["last_updated"], price_info,
+                )
+                if product_id in product_doc_ids:
+                    writer.update(product_collection_ref.document(product_id), {"last_updated": data["last_updated"]})
+                stock_flipped = row["out_of_stock"] is not None and row["out_of_stock"] != data["out_of_stock"]
+                changed = status == "updated" or stock_flipped
+                checks.append(
+                    (
+                        product_id,
+                        next_interval(row["interval"], changed, settings),
+                        changed,
+                        price_info,
+                        data["out_of_stock"],
+                    )
+                )
+                checked_prices[product_id] = price_info
+
+            # 품절 상품은 갱신 쓰기와 같은 writer로 한꺼번에 지웁니다.
+            delete_result = delete_products(db, sold_out_ids, writer) if sold_out_ids else {"failed": 0}
+
+        if sold_out_ids:
+            if state_store:
+                state_store.forget(sold_out_ids)
+            if delete_result["failed"]:
+                # 남은 문서는 다음 등록이나 다음 확인에서 다시 처리합니다.
+                store.postpone(sold_out_ids, settings["min_interval"])
+            else:
+                store.remove(sold_out_ids)
+
+        if writer.failed_count:
+            # 어떤 쓰기가 반영됐는지 알 수 없으므로 주기는 바꾸지 않고 곧 다시 확인합니다.
+            print(f"경고: {writer.failed_count}개 쓰기 작업이 실패하여 이번 확인 결과를 저장하지 않습니다.")
+            store.postpone(set(rows_by_id) - set(sold_out_ids), settings["min_interval"])
+            if state_store:
+                state_store.forget(checked_prices)
+            return {"status": "error", "error": f"{writer.failed_count}개 쓰기 작업이 실패했습니다."}
+
+        store.record_checks(checks)
+        store.postpone(failed_ids, settings["min_interval"])
+        if state_store:
+            state_store.record_prices(checked_prices)
+        changed_count = sum(1 for check in checks if check[2])
+        result = {
+            "status": "success",
+            "checked": len(checks),
+            "changed": changed_count,
+            "deleted": len(sold_out_ids),
+            "failed": len(failed_ids),
+            "skipped": len(due_rows) - len(checks) - len(sold_out_ids) - len(failed_ids),
+        }
+        print(
+            f"===== 변동성 기반 갱신 완료: 확인 {result['checked']}개, 변동 {changed_count}개, "
+            f"품절 삭제 {result['deleted']}개, 실패 {result['failed']}개, 시간 부족으로 미룸 {result['skipped']}개 ====="
+        )
+        return result
+    except Exception as e:
+        print(f"변동성 기반 갱신 중 오류가 발생했습니다: {e}")
+        return {"status": "error", "error": str(e)}
+    finally:
+        store.close()
+        if state_store:
+            state_store.close()
+        db.meter.finish()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="이마트몰 변동성 기반 상품 갱신 스케줄러")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run")
+    run_parser.add_argument("--budget", type=int, default=None, help="이번 실행의 최대 요청 수")
+    subparsers.add_parser("seed")
+    subparsers.add_parser("status")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        print(run_refresh(args.budget))
+    else:
+        load_dotenv(override=True)
+        settings = refresh_settings_from_env()
+        with RefreshScheduleStore(settings["db_path"]) as store:
+            if args.command == "seed":
+                initialize_firebase()
+                db = metered_client(get_db(), "refresh_scheduler_seed")
+                print(f"새 상품 {seed_from_firestore(db, store, settings)}개를 등록했습니다.")
+                db.meter.finish()
+            else:
+                print(json.dumps(store.stats(), ensure_ascii=False, indent=4))
@@ -1,80 +1,129 @@
 # id 입력 >> 사이트 스크래핑해서 가격 정보의 문자열 출력
 
+import http_client
 import requests
 from bs4 import BeautifulSoup
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
 import json
-import sys
+import os
+import random
 import time
-from typing import List, Dict, Union
+from typing import Dict, Iterable, Iterator, List, Tuple, Union
+from parse_pool import create_parse_pool, parse_queue_size_from_env
 
+ITEM_PAGE_URL = "https://emart.ssg.com/item/itemView.ssg?itemId={product_id}"
 
-def scrape_single_product(product_id: str) -> Union[Dict, None]:
+
+def parse_product_detail(html_content: str, product_id: str) -> Dict:
     """
-    [수정됨] 가격 뒤에 붙는 '원' 글자를 제거합니다.
+    상품 상세 페이지(itemView.ssg) HTML에서 가격/용량/품절 정보를 추출합니다.
+    가격 뒤에 붙는 '원' 글자는 제거합니다.
     """
-    url = f"https://emart.ssg.com/item/itemView.ssg?itemId={product_id}"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
+    soup = BeautifulSoup(html_content, "html.parser")
 
-    print(f"ID: {product_id} 스크래핑 시작...")
+    # 할인가
+    selling_price_tag = soup.select_one("span.cdtl_new_price.notranslate > em")
+    selling_price = (
+        selling_price_tag.get_text(strip=True).replace(",", "").replace("원", "")
+        if selling_price_tag
+        else None
+    )
 
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        # --- [핵심 수정] ---
-
-        # 할인가
-        selling_price_tag = soup.select_one("span.cdtl_new_price.notranslate > em")
-        selling_price = (
-            selling_price_tag.get_text(strip=True).replace(",", "").replace("원", "")
-            if selling_price_tag
-            else None
-        )
+    # 원가 (할인 표시가 없는 상품은 정상가 자리에 cdtl_first_price를 씁니다)
+    original_price_tag = soup.select_one("span.cdtl_old_price > em")
+    if not original_price_tag:
+        original_price_tag = soup.select_one("span.cdtl_first_price > em")
+    original_price = (
+        original_price_tag.get_text(strip=True).replace(",", "").replace("원", "")
+        if original_price_tag
+        else None
+    )
 
-        # 원가
-        original_price_tag = soup.select_one("span.cdtl_old_price > em")
-        original_price = (
-            original_price_tag.get_text(strip=True).replace(",", "").replace("원", "")
-            if original_price_tag
-            else None
+    # 가격 교차 보정 로직
+    if original_price and not selling_price:
+        selling_price = original_price
+    elif selling_price and not original_price:
+        original_price = selling_price
+    elif not original_price and not selling_price:
+        price_tag = soup.select_one(".cdtl_row_price em.ssg_price")
+        price = (
+            price_tag.get_text(strip=True).replace(",", "").replace("원", "")
+            if price_tag
+            else "0"
         )
+        original_price = price
+        selling_price = price
+
+    # 용량/단위 정보
+    quantity_tag = soup.select_one("div.cdtl_optprice_wrap > p.cdtl_txt_info")
+    quantity = (
+        " ".join(quantity_tag.get_text(strip=True).split()) if quantity_tag else ""
+    )
+
+    # 품절 정보
+    out_of_stock = "Y" if "품절" in str(soup.select_one(".cdtl_btn_wrap3")) else "N"
 
-        # 가격 교차 보정 로직
-        if original_price and not selling_price:
-            selling_price = original_price
-        elif selling_price and not original_price:
-            original_price = selling_price
-        elif not original_price and not selling_price:
-            price_tag = soup.select_one(".cdtl_row_price em.ssg_price")
-            price = (
-                price_tag.get_text(strip=True).replace(",", "").replace("원", "")
-                if price_tag
-                else "0"
+    return {
+        "id": product_id,
+        "original_price": original_price,
+        "selling_price": selling_price,
+        "quantity": quantity,
+        "out_of_stock": out_of_stock,
+        "last_updated": datetime.now().isoformat(),
+    }
+
+
+def fetch_product_html(
+    product_id: str, max_attempts: int = None, backoff: float = None
+) -> str:
+    """
+    상품 상세 페이지 HTML을 가져옵니다. 연결 오류와 타임아웃은
+    지수 백오프(backoff, backoff*2, ...초 + 임의 지연)로 max_attempts번까지 시도하고,
+    그래도 실패하면 마지막 예외를 그대로 발생시킵니다.
+    429/5xx 응답은 http_client.request가 속도 제한기를 거쳐 이미 다시 시도하므로 여기서는 다시 시도하지 않습니다.
+    기본값은 .env의 EMART_ID_MAX_ATTEMPTS(3), EMART_ID_RETRY_BACKOFF(1.0)입니다.
+    """
+    if max_attempts is None:
+        max_attempts = int(os.environ.get("EMART_ID_MAX_ATTEMPTS", 3))
+    if backoff is None:
+        backoff = float(os.environ.get("EMART_ID_RETRY_BACKOFF", 1.0))
+    url = ITEM_PAGE_URL.format(product_id=product_id)
+
+    attempt = 1
+    while True:
+        try:
+            response = http_client.get(url)
+            response.raise_for_status()
+            return response.text
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= max_attempts:
+                raise
+            wait_time = backoff * 2 ** (attempt - 1) + random.uniform(0, backoff)
+            print(
+                f"  -> ID: {product_id} 요청 실패({e}). {wait_time:.1f}초 후 다시 시도합니다. ({attempt}/{max_attempts})"
             )
-            original_price = price
-            selling_price = price
+            time.sleep(wait_time)
+            attempt += 1
 
-        # 용량/단위 정보
-        quantity_tag = soup.select_one("div.cdtl_optprice_wrap > p.cdtl_txt_info")
-        quantity = (
-            " ".join(quantity_tag.get_text(strip=True).split()) if quantity_tag else ""
-        )
 
-        # 품절 정보
-        out_of_stock = "Y" if "품절" in str(soup.select_one(".cdtl_btn_wrap3")) else "N"
+def fetch_product_detail(
+    product_id: str, max_attempts: int = None, backoff: float = None
+) -> Dict:
+    """ 상품 상세 페이지를 가져와 파싱합니다. (재시도 규칙은 fetch_product_html과 같음) """
+    html_content = fetch_product_html(product_id, max_attempts, backoff)
+    return parse_product_detail(html_content, product_id)
 
-        product_data = {
-            "id": product_id,
-            "original_price": original_price,
-            "selling_price": selling_price,
-            "quantity": quantity,
-            "out_of_stock": out_of_stock,
-            "last_updated": datetime.now().isoformat(),
-        }
+
+def scrape_single_product(product_id: str) -> Union[Dict, None]:
+    """
+    [수정됨] 가격 뒤에 붙는 '원' 글자를 제거합니다.
+    """
+    print(f"ID: {product_id} 스크래핑 시작...")
+
+    try:
+        product_data = fetch_product_detail(product_id)
 
         print(f"  -> ID: {product_id} 스크래핑 완료.")
         return product_data
@@ -84,28 +133,154 @@ def scrape_single_product(product_id: str) -> Union[Dict, None]:
         return None
 
 
-def scrape_products_by_ids(product_ids: List[str]) -> List[Dict]:
-    # ... (이 함수는 수정할 필요가 없습니다) ...
-    if not isinstance(product_ids, list):
-        return []
-    all_products_data = []
+def _fetch_html_or_none(product_id: str) -> Union[str, None]:
+    """ 파이프라인의 네트워크 단계: 실패하면 오류를 출력하고 None을 반환합니다. """
+    print(f"ID: {product_id} 스크래핑 시작...")
+    try:
+        return fetch_product_html(product_id)
+    except Exception as e:
+        print(f"  -> 오류: ID {product_id} 정보 파싱 중 문제 발생: {e}")
+        return None
+
+
+def _parse_html_or_none(html_content: str, product_id: str) -> Union[Dict, None]:
+    """ 파이프라인의 파싱 단계 (파서 워커 프로세스에서 실행됩니다) """
+    try:
+        product_data = parse_product_detail(html_content, product_id)
+        print(f"  -> ID: {product_id} 스크래핑 완료.")
+        return product_data
+    except Exception as e:
+        print(f"  -> 오류: ID {product_id} 정보 파싱 중 문제 발생: {e}")
+        return None
+
+
+def _fetch_then_parse(fetch_executor, parse_pool, product_id: str) -> Future:
+    """
+    스레드에서 HTML을 가져온 뒤 파서 프로세스 풀에 넘기고, 파싱 결과를 담을 Future를 반환합니다.
+    네트워크 스레드는 HTML을 넘기자마자 다음 ID를 가져오러 갑니다.
+    """
+    result = Future()
+
+    def on_parsed(parse_future):
+        try:
+            result.set_result(parse_future.result())
+        except Exception as e:
+            print(f"  -> 오류: ID {product_id} 정보 파싱 중 문제 발생: {e}")
+            result.set_result(None)
+
+    def on_fetched(fetch_future):
+        html_content = fetch_future.result()
+        if html_content is None:
+            result.set_result(None)
+            return
+        try:
+            parse_pool.submit(_parse_html_or_none, html_content, product_id).add_done_callback(
+                on_parsed
+            )
+        except Exception as e:
+            print(f"  -> 오류: ID {product_id} 정보 파싱 중 문제 발생: {e}")
+            result.set_result(None)
+
+    fetch_executor.submit(_fetch_html_or_none, product_id).add_done_callback(on_fetched)
+    return result
+
+
+def _clean_product_ids(product_ids: Iterable[str]) -> List[str]:
+    clean_ids = []
     for pid in product_ids:
         clean_pid = pid.strip().strip(",")
-        if not clean_pid:
-            continue
-        data = scrape_single_product(clean_pid)
-        if data:
-            all_products_data.append(data)
-        time.sleep(1)
-    return all_products_data
+        if clean_pid:
+            clean_ids.append(clean_pid)
+    return clean_ids
+
+
+def iter_products_by_ids(
+    product_ids: Iterable[str], concurrency: int = None, parse_pool=None, deadline: float = None
+) -> Iterator[Tuple[str, Union[Dict, None]]]:
+    """
+    여러 상품 ID를 동시에 스크래핑하면서 입력 순서대로 (ID, 결과)를 하나씩 돌려줍니다.
+    앞선 ID의 결과가 준비되는 즉시 돌려주므로 전체 작업이 끝나기를 기다리지 않습니다.
+    동시에 요청하는 ID 수는 concurrency(기본값: .env의 EMART_ID_CONCURRENCY, 8)로 제한하며,
+    요청 속도는 http_client의 호스트별 속도 제한기가 모든 스레드에 걸쳐 조절합니다.
+    파싱은 파서 프로세스 풀(parse_pool)에서 실행합니다. parse_pool을 주지 않으면 ID가
+    한 번에 처리할 수 있는 수보다 많을 때만 풀을 만들고, 적으면 요청 스레드에서 바로 파싱합니다.
+    요청했지만 아직 결과를 돌려주지 않은 ID는 concurrency + EMART_PARSE_QUEUE_SIZE개를 넘지 않습니다.
+    실패한 ID의 결과는 None입니다.
+    deadline(time.monotonic() 기준 시각)이 지나면 새 ID를 요청하지 않고, 이미 요청한 ID의 결과만 돌려준 뒤 끝냅니다.
+    """
+    if concurrency is None:
+        concurrency = int(os.environ.get("EMART_ID_CONCURRENCY", 8))
+    concurrency = max(1, concurrency)
+    clean_ids = _clean_product_ids(product_ids)
+    window = concurrency + parse_queue_size_from_env()
+
+    own_pool = None
+    if parse_pool is None and len(clean_ids) > window:
+        parse_pool = own_pool = create_parse_pool()
+    if parse_pool is None:
+        # 파서 풀이 없으면 요청 스레드가 파싱까지 하므로 대기열이 필요 없습니다.
+        window = concurrency
+    pending_ids = iter(clean_ids)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            in_flight = deque()
+
+            def submit_next():
+                if deadline is not None and time.monotonic() >= deadline:
+                    return
+                pid = next(pending_ids, None)
+                if pid is None:
+                    return
+                if parse_pool is None:
+                    future = executor.submit(scrape_single_product, pid)
+                else:
+                    future = _fetch_then_parse(executor, parse_pool, pid)
+                in_flight.append((pid, future))
+
+            for _ in range(window):
+                submit_next()
+            while in_flight:
+                pid, future = in_flight.popleft()
+                data = future.result()
+                submit_next()
+                yield pid, data
+    finally:
+        if own_pool is not None:
+            own_pool.shutdown()
+
+
+def scrape_products_by_ids(product_ids: List[str], concurrency: int = None) -> List[Dict]:
+    """
+    상품 ID 목록을 스크래핑하여 성공한 결과를 입력 순서대로 반환합니다.
+    concurrency가 1이면 한 개씩 차례로 처리합니다.
+    """
+    if not isinstance(product_ids, list):
+        return []
+    return [
+        data for _, data in iter_products_by_ids(product_ids, concurrency) if data
+    ]
 
 
 if __name__ == "__main__":
-    # ... (이 부분은 수정할 필요가 없습니다) ...
-    product_ids = sys.argv[1:]
-    if not product_ids:
-        print("사용법: python scrape_by_id.py <ID_1> <ID_2> ...")
+    # 사용법: python scrape_by_id.py [--concurrency N] [--stream] <ID_1> <ID_2> ...
+    #   --concurrency N : 동시에 처리할 ID 수 (1이면 순차 처리)
+    #   --stream        : 결과를 완료되는 대로 한 줄에 하나씩(JSON Lines) 출력
+    import argparse
+
+    parser = argparse.ArgumentParser(description="상품 ID로 이마트몰 가격 정보 스크래핑")
+    parser.add_argument("product_ids", nargs="*")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--stream", action="store_true")
+    args = parser.parse_args()
+
+    if not args.product_ids:
+        print("사용법: python scrape_by_id.py [--concurrency N] [--stream] <ID_1> <ID_2> ...")
+    elif args.stream:
+        for pid, data in iter_products_by_ids(args.product_ids, args.concurrency):
+            result = data if data else {"id": pid, "error": "스크래핑 실패"}
+            print(json.dumps(result, ensure_ascii=False), flush=True)
     else:
-        results = scrape_products_by_ids(product_ids)
+        results = scrape_products_by_ids(args.product_ids, args.concurrency)
         print("\n===== 최종 스크래핑 결과 =====")
         print(json.dumps(results, indent=4, ensure_ascii=False))
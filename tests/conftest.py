@@ -0,0 +1,18 @@
+# tests/conftest.py
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import firestore_bulk
+from fake_firestore import FakeFirestore
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """ 메모리 Firestore입니다. 쓰기 속도 예산과 커밋 재시도 대기는 끕니다. """
+    monkeypatch.setenv("EMART_FIRESTORE_WRITE_RATE", "0")
+    monkeypatch.setattr(firestore_bulk, "_write_budget", None)
+    monkeypatch.setattr(firestore_bulk, "time", SimpleNamespace(time=time.time, sleep=lambda seconds: None))
+    return FakeFirestore()
@@ -0,0 +1,199 @@
+# tests/fake_firestore.py
+# 테스트용 메모리 Firestore 클라이언트
+#
+# 이 저장소가 쓰는 만큼만 흉내 냅니다: 문서 참조와 하위 컬렉션, WriteBatch(set/update/delete),
+# 필드 변환(Increment, ArrayUnion, Maximum, Minimum, DELETE_FIELD), get_all, 조건(FieldFilter)과
+# 문서 ID 순서의 limit/start_after 페이지 읽기.
+
+import threading
+
+from google.api_core import exceptions as api_exceptions
+from google.cloud.firestore_v1 import transforms
+
+_COMPARE = {
+    "==": lambda a, b: a == b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+    "in": lambda a, b: a in b,
+}
+
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.id = ref.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocument:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name):
+        return FakeQuery(self._db, f"{self.path}/{name}")
+
+    def get(self, field_paths=None):
+        return FakeSnapshot(self, self._db.docs.get(self.path))
+
+    def __eq__(self, other):
+        return isinstance(other, FakeDocument) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+
+class FakeQuery:
+    """ 컬렉션 참조와 쿼리를 함께 흉내 냅니다. (정렬은 언제나 문서 ID 순서) """
+
+    def __init__(self, db, path, filters=(), limit=None, after=None):
+        self._db = db
+        self.path = path
+        self._filters = filters
+        self._limit = limit
+        self._after = after
+
+    def _copy(self, **changes):
+        options = {"filters": self._filters, "limit": self._limit, "after": self._after}
+        options.update(changes)
+        return FakeQuery(self._db, self.path, **options)
+
+    def document(self, doc_id):
+        return FakeDocument(self._db, f"{self.path}/{doc_id}")
+
+    def select(self, field_paths):
+        return self
+
+    def order_by(self, field_path):
+        return self
+
+    def where(self, filter):
+        return self._copy(filters=self._filters + ((filter.field_path, filter.op_string, filter.value),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def start_after(self, cursor):
+        return self._copy(after=cursor[-1])
+
+    def list_documents(self):
+        prefix = self.path + "/"
+        return [
+            FakeDocument(self._db, path)
+            for path in sorted(self._db.docs)
+            if path.startswith(prefix) and "/" not in path[len(prefix):]
+        ]
+
+    def _matches(self, data):
+        for field, op, value in self._filters:
+            actual = data.get(field)
+            if actual is None or not _COMPARE[op](actual, value):
+                return False
+        return True
+
+    def stream(self):
+        snapshots = []
+        for ref in self.list_documents():
+            data = self._db.docs[ref.path]
+            if self._after is not None and ref.id <= self._after:
+                continue
+            if self._matches(data):
+                snapshots.append(FakeSnapshot(ref, dict(data)))
+        return iter(snapshots[:self._limit] if self._limit else snapshots)
+
+
+def _apply(current, data):
+    """ 쓰기 데이터를 문서(current)에 적용합니다. 필드 변환은 Firestore처럼 계산합니다. """
+    for key, value in data.items():
+        if value is transforms.DELETE_FIELD:
+            current.pop(key, None)
+        elif isinstance(value, transforms.ArrayUnion):
+            array = list(current.get(key) or [])
+            array += [item for item in value.values if item not in array]
+            current[key] = array
+        elif isinstance(value, transforms.Increment):
+            current[key] = current.get(key, 0) + value.value
+        elif isinstance(value, transforms.Maximum):
+            current[key] = max(current[key], value.value) if key in current else value.value
+        elif isinstance(value, transforms.Minimum):
+            current[key] = min(current[key], value.value) if key in current else value.value
+        elif isinstance(value, dict):
+            nested = dict(current.get(key) or {})
+            _apply(nested, value)
+            current[key] = nested
+        else:
+            current[key] = value
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self.ops = []
+
+    def set(self, ref, data, merge=False):
+        self.ops.append(("set", ref, data, merge))
+
+    def update(self, ref, data):
+        self.ops.append(("update", ref, data, True))
+
+    def delete(self, ref):
+        self.ops.append(("delete", ref, None, False))
+
+    def commit(self):
+        """ 배치 전체를 한꺼번에 적용합니다. 하나라도 실패하면 아무것도 적용하지 않습니다. """
+        with self._db.lock:
+            self._db.commit_sizes.append(len(self.ops))
+            if self._db.commit_errors:
+                raise self._db.commit_errors.pop(0)
+            docs = dict(self._db.docs)
+            for op, ref, data, merge in self.ops:
+                if ref.path in self._db.fail_paths:
+                    raise api_exceptions.PermissionDenied(f"{ref.path} 쓰기 거부")
+                if op == "delete":
+                    docs.pop(ref.path, None)
+                    continue
+                if op == "update" and ref.path not in docs:
+                    raise api_exceptions.NotFound(f"No document to update: {ref.path}")
+                current = dict(docs.get(ref.path) or {}) if merge else {}
+                _apply(current, data)
+                docs[ref.path] = current
+            self._db.docs = docs
+
+
+class FakeFirestore:
+    """
+    메모리 Firestore 클라이언트입니다. 테스트에서는 아래 속성을 직접 다룹니다.
+        docs (dict): 문서 경로 -> 데이터 (예: "emart_price/123")
+        commit_errors (list): 다음 커밋들에서 차례로 던질 예외
+        fail_paths (set): 이 경로에 쓰는 배치는 PermissionDenied로 실패합니다.
+        commit_sizes (list): 커밋을 시도한 배치마다의 작업 수
+        get_all_calls (list): get_all로 요청한 문서 ID 목록
+    """
+
+    def __init__(self, docs=None):
+        self.docs = dict(docs or {})
+        self.commit_errors = []
+        self.fail_paths = set()
+        self.commit_sizes = []
+        self.get_all_calls = []
+        self.lock = threading.Lock()
+
+    def collection(self, name):
+        return FakeQuery(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def get_all(self, refs, field_paths=None):
+        refs = list(refs)
+        self.get_all_calls.append([ref.id for ref in refs])
+        for ref in refs:
+            data = self.docs.get(ref.path)
+            yield FakeSnapshot(ref, dict(data) if data is not None else None)
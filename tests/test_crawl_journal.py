@@ -0,0 +1,93 @@
+# tests/test_crawl_journal.py
+# 크롤링 저널이 같은 설정에서만 이어지고, 설정이 바뀌거나 만료되면 새로 시작하는지 확인합니다.
+
+import json
+
+import pytest
+
+import crawl_journal
+from crawl_journal import CrawlJournal, journal_for_outputs
+
+SIGNATURE = {"outputs": {"result_json": "full"}, "start_page": 1, "max_page": 3}
+TTL_SECONDS = 3600
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    path = str(tmp_path / "journal.json")
+    journal = CrawlJournal(path, SIGNATURE, TTL_SECONDS)
+    journal.record_page("과일", next_page=2, count=40, page_size=40, offsets={"result_json": 1234})
+    journal.record_done("채소", count=80)
+    return path
+
+
+def test_same_signature_resumes(journal_path):
+    journal = CrawlJournal(journal_path, dict(SIGNATURE), TTL_SECONDS)
+
+    assert journal.is_done("채소")
+    assert not journal.is_done("과일")
+    assert journal.entry("과일")["next_page"] == 2
+    assert journal.entry("과일")["offsets"] == {"result_json": 1234}
+    assert journal.entry("정육") is None
+
+
+def test_changed_signature_starts_over(journal_path):
+    journal = CrawlJournal(journal_path, dict(SIGNATURE, max_page=5), TTL_SECONDS)
+
+    assert journal.categories == {}
+    assert not journal.is_done("채소")
+
+
+def test_expired_journal_starts_over(journal_path, monkeypatch):
+    real_time = crawl_journal.time.time()
+    monkeypatch.setattr(crawl_journal.time, "time", lambda: real_time + TTL_SECONDS + 1)
+
+    journal = CrawlJournal(journal_path, dict(SIGNATURE), TTL_SECONDS)
+
+    assert journal.categories == {}
+
+
+def test_resumed_journal_keeps_created_at(journal_path, monkeypatch):
+    with open(journal_path, encoding="utf-8") as f:
+        created_at = json.load(f)["created_at"]
+    # 이어서 저장해도 만료 시각은 처음 실행 기준으로 유지됩니다.
+    monkeypatch.setattr(crawl_journal.time, "time", lambda: created_at + TTL_SECONDS - 1)
+
+    journal = CrawlJournal(journal_path, dict(SIGNATURE), TTL_SECONDS)
+    journal.record_done("과일", count=80)
+
+    with open(journal_path, encoding="utf-8") as f:
+        assert json.load(f)["created_at"] == created_at
+
+
+def test_unreadable_journal_starts_over(tmp_path):
+    path = tmp_path / "journal.json"
+    path.write_text("{", encoding="utf-8")
+
+    assert CrawlJournal(str(path), SIGNATURE, TTL_SECONDS).categories == {}
+
+
+def test_clear_removes_file(journal_path):
+    journal = CrawlJournal(journal_path, SIGNATURE, TTL_SECONDS)
+    journal.clear()
+
+    assert journal.categories == {}
+    assert not CrawlJournal(journal_path, SIGNATURE, TTL_SECONDS).categories
+
+
+def test_journal_for_outputs_signature_and_ttl(tmp_path, monkeypatch):
+    monkeypatch.setattr(crawl_journal, "JOURNAL_DIR", str(tmp_path))
+    monkeypatch.setenv("EMART_JOURNAL_TTL_HOURS", "2")
+
+    journal = journal_for_outputs({"result_price_json": "price", "result_json": "full"}, 1, 3)
+
+    assert journal.path == str(tmp_path / "result_json+result_price_json.json")
+    assert journal.ttl_seconds == 7200
+    assert journal.signature == {
+        "outputs": {"result_json": "full", "result_price_json": "price"},
+        "start_page": 1,
+        "max_page": 3,
+    }
+
+    monkeypatch.setenv("EMART_JOURNAL_TTL_HOURS", "0")
+    assert journal_for_outputs({"result_json": "full"}, 1, 3) is None
@@ -0,0 +1,111 @@
+# tests/test_crawl_queue.py
+# 로컬 가짜 카테고리 사이트로 작업 큐의 결과 상품 수와 워커 수에 따른 속도 향상을 확인합니다.
+
+import http.server
+import os
+import threading
+import time
+import urllib.parse
+
+import pytest
+
+from crawl_queue import CrawlQueue, coordinate
+from jsonl_store import count_records
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "fixtures", "category", "sample_grid.html")
+PAGE_SIZE = 40
+CATEGORY_COUNT = 4
+PAGES_PER_CATEGORY = 3
+# 워커 하나의 처리 시간이 대부분 응답 대기가 되도록 지연을 둡니다. (프로세스 시작 시간보다 충분히 길게)
+LATENCY = 0.3
+
+
+@pytest.fixture
+def fake_site():
+    """ 카테고리마다 PAGES_PER_CATEGORY 페이지까지 상품이 가득 찬 가짜 사이트입니다. """
+    with open(FIXTURE_PATH, "rb") as f:
+        full_page = f.read()
+    empty_page = b"<html><body><div id='ty_thmb_view'><ul></ul></div></body></html>"
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(LATENCY)
+            query = urllib.parse.parse_qs(urllib.parse.urlparse(self.path).query)
+            page = int(query.get("page", ["1"])[0])
+            category = query.get("dispCtgId", ["0"])[0]
+            body = empty_page
+            if page <= PAGES_PER_CATEGORY:
+                body = full_page.replace(b"itemId=1", b"itemId=%s%03d" % (category.encode(), page))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield (
+        f"http://127.0.0.1:{server.server_address[1]}/disp/category.ssg"
+        "?dispCtgId={disp_ctg_id}&page={page_num}"
+    )
+    server.shutdown()
+
+
+@pytest.fixture
+def queue_env(tmp_path, monkeypatch):
+    # 가짜 사이트 측정이므로 요청 속도 제한을 풀어 둡니다. (워커 프로세스에도 전달됨)
+    monkeypatch.setenv("EMART_RATE_INITIAL", "1000")
+    monkeypatch.setenv("EMART_RATE_MAX", "1000")
+    monkeypatch.setenv("EMART_START_PAGE", "1")
+    monkeypatch.setenv("EMART_END_PAGE", "")
+    monkeypatch.setenv("EMART_JOURNAL_TTL_HOURS", "0")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _crawl(work_dir, page_url, workers):
+    categories = {f"cat{i}": str(i + 1) for i in range(CATEGORY_COUNT)}
+    os.makedirs(work_dir)
+    os.chdir(work_dir)
+    started = time.perf_counter()
+    results = coordinate(["full"], workers, os.path.join(work_dir, "queue.sqlite3"), categories, page_url)
+    return results, time.perf_counter() - started
+
+
+def test_workers_crawl_all_items_and_speed_up(queue_env, fake_site):
+    timings = {}
+    for workers in (1, 2):
+        work_dir = str(queue_env / f"workers{workers}")
+        results, timings[workers] = _crawl(work_dir, fake_site, workers)
+
+        expected = PAGES_PER_CATEGORY * PAGE_SIZE
+        assert results == {f"cat{i}": expected for i in range(CATEGORY_COUNT)}
+        for name in results:
+            assert count_records(os.path.join(work_dir, "result_json", f"{name}.jsonl")) == expected
+
+    # 이상적인 속도 향상은 2배이며, 프로세스 시작과 큐 잠금 비용을 감안해 1.3배 이상을 요구합니다.
+    assert timings[1] / timings[2] >= 1.3, timings
+
+
+def test_expired_lease_fails_after_max_attempts(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMART_QUEUE_MAX_ATTEMPTS", "2")
+    monkeypatch.setenv("EMART_QUEUE_LEASE_SECONDS", "0")
+    queue = CrawlQueue(str(tmp_path / "queue.sqlite3"))
+    try:
+        run_id = queue.create_run({"과일": "1"}, ["full"], 1, 1)
+
+        # 작업을 가져간 워커가 결과를 남기지 못하고 죽은 상황을 두 번 반복합니다.
+        assert queue.claim("worker-a").attempts == 1
+        time.sleep(0.01)
+        assert queue.claim("worker-b").attempts == 2
+        time.sleep(0.01)
+
+        assert queue.claim("worker-c") is None
+        assert not queue.has_open_tasks()
+        assert queue.finalize_ready(run_id)
+        assert queue.results(run_id) == {"과일": None}
+    finally:
+        queue.close()
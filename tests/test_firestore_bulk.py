@@ -0,0 +1,174 @@
+# tests/test_firestore_bulk.py
+# BulkWriter의 500개 단위 배치, 재시도 규칙, 커밋/실패 수와 업로드 세션의 get_all 미리 읽기를 확인합니다.
+
+from google.api_core import exceptions as api_exceptions
+from firebase_admin import firestore
+
+from firebase_uploader import FirestoreUploadSession
+from firestore_bulk import FIRESTORE_BATCH_LIMIT, BulkWriter, bulk_delete, get_documents
+
+
+def _price_ref(db, product_id):
+    return db.collection("emart_price").document(str(product_id))
+
+
+def test_writes_are_batched_by_500(fake_db):
+    with BulkWriter(fake_db, threads=2) as writer:
+        for i in range(1201):
+            writer.set(_price_ref(fake_db, i), {"id": str(i)})
+
+    assert sorted(fake_db.commit_sizes) == [201, FIRESTORE_BATCH_LIMIT, FIRESTORE_BATCH_LIMIT]
+    assert writer.committed_count == 1201
+    assert writer.failed_count == 0
+    assert len(fake_db.docs) == 1201
+
+
+def test_retryable_error_is_retried(fake_db):
+    fake_db.commit_errors = [api_exceptions.DeadlineExceeded("시간 초과")]
+
+    with BulkWriter(fake_db) as writer:
+        writer.set(_price_ref(fake_db, 1), {"id": "1"})
+
+    assert fake_db.commit_sizes == [1, 1]
+    assert (writer.committed_count, writer.failed_count) == (1, 0)
+    assert fake_db.docs["emart_price/1"] == {"id": "1"}
+
+
+def test_ambiguous_error_is_not_retried_for_increment_batch(fake_db):
+    fake_db.commit_errors = [api_exceptions.DeadlineExceeded("시간 초과")]
+
+    with BulkWriter(fake_db) as writer:
+        writer.set(_price_ref(fake_db, 1), {"price_stats": {"change_count": firestore.Increment(1)}}, merge=True)
+        writer.set(_price_ref(fake_db, 2), {"id": "2"})
+
+    # 서버에서 이미 더해졌을 수 있으므로 다시 커밋하지 않고 배치 전체를 실패로 셉니다.
+    assert fake_db.commit_sizes == [2]
+    assert (writer.committed_count, writer.failed_count) == (0, 2)
+    assert isinstance(writer.errors[0], api_exceptions.DeadlineExceeded)
+
+
+def test_aborted_increment_batch_is_retried(fake_db):
+    # Aborted는 커밋되지 않았음이 확실하므로 Increment가 있어도 다시 시도합니다.
+    fake_db.commit_errors = [api_exceptions.Aborted("경합")]
+
+    with BulkWriter(fake_db) as writer:
+        writer.set(_price_ref(fake_db, 1), {"price_stats": {"change_count": firestore.Increment(1)}}, merge=True)
+
+    assert fake_db.commit_sizes == [1, 1]
+    assert fake_db.docs["emart_price/1"] == {"price_stats": {"change_count": 1}}
+
+
+def test_failed_and_committed_counts(fake_db):
+    fake_db.fail_paths = {"emart_price/3"}
+
+    with BulkWriter(fake_db, batch_size=2) as writer:
+        for i in range(5):
+            writer.set(_price_ref(fake_db, i), {"id": str(i)})
+        writer.delete(_price_ref(fake_db, 9), label="삭제")
+
+    # 거부된 문서가 든 배치(2, 3)만 실패하며, 다시 시도해도 소용없는 오류라 한 번만 커밋합니다.
+    assert sorted(fake_db.commit_sizes) == [2, 2, 2]
+    assert (writer.committed_count, writer.failed_count) == (4, 2)
+    assert writer.failed_by_label == {}
+    assert sorted(fake_db.docs) == ["emart_price/0", "emart_price/1", "emart_price/4"]
+
+
+def test_get_documents_reads_in_chunks(fake_db):
+    fake_db.docs = {f"emart_price/{i}": {"id": str(i)} for i in range(5)}
+
+    documents = get_documents(fake_db, "emart_price", ["0", "1", "1", "2", "3", "7"], chunk_size=2)
+
+    assert fake_db.get_all_calls == [["0", "1"], ["2", "3"], ["7"]]
+    assert documents == {"0": {"id": "0"}, "1": {"id": "1"}, "2": {"id": "2"}, "3": {"id": "3"}, "7": None}
+
+
+def _record(product_id, selling_price="1,000"):
+    return {
+        "id": product_id,
+        "product_name": f"상품 {product_id}",
+        "image_url": f"https://example.com/{product_id}.jpg",
+        "original_price": "1,200",
+        "selling_price": selling_price,
+        "out_of_stock": "N",
+        "quantity": "1",
+        "category": "과일",
+        "last_updated": "2026-10-01T09:00:00",
+    }
+
+
+def test_session_prefetches_with_get_all(fake_db, monkeypatch):
+    monkeypatch.setenv("EMART_UPLOAD_STATE_DB", "")
+    monkeypatch.setenv("EMART_FIRESTORE_READ_CHUNK", "2")
+    fake_db.docs = {
+        "emart_price/a": {"current_price": {"original_price": "1,200", "selling_price": "1,000"}},
+        "emart_product/a": {"product_name": "상품 a", "image_url": "https://example.com/a.jpg"},
+    }
+
+    session = FirestoreUploadSession(fake_db, beacon=1)
+    try:
+        session.upload_records([_record("a"), _record("b"), _record("c")])
+        assert session.commit()
+        # 같은 상품을 다시 올려도 이미 아는 상품은 읽지 않습니다.
+        session.upload_records([_record("b", selling_price="900")])
+        assert session.commit()
+    finally:
+        session.close()
+
+    # 기록 2개씩 묶어 가격 문서와 상품 문서를 한 번씩 읽습니다.
+    assert fake_db.get_all_calls == [["a", "b"], ["a", "b"], ["c"], ["c"]]
+    counters = session.counters()
+    assert counters["firestore_read"] == 6
+    assert (counters["price_updated"], counters["price_skipped"]) == (3, 1)
+    assert (counters["product_new"], counters["product_skipped"]) == (2, 2)
+    assert counters["write_failed"] == 0
+    assert fake_db.docs["emart_price/b"]["current_price"]["selling_price"] == "900"
+    assert fake_db.docs["emart_product/c"]["product_name"] == "상품 c"
+
+
+def test_session_skips_firestore_reads_for_known_state(fake_db, tmp_path, monkeypatch):
+    monkeypatch.setenv("EMART_UPLOAD_STATE_DB", str(tmp_path / "state.sqlite3"))
+
+    for expected_reads in (2, 0):
+        session = FirestoreUploadSession(fake_db, beacon=1)
+        try:
+            session.upload_records([_record("a")])
+            assert session.commit()
+        finally:
+            session.close()
+        # 두 번째 실행은 상태 저장소에 기록된 값으로 비교하므로 Firestore를 읽지 않습니다.
+        assert session.counters()["firestore_read"] == expected_reads
+    assert session.counters()["price_skipped"] == 1
+
+
+def test_bulk_delete_removes_subcollections(fake_db):
+    fake_db.docs = {
+        "emart_price/1": {"id": "1"},
+        "emart_price/1/price_history_monthly/2026-09": {"records": []},
+        "emart_price/1/price_history_monthly/2026-10": {"records": []},
+        "emart_price/2": {"id": "2"},
+        "emart_price/3": {"id": "3"},
+    }
+    refs = [_price_ref(fake_db, i) for i in (1, 2)]
+
+    result = bulk_delete(fake_db, refs, subcollections=["price_history_monthly"], chunk_size=1)
+
+    assert result == {"deleted": 4, "failed": 0}
+    assert list(fake_db.docs) == ["emart_price/3"]
+
+
+def test_bulk_delete_counts_only_its_own_failures(fake_db):
+    fake_db.docs = {f"emart_price/{i}": {"id": str(i)} for i in range(1, 4)}
+    fake_db.fail_paths = {"emart_price/3", "emart_price/9"}
+
+    with BulkWriter(fake_db, batch_size=2) as writer:
+        # 같은 writer에 넣은 다른 쓰기 작업 2개는 bulk_delete의 flush()에서 함께 실패하지만 삭제 실패로 세지 않습니다.
+        writer.set(_price_ref(fake_db, 9), {"id": "9"})
+        writer.set(_price_ref(fake_db, 8), {"id": "8"})
+        result = bulk_delete(fake_db, [_price_ref(fake_db, i) for i in (1, 2, 3)], writer=writer)
+        second = bulk_delete(fake_db, [_price_ref(fake_db, 2)], writer=writer)
+
+    assert result == {"deleted": 2, "failed": 1}
+    assert second == {"deleted": 1, "failed": 0}
+    assert writer.failed_count == 3
+    assert writer.failed_by_label == {}
+    assert sorted(fake_db.docs) == ["emart_price/3"]
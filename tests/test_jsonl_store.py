@@ -0,0 +1,91 @@
+# tests/test_jsonl_store.py
+# JsonlWriter의 .part 임시 파일, 이어 쓰기, os.replace 커밋을 확인합니다.
+
+import json
+
+import pytest
+
+import jsonl_store
+from jsonl_store import JsonlWriter, count_records, iter_records, list_result_files
+
+
+def test_commit_moves_part_file_with_os_replace(tmp_path, monkeypatch):
+    path = str(tmp_path / "과일.jsonl")
+    replaced = []
+    real_replace = jsonl_store.os.replace
+    monkeypatch.setattr(jsonl_store.os, "replace", lambda src, dst: (replaced.append((src, dst)), real_replace(src, dst)))
+
+    with JsonlWriter(path) as writer:
+        writer.write_records([{"id": "1"}, {"id": "2"}])
+        # 커밋 전에는 최종 파일이 없고 .part 파일에만 기록이 있습니다.
+        assert not (tmp_path / "과일.jsonl").exists()
+        assert (tmp_path / "과일.jsonl.part").exists()
+
+    assert replaced == [(path + ".part", path)]
+    assert not (tmp_path / "과일.jsonl.part").exists()
+    assert list(iter_records(path)) == [{"id": "1"}, {"id": "2"}]
+    assert writer.count == 2
+
+
+def test_commit_removes_legacy_json(tmp_path):
+    legacy = tmp_path / "과일.json"
+    legacy.write_text(json.dumps([{"id": "old"}]), encoding="utf-8")
+
+    with JsonlWriter(str(tmp_path / "과일.jsonl")) as writer:
+        writer.write_records([{"id": "new"}])
+
+    assert not legacy.exists()
+    assert list_result_files(str(tmp_path)) == [str(tmp_path / "과일.jsonl")]
+
+
+def test_abort_keeps_previous_result(tmp_path):
+    path = tmp_path / "과일.jsonl"
+    path.write_text('{"id":"old"}\n', encoding="utf-8")
+
+    with pytest.raises(RuntimeError):
+        with JsonlWriter(str(path)) as writer:
+            writer.write_records([{"id": "new"}])
+            raise RuntimeError("중단")
+
+    assert list(iter_records(str(path))) == [{"id": "old"}]
+    # 이미 쓴 기록은 .part 파일에 남아 다음 실행에서 이어 쓸 수 있습니다.
+    assert count_records(str(path) + ".part") == 1
+
+
+def test_resume_truncates_partial_line(tmp_path):
+    path = str(tmp_path / "과일.jsonl")
+    writer = JsonlWriter(path)
+    writer.write_records([{"id": "1"}])
+    offset = writer.offset
+    writer.write_records([{"id": "2"}])
+    writer.abort()
+    # 기록 도중 끊긴 줄을 흉내 냅니다.
+    with open(path + ".part", "a", encoding="utf-8") as f:
+        f.write('{"id":"3",')
+
+    assert JsonlWriter.can_resume(path, offset)
+    with JsonlWriter(path, resume_offset=offset) as writer:
+        writer.write_records([{"id": "4"}])
+
+    assert list(iter_records(path)) == [{"id": "1"}, {"id": "4"}]
+
+
+def test_can_resume_requires_part_file_long_enough(tmp_path):
+    path = str(tmp_path / "과일.jsonl")
+    assert not JsonlWriter.can_resume(path, 0)
+
+    writer = JsonlWriter(path)
+    writer.write_records([{"id": "1"}])
+    offset = writer.offset
+    writer.abort()
+
+    assert JsonlWriter.can_resume(path, offset)
+    assert not JsonlWriter.can_resume(path, offset + 1)
+
+
+def test_iter_records_reads_legacy_json(tmp_path):
+    legacy = tmp_path / "과일.json"
+    legacy.write_text(json.dumps([{"id": "1"}, {"id": "2"}]), encoding="utf-8")
+
+    assert list(iter_records(str(legacy))) == [{"id": "1"}, {"id": "2"}]
+    assert count_records(str(legacy)) == 2
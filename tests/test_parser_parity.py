@@ -0,0 +1,64 @@
+# tests/test_parser_parity.py
+# 저장된 카테고리 페이지(fixtures/category)로 파서 백엔드와 스트리밍 가격 추출기의 결과가 같은지 확인합니다.
+
+import glob
+import os
+
+import pytest
+
+from emart_parser import available_backends, compare_backends, detect_last_page, scrape_with_bs4
+from emart_price_stream import cross_check, extract_prices
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "fixtures", "category")
+CATEGORY_PAGES = sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.html")))
+CHUNK_SIZES = [1, 7, 64, 1024]
+
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _without_time(records):
+    return [{k: v for k, v in record.items() if k != "last_updated"} for record in records]
+
+
+def test_fixtures_exist():
+    assert CATEGORY_PAGES, "fixtures/category에 HTML 파일이 없습니다."
+
+
+@pytest.mark.parametrize("path", CATEGORY_PAGES, ids=os.path.basename)
+def test_backends_match_bs4(path):
+    html_content = _read(path)
+    assert scrape_with_bs4(html_content, "parity")
+    differences = compare_backends(html_content)
+    assert set(differences) == set(available_backends()) - {"bs4"}
+    for backend, diffs in differences.items():
+        assert diffs == [], f"{backend}: {diffs[:5]}"
+
+
+@pytest.mark.parametrize("path", CATEGORY_PAGES, ids=os.path.basename)
+def test_stream_extractor_matches_full_parser(path):
+    assert cross_check(_read(path)) == []
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+@pytest.mark.parametrize("path", CATEGORY_PAGES, ids=os.path.basename)
+def test_stream_extractor_is_chunk_invariant(path, chunk_size):
+    html_content = _read(path)
+    expected = _without_time(extract_prices(html_content))
+    chunks = (html_content[i:i + chunk_size] for i in range(0, len(html_content), chunk_size))
+    assert _without_time(extract_prices(chunks)) == expected
+
+
+def test_detect_last_page_reads_pagination_links():
+    html_content = _read(os.path.join(FIXTURE_DIR, "sample_grid.html"))
+    assert detect_last_page(html_content, 0) == 3
+
+
+def test_detect_last_page_ignores_counts_after_product_list():
+    html_content = (
+        '<div>총 <b>1,234</b>개</div><ul id="ty_thmb_view"></ul>'
+        "<script>var totalCnt = 500000;</script>"
+    )
+    assert detect_last_page(html_content, 40) == 31
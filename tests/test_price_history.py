@@ -0,0 +1,107 @@
+# tests/test_price_history.py
+# 월별 가격 버킷 기록, 가격 문서의 요약 통계, 예전 price_history 배열 옮기기를 확인합니다.
+
+import pytest
+
+import firestore_bulk
+import price_history
+from firestore_bulk import BulkWriter
+from price_history import migrate_price_history, read_price_history, record_price_change
+
+
+def _price(selling_price, last_updated):
+    return {"original_price": "2,000", "selling_price": selling_price, "last_updated": last_updated}
+
+
+def test_record_price_change_writes_monthly_buckets_and_stats(fake_db):
+    changes = [
+        _price("1,500", "2026-09-28T10:00:00"),
+        _price("1,200", "2026-10-02T10:00:00"),
+        _price("1,800", "2026-10-15T10:00:00"),
+    ]
+    for change in changes:
+        with BulkWriter(fake_db) as writer:
+            record_price_change(writer, fake_db, "123", change, {"out_of_stock": "N"})
+
+    assert fake_db.docs["emart_price/123/price_history_monthly/2026-09"] == {
+        "id": "123", "month": "2026-09", "records": changes[:1],
+    }
+    assert fake_db.docs["emart_price/123/price_history_monthly/2026-10"]["records"] == changes[1:]
+    parent = fake_db.docs["emart_price/123"]
+    assert parent["out_of_stock"] == "N"
+    assert parent["current_price"] == changes[-1]
+    assert parent["price_stats"] == {
+        "change_count": 3,
+        "min_selling_price": 1200,
+        "max_selling_price": 1800,
+        "last_changed": "2026-10-15T10:00:00",
+    }
+    assert read_price_history(fake_db, "123") == changes
+    assert read_price_history(fake_db, "123", start_month="2026-10") == changes[1:]
+
+
+@pytest.fixture
+def checkpoint_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        price_history, "ScanCheckpoint",
+        lambda name: firestore_bulk.ScanCheckpoint(name, directory=str(tmp_path)),
+    )
+    return tmp_path
+
+
+def test_migrate_moves_legacy_array_to_buckets(fake_db, checkpoint_dir):
+    legacy = [_price("1,500", "2026-08-30T10:00:00"), _price("1,300", "2026-09-01T10:00:00")]
+    fake_db.docs = {
+        "emart_price/1": {"id": "1", "price_history": legacy},
+        # 새 구조로 이미 최신 가격이 기록된 문서는 현재 가격과 마지막 변경 시각을 그대로 둡니다.
+        "emart_price/2": {
+            "id": "2",
+            "price_history": legacy[:1],
+            "current_price": _price("900", "2026-10-01T10:00:00"),
+            "price_stats": {"change_count": 1, "min_selling_price": 900, "last_changed": "2026-10-01T10:00:00"},
+        },
+        "emart_price/3": {"id": "3", "current_price": _price("700", "2026-10-01T10:00:00")},
+    }
+
+    result = migrate_price_history(fake_db, page_size=2)
+
+    assert result == {"scanned": 3, "migrated": 2, "records": 3, "failed_writes": 0}
+    first = fake_db.docs["emart_price/1"]
+    assert "price_history" not in first
+    assert first["current_price"] == legacy[-1]
+    assert first["price_stats"] == {
+        "change_count": 2,
+        "min_selling_price": 1300,
+        "max_selling_price": 1500,
+        "last_changed": "2026-09-01T10:00:00",
+    }
+    assert fake_db.docs["emart_price/1/price_history_monthly/2026-08"]["records"] == legacy[:1]
+    assert fake_db.docs["emart_price/1/price_history_monthly/2026-09"]["records"] == legacy[1:]
+
+    second = fake_db.docs["emart_price/2"]
+    assert second["current_price"]["selling_price"] == "900"
+    assert second["price_stats"] == {
+        "change_count": 2,
+        "min_selling_price": 900,
+        "max_selling_price": 1500,
+        "last_changed": "2026-10-01T10:00:00",
+    }
+    assert read_price_history(fake_db, "1") == legacy
+    assert not list(checkpoint_dir.iterdir())
+
+
+def test_migrate_keeps_array_when_bucket_write_fails(fake_db, checkpoint_dir):
+    legacy = [_price("1,500", "2026-08-30T10:00:00")]
+    fake_db.docs = {"emart_price/1": {"id": "1", "price_history": legacy}}
+    fake_db.fail_paths = {"emart_price/1/price_history_monthly/2026-08"}
+
+    result = migrate_price_history(fake_db)
+
+    assert result["failed_writes"] == 1
+    assert fake_db.docs["emart_price/1"] == {"id": "1", "price_history": legacy}
+
+    # 다시 실행하면 옮기지 못한 문서를 이어서 옮깁니다.
+    fake_db.fail_paths = set()
+    assert migrate_price_history(fake_db, resume=True)["migrated"] == 1
+    assert "price_history" not in fake_db.docs["emart_price/1"]
+    assert read_price_history(fake_db, "1") == legacy
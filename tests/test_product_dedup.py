@@ -0,0 +1,96 @@
+# tests/test_product_dedup.py
+# 여러 카테고리에 나온 상품을 합칠 때 카테고리 우선순위와 최신 가격 선택 규칙을 확인합니다.
+
+import pytest
+
+from product_dedup import ProductDeduplicator, SqliteProductDeduplicator, category_order_from_env
+
+ORDER = ["과일", "채소", "간식"]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def dedup(request, tmp_path):
+    if request.param == "memory":
+        yield ProductDeduplicator(ORDER)
+    else:
+        with SqliteProductDeduplicator(ORDER, path=str(tmp_path / "dedup.sqlite3")) as sqlite_dedup:
+            yield sqlite_dedup
+
+
+def _add(dedup, record, category, source=None):
+    if isinstance(dedup, SqliteProductDeduplicator):
+        first_seen = dedup.add(record, category, source)
+        dedup.flush()
+        return first_seen
+    return dedup.add(record, category)
+
+
+def _record(category, selling_price, last_updated, **fields):
+    record = {
+        "id": "1",
+        "category": category,
+        "product_name": f"{category} 상품",
+        "original_price": "2,000",
+        "selling_price": selling_price,
+        "out_of_stock": "N",
+        "last_updated": last_updated,
+    }
+    record.update(fields)
+    return record
+
+
+def test_higher_precedence_category_wins_descriptive_fields(dedup):
+    assert _add(dedup, _record("간식", "1,000", "2026-10-01T10:00:00", image_url="snack.jpg"), "간식")
+    assert not _add(dedup, _record("과일", "1,100", "2026-10-01T09:00:00", image_url=""), "과일")
+    assert not _add(dedup, _record("채소", "1,200", "2026-10-01T08:00:00"), "채소")
+
+    [record] = list(dedup.records())
+    assert record["category"] == "과일"
+    assert record["categories"] == ["과일", "채소", "간식"]
+    assert record["product_name"] == "과일 상품"
+    # 우선 카테고리 기록에 비어 있는 값은 다른 기록에서 채웁니다.
+    assert record["image_url"] == "snack.jpg"
+    assert dedup.duplicate_count == 2
+    assert dedup.multi_category_ids() == ["1"]
+
+
+def test_price_fields_follow_latest_last_updated(dedup):
+    _add(dedup, _record("과일", "1,100", "2026-10-01T09:00:00"), "과일")
+    _add(dedup, _record("간식", "900", "2026-10-01T11:00:00", out_of_stock="Y"), "간식")
+    _add(dedup, _record("채소", "1,000", "2026-10-01T10:00:00"), "채소")
+
+    [record] = list(dedup.records())
+    assert record["product_name"] == "과일 상품"
+    assert (record["selling_price"], record["out_of_stock"]) == ("900", "Y")
+    assert record["last_updated"] == "2026-10-01T11:00:00"
+
+
+def test_unknown_categories_rank_after_known_ones(dedup):
+    _add(dedup, _record("정육", "1,000", "2026-10-01T10:00:00"), "정육")
+    _add(dedup, _record("수산", "1,000", "2026-10-01T10:00:00"), "수산")
+    _add(dedup, _record("간식", "1,000", "2026-10-01T10:00:00"), "간식")
+
+    [record] = list(dedup.records())
+    assert record["categories"] == ["간식", "정육", "수산"]
+    assert record["category"] == "간식"
+
+
+def test_sqlite_groups_by_primary_category(tmp_path):
+    with SqliteProductDeduplicator(ORDER, path=str(tmp_path / "dedup.sqlite3")) as dedup:
+        dedup.add({"id": "1", "category": "채소"}, "채소", "result_json/채소.jsonl")
+        dedup.add({"id": "2", "category": "채소"}, "채소", "result_json/채소.jsonl")
+        dedup.add({"id": "1", "category": "과일"}, "과일", "result_json/과일.jsonl")
+        dedup.flush()
+
+        assert dedup.group_sizes() == {"채소": 1, "과일": 1}
+        assert [record["id"] for record in dedup.records("과일")] == ["1"]
+        assert dedup.ids_in_groups("result_json/채소.jsonl", ["채소"]) == {"2"}
+        assert dedup.ids_in_groups("result_json/채소.jsonl", ["채소", "과일"]) == {"1", "2"}
+
+
+def test_category_order_from_env(tmp_path, monkeypatch):
+    categories_file = tmp_path / "categories.json"
+    categories_file.write_text('{"과일": "1", "채소": "2", "간식": "3"}', encoding="utf-8")
+    monkeypatch.setenv("EMART_DEDUP_PRECEDENCE", "간식, 정육")
+
+    assert category_order_from_env(str(categories_file)) == ["간식", "정육", "과일", "채소"]
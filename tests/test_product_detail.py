@@ -0,0 +1,42 @@
+# tests/test_product_detail.py
+# 저장된 상품 상세 페이지(fixtures/item)에서 가격/용량/품절 정보를 읽는지 확인합니다.
+
+import os
+
+import pytest
+
+from scrape_by_id import parse_product_detail
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), os.pardir, "fixtures", "item")
+
+
+def _parse(name):
+    with open(os.path.join(FIXTURE_DIR, name), "r", encoding="utf-8") as f:
+        record = parse_product_detail(f.read(), "1")
+    record.pop("last_updated")
+    return record
+
+
+@pytest.mark.parametrize(
+    "name, expected",
+    [
+        (
+            "sample_discount.html",
+            {"original_price": "15900", "selling_price": "12900", "quantity": "( 100g 당 860원 )", "out_of_stock": "N"},
+        ),
+        (
+            "sample_first_price.html",
+            {"original_price": "9980", "selling_price": "8980", "quantity": "(1개당 299원)", "out_of_stock": "N"},
+        ),
+        (
+            "sample_single_price.html",
+            {"original_price": "2480", "selling_price": "2480", "quantity": "", "out_of_stock": "N"},
+        ),
+        (
+            "sample_soldout.html",
+            {"original_price": "21800", "selling_price": "21800", "quantity": "(100g당 727원)", "out_of_stock": "Y"},
+        ),
+    ],
+)
+def test_parse_product_detail(name, expected):
+    assert _parse(name) == dict(expected, id="1")
@@ -0,0 +1,81 @@
+# tests/test_rate_limiter.py
+# AIMD 속도 제한기의 속도 조정과 Retry-After 대기를 가짜 시계로 확인합니다.
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+import rate_limiter
+from rate_limiter import AdaptiveRateLimiter, parse_retry_after
+
+
+class FakeClock:
+    """ time.monotonic/time.sleep 대신 쓰는 시계입니다. sleep은 시간만 앞으로 보냅니다. """
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", fake.monotonic)
+    monkeypatch.setattr(rate_limiter.time, "sleep", fake.sleep)
+    return fake
+
+
+def test_success_increases_rate_additively(clock):
+    limiter = AdaptiveRateLimiter(initial_rate=2.0, max_rate=10.0, increase=0.2)
+    limiter.on_success()
+    assert limiter.current_rate == pytest.approx(2.1)
+    for _ in range(1000):
+        limiter.on_success()
+    assert limiter.current_rate == 10.0
+
+
+def test_throttle_halves_rate_once_per_second(clock):
+    limiter = AdaptiveRateLimiter(initial_rate=8.0, min_rate=1.5)
+    limiter.on_throttle()
+    limiter.on_throttle()
+    assert limiter.current_rate == 4.0
+    clock.now += 1.0
+    limiter.on_throttle()
+    assert limiter.current_rate == 2.0
+    clock.now += 1.0
+    limiter.on_throttle()
+    assert limiter.current_rate == 1.5
+    assert limiter.throttle_count == 4
+
+
+def test_acquire_waits_for_tokens(clock):
+    limiter = AdaptiveRateLimiter(initial_rate=4.0, burst=1.0)
+    limiter.acquire()
+    assert clock.sleeps == []
+    limiter.acquire()
+    assert sum(clock.sleeps) == pytest.approx(0.25)
+
+
+def test_retry_after_blocks_until_cooldown_ends(clock):
+    limiter = AdaptiveRateLimiter(initial_rate=10.0)
+    limiter.on_throttle(retry_after=5.0)
+    started = clock.now
+    limiter.acquire()
+    assert clock.now - started >= 5.0
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("not a date") is None
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 25 <= parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
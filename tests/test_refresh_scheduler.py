@@ -0,0 +1,85 @@
+# tests/test_refresh_scheduler.py
+# 변동성 기반 갱신이 상품 문서가 없는 가격 전용 상품도 처리하고, 확인 결과를 스케줄에 남기는지 확인합니다.
+
+from types import SimpleNamespace
+
+import pytest
+
+import refresh_scheduler
+from refresh_scheduler import RefreshScheduleStore, refresh_settings_from_env, seed_from_firestore
+
+
+def _price(selling_price, last_updated="2026-10-01T10:00:00"):
+    return {"original_price": "2,000", "selling_price": selling_price, "last_updated": last_updated}
+
+
+@pytest.fixture
+def scheduler(fake_db, tmp_path, monkeypatch):
+    monkeypatch.setenv("EMART_REFRESH_DB", str(tmp_path / "refresh.sqlite3"))
+    monkeypatch.setenv("EMART_UPLOAD_STATE_DB", "")
+    monkeypatch.setenv("EMART_REFRESH_TIME_BUDGET", "0")
+    fake_db.meter = SimpleNamespace(finish=lambda: None)
+    monkeypatch.setattr(refresh_scheduler, "initialize_firebase", lambda: None)
+    monkeypatch.setattr(refresh_scheduler, "get_db", lambda: fake_db)
+    monkeypatch.setattr(refresh_scheduler, "metered_client", lambda db, name: db)
+
+    fake_db.docs = {
+        # 상품 정보까지 올린 상품
+        "emart_price/1": {"id": "1", "out_of_stock": "N", "current_price": _price("1,500")},
+        "emart_product/1": {"id": "1", "product_name": "사과", "last_updated": "2026-10-01T10:00:00"},
+        # 가격만 올린 상품 (상품 문서 없음)
+        "emart_price/2": {"id": "2", "out_of_stock": "N", "current_price": _price("900")},
+    }
+    settings = refresh_settings_from_env()
+    with RefreshScheduleStore(settings["db_path"]) as store:
+        seed_from_firestore(fake_db, store, settings)
+        store.postpone(store.all_ids(), -1)
+
+    scraped = {
+        "1": {"original_price": "2,000", "selling_price": "1,400", "quantity": "", "out_of_stock": "N"},
+        "2": {"original_price": "2,000", "selling_price": "900", "quantity": "", "out_of_stock": "N"},
+    }
+
+    def fake_iter_products_by_ids(product_ids, deadline=None):
+        for product_id in product_ids:
+            yield product_id, dict(scraped[product_id], id=product_id, last_updated="2026-10-17T09:00:00")
+
+    monkeypatch.setattr(refresh_scheduler, "iter_products_by_ids", fake_iter_products_by_ids)
+    return settings
+
+
+def test_price_only_product_does_not_fail_the_batch(fake_db, scheduler):
+    result = refresh_scheduler.run_refresh(budget=10)
+
+    assert result["status"] == "success"
+    assert (result["checked"], result["changed"], result["failed"]) == (2, 1, 0)
+    assert fake_db.docs["emart_product/1"]["last_updated"] == "2026-10-17T09:00:00"
+    # 가격 전용 상품에 빈 상품 문서를 만들지 않습니다.
+    assert "emart_product/2" not in fake_db.docs
+    assert fake_db.docs["emart_price/1"]["current_price"]["selling_price"] == "1,400"
+    assert fake_db.docs["emart_price/2"]["last_updated"] == "2026-10-17T09:00:00"
+
+    with RefreshScheduleStore(scheduler["db_path"]) as store:
+        # 두 상품 모두 확인 결과가 기록되어 다음 확인 시각이 주기만큼 뒤로 갑니다.
+        assert store.due(10) == []
+        assert store.stats()["checks"] == 2
+        assert store.stats()["changes"] == 1
+
+
+def test_sold_out_product_is_removed_from_schedule(fake_db, scheduler, monkeypatch):
+    original_iter = refresh_scheduler.iter_products_by_ids
+
+    def sold_out_iter(product_ids, deadline=None):
+        for product_id, data in original_iter(product_ids, deadline):
+            if product_id == "2":
+                data["out_of_stock"] = "Y"
+            yield product_id, data
+
+    monkeypatch.setattr(refresh_scheduler, "iter_products_by_ids", sold_out_iter)
+
+    result = refresh_scheduler.run_refresh(budget=10)
+
+    assert (result["status"], result["checked"], result["deleted"]) == ("success", 1, 1)
+    assert "emart_price/2" not in fake_db.docs
+    with RefreshScheduleStore(scheduler["db_path"]) as store:
+        assert store.all_ids() == {"1"}
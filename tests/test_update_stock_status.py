@@ -0,0 +1,64 @@
+# tests/test_update_stock_status.py
+# 오래된 가격 문서의 재고 상태를 품절로 바꾸는 정리 작업과, out_of_stock이 없는 예전 문서 채우기를 확인합니다.
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+import update_stock_status
+
+
+@pytest.fixture
+def stock_db(fake_db, monkeypatch):
+    fake_db.meter = SimpleNamespace(finish=lambda: None)
+    monkeypatch.setattr(update_stock_status, "initialize_firebase", lambda: None)
+    monkeypatch.setattr(update_stock_status, "firestore", SimpleNamespace(client=lambda: fake_db))
+    monkeypatch.setattr(update_stock_status, "metered_client", lambda db, name: db)
+    stale = (datetime.now() - timedelta(days=10)).isoformat()
+    fresh = datetime.now().isoformat()
+    fake_db.docs = {
+        "emart_price/in_stock": {"out_of_stock": "N", "last_updated": stale},
+        "emart_price/unknown": {"out_of_stock": "", "last_updated": stale},
+        "emart_price/missing": {"last_updated": stale},
+        "emart_price/null": {"out_of_stock": None, "last_updated": stale},
+        "emart_price/sold_out": {"out_of_stock": "Y", "last_updated": stale},
+        "emart_price/fresh": {"out_of_stock": "N", "last_updated": fresh},
+        "emart_price/fresh_missing": {"last_updated": fresh},
+    }
+    return fake_db
+
+
+def _stock(db):
+    return {path.split("/")[1]: data.get("out_of_stock") for path, data in db.docs.items()}
+
+
+def test_sweep_marks_stale_in_stock_and_unknown_docs(stock_db):
+    result = update_stock_status.update_old_products_to_out_of_stock()
+
+    assert result == {"status": "success", "scanned": 2, "updated": 2, "failed": 0}
+    assert _stock(stock_db) == {
+        "in_stock": "Y",
+        "unknown": "Y",
+        "missing": None,
+        "null": None,
+        "sold_out": "Y",
+        "fresh": "N",
+        "fresh_missing": None,
+    }
+
+
+def test_backfill_lets_sweep_find_docs_without_stock_status(stock_db):
+    backfill = update_stock_status.backfill_missing_stock_status()
+
+    assert backfill == {"status": "success", "scanned": 7, "updated": 3, "failed": 0}
+    assert update_stock_status.update_old_products_to_out_of_stock()["updated"] == 4
+    assert _stock(stock_db) == {
+        "in_stock": "Y",
+        "unknown": "Y",
+        "missing": "Y",
+        "null": "Y",
+        "sold_out": "Y",
+        "fresh": "N",
+        "fresh_missing": "",
+    }
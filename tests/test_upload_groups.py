@@ -0,0 +1,86 @@
+# tests/test_upload_groups.py
+# 결과 디렉토리를 우선 카테고리별로 나눠 올릴 때 묶음별 결과를 하나로 합치고 파일을 정리하는지 확인합니다.
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import firebase_uploader
+from jsonl_store import iter_records
+
+
+def _write_result(directory, category, ids):
+    records = [
+        {
+            "id": product_id,
+            "category": category,
+            "product_name": f"상품 {product_id}",
+            "image_url": f"https://example.com/{product_id}.jpg",
+            "original_price": "2,000",
+            "selling_price": "1,500",
+            "out_of_stock": "N",
+            "quantity": "1",
+            "last_updated": "2026-10-01T10:00:00",
+        }
+        for product_id in ids
+    ]
+    path = directory / f"{category}.jsonl"
+    path.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8")
+    return path
+
+
+@pytest.fixture
+def notified(monkeypatch):
+    """ 임베딩 서버에 보낸 시작 신호입니다. """
+    calls = []
+    monkeypatch.setattr(firebase_uploader, "notify_embedding_server", lambda: calls.append(True))
+    return calls
+
+
+@pytest.fixture
+def result_dir(fake_db, notified, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("EMART_UPLOAD_STATE_DB", "")
+    monkeypatch.setenv("EMART_DEDUP_PRECEDENCE", "과일,채소")
+    monkeypatch.setenv("EMART_UPLOAD_WORKERS", "2")
+    fake_db.meter = SimpleNamespace(finish=lambda: None)
+    monkeypatch.setattr(firebase_uploader, "initialize_firebase", lambda: None)
+    monkeypatch.setattr(firebase_uploader, "get_db", lambda: fake_db)
+    monkeypatch.setattr(firebase_uploader, "metered_client", lambda db, name: db)
+
+    directory = tmp_path / "result_json"
+    directory.mkdir()
+    _write_result(directory, "과일", ["1", "2"])
+    _write_result(directory, "채소", ["2", "3"])
+    return directory
+
+
+def test_groups_are_aggregated_and_files_removed(fake_db, result_dir, notified, capsys):
+    result = firebase_uploader.upload_json_to_firestore("result_json")
+
+    assert result["status"] == "success"
+    assert notified == [True]
+    assert list(result_dir.iterdir()) == []
+    # 두 카테고리에 나온 상품 2는 우선 카테고리(과일) 묶음에서 한 번만 올립니다.
+    assert fake_db.docs["emart_product/2"]["categories"] == ["과일", "채소"]
+    assert fake_db.docs["emart_product/3"]["category"] == "채소"
+    summary = capsys.readouterr().out
+    assert "가격 변경되어 history 추가: 3개" in summary
+    assert "신규 추가된 상품: 3개" in summary
+    assert "커밋 9개, 실패 0개" in summary
+
+
+def test_failed_group_keeps_only_its_records(fake_db, result_dir, notified, capsys):
+    fake_db.fail_paths = {"emart_price/3"}
+
+    result = firebase_uploader.upload_json_to_firestore("result_json")
+
+    assert result["status"] == "error"
+    assert "3개 쓰기 작업이 실패했습니다" in result["error"]
+    assert notified == []
+    # 과일 묶음은 커밋되어 파일을 지우고, 채소 파일에는 커밋하지 못한 상품 3만 남깁니다.
+    assert sorted(path.name for path in result_dir.iterdir()) == ["채소.jsonl"]
+    assert [record["id"] for record in iter_records(str(result_dir / "채소.jsonl"))] == ["3"]
+    assert "emart_product/1" in fake_db.docs and "emart_product/3" not in fake_db.docs
+    assert "커밋 6개, 실패 3개" in capsys.readouterr().out
@@ -2,14 +2,21 @@ import firebase_admin
 from firebase_admin import credentials, firestore
 from google.cloud.firestore_v1.base_query import FieldFilter
 from datetime import datetime, timedelta
-import requests
-from bs4 import BeautifulSoup
+import os
 import time
-from typing import Dict, Union, List
-import random
+from typing import Dict, Iterable, List, Union
+from firebase_uploader import update_price_history
+from firestore_bulk import BulkWriter, bulk_delete, get_documents, iter_documents, read_chunk_size_from_env
+from firestore_metrics import metered_client
+from price_history import PRICE_BUCKET_COLLECTION, PRICE_COLLECTION, last_price_from_doc
+from scrape_by_id import iter_products_by_ids
+from upload_state import forget_products, open_state_store
+
+# 결과가 이만큼 쌓이면 배치가 가득 차지 않았어도 커밋을 시작합니다.
+SEND_EVERY_PRODUCTS = 50
 
 # ==============================================================================
-# 1. Firebase 연동 및 스크래핑 로직 (기존과 동일)
+# 1. Firebase 연동
 # ==============================================================================
 
 
@@ -25,155 +32,165 @@ def initialize_firebase():
             raise
 
 
-def scrape_single_product(product_id: str, retry_count=0) -> Union[Dict, None]:
-    """[수정됨] 품절 시 "Y" 문자열 대신 out_of_stock 키를 포함한 딕셔너리 반환"""
-    url = f"https://emart.ssg.com/item/itemView.ssg?itemId={product_id}"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+def stale_refresh_settings_from_env():
+    """
+    오래된 상품 갱신 설정입니다.
+      - EMART_STALE_DAYS: 마지막 갱신 후 이 일수가 지난 상품을 갱신합니다. (기본 7)
+      - EMART_STALE_TIME_BUDGET: 한 번 실행할 때 쓸 수 있는 시간(초)입니다. 0이면 제한하지 않습니다. (기본 1800)
+      - EMART_STALE_MAX_PRODUCTS: 한 번에 갱신할 최대 상품 수입니다. 0이면 제한하지 않습니다. (기본 0)
+    동시 요청 수는 scrape_by_id와 같은 EMART_ID_CONCURRENCY를 사용합니다.
+    """
+    return {
+        "stale_days": float(os.environ.get("EMART_STALE_DAYS", 7)),
+        "time_budget": float(os.environ.get("EMART_STALE_TIME_BUDGET", 1800)),
+        "max_products": int(os.environ.get("EMART_STALE_MAX_PRODUCTS", 0)),
     }
-    try:
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        out_of_stock = "Y" if "품절" in str(soup.select_one(".cdtl_btn_wrap3")) else "N"
-
-        if out_of_stock == "Y":
-            # 품절이어도 일관된 데이터 형태를 반환
-            return {"out_of_stock": "Y"}
 
-        selling_price_tag = soup.select_one("span.cdtl_new_price.notranslate > em")
-        selling_price = (
-            selling_price_tag.get_text(strip=True).replace(",", "").replace("원", "")
-            if selling_price_tag
-            else None
-        )
-        original_price_tag = soup.select_one("span.cdtl_old_price > em")
-        if not original_price_tag:
-            original_price_tag = soup.select_one("span.cdtl_first_price > em")
-        original_price = (
-            original_price_tag.get_text(strip=True).replace(",", "").replace("원", "")
-            if original_price_tag
-            else None
-        )
-        if original_price and not selling_price:
-            selling_price = original_price
-        elif selling_price and not original_price:
-            original_price = selling_price
-        elif not original_price and not selling_price:
-            price_tag = soup.select_one(".cdtl_row_price em.ssg_price")
-            price = (
-                price_tag.get_text(strip=True).replace(",", "").replace("원", "")
-                if price_tag
-                else "0"
-            )
-            original_price, selling_price = price, price
-        quantity_tag = soup.select_one("div.cdtl_optprice_wrap > p.cdtl_txt_info")
-        quantity = (
-            " ".join(quantity_tag.get_text(strip=True).split()) if quantity_tag else ""
-        )
 
-        return {
-            "id": product_id,
-            "original_price": original_price,
-            "selling_price": selling_price,
-            "quantity": quantity,
-            "out_of_stock": out_of_stock,
-            "last_updated": datetime.now().isoformat(),
-        }
-    except requests.exceptions.HTTPError as http_err:
-        if http_err.response.status_code == 429:
-            if retry_count < 10:
-                wait_time = 10 + random.uniform(0, 5)
-                print(
-                    f"  -> ⏳ 429 에러: {int(wait_time)}초 후 재시도... ({retry_count+1}/10)"
-                )
-                time.sleep(wait_time)
-                return scrape_single_product(product_id, retry_count + 1)
-            else:
-                print(f"  -> 🚨 오류: ID {product_id} 재시도 실패.")
-                return None
-        else:
-            print(
-                f"  -> 🚨 오류: ID {product_id} 스크래핑 실패 (HTTP 에러 {http_err.response.status_code})"
-            )
-            return None
-    except Exception as e:
-        print(f"  -> 🚨 오류: ID {product_id} 스크래핑 실패: {e}")
-        return None
+def delete_products(db, product_ids, writer=None):
+    """
+    상품의 가격 문서(월별 가격 이력 버킷 포함), 상품 문서, 벡터 문서를 firestore_bulk.bulk_delete로 지웁니다.
+    Returns:
+        dict: 삭제한 문서 수(deleted)와 실패한 삭제 수(failed)
+    """
+    product_ids = list(product_ids)
+    # 월별 가격 이력 버킷은 가격 문서를 지워도 남으므로 함께 지웁니다.
+    price_result = bulk_delete(
+        db,
+        (db.collection(PRICE_COLLECTION).document(pid) for pid in product_ids),
+        [PRICE_BUCKET_COLLECTION],
+        writer,
+    )
+    other_result = bulk_delete(
+        db,
+        (
+            db.collection(collection).document(pid)
+            for pid in product_ids
+            for collection in ("emart_product", "emart_vector")
+        ),
+        writer=writer,
+    )
+    return {key: price_result[key] + other_result[key] for key in price_result}
+
+
+def _read_last_prices(db, state_store, product_ids):
+    """
+    상품들의 마지막 가격 기록입니다. 업로드 상태 저장소에 있는 상품은 Firestore를 읽지 않고,
+    나머지는 가격 문서의 current_price를 get_all로 한 번에 읽습니다.
+    Returns:
+        dict: 상품 ID -> 마지막 가격 기록 (가격 문서가 없으면 None)
+    """
+    prices = state_store.get_prices(product_ids) if state_store else {}
+    missing = [pid for pid in product_ids if pid not in prices]
+    if missing:
+        price_docs = get_documents(db, PRICE_COLLECTION, missing, field_paths=["current_price", "price_history"])
+        for pid, data in price_docs.items():
+            prices[pid] = last_price_from_doc(data)
+    return prices
 
 
 # ==============================================================================
-# 3. 메인 로직 (핵심 수정)
+# 2. 메인 로직
 # ==============================================================================
 
 
-def find_and_update_stale_products():
-    """Firestore 쿼리를 사용하여 업데이트가 지난 상품만 찾아 갱신합니다."""
-    # ... (내용 동일)
+def find_and_update_stale_products(time_budget: float = None):
+    """
+    마지막 갱신이 오래된 상품부터 순서대로 동시에 스크래핑하여 갱신합니다.
+    시간 예산(time_budget초, 기본값 EMART_STALE_TIME_BUDGET)이 다 되면 새 상품을 더 요청하지 않고,
+    이미 요청한 상품까지 반영한 뒤 멈춥니다. 남은 상품은 다음 실행에서 가장 먼저 갱신합니다.
+    모든 오래된 상품을 처리한 경우에만 오래된 가격 문서를 정리합니다.
+    (중간에 멈췄을 때 정리하면 아직 갱신하지 못한 상품의 가격 문서까지 지워지기 때문입니다)
+    Returns:
+        dict: 상태와 갱신 결과
+    """
+    settings = stale_refresh_settings_from_env()
+    if time_budget is None:
+        time_budget = settings["time_budget"]
+    deadline = time.monotonic() + time_budget if time_budget > 0 else None
+    db = None
     try:
         initialize_firebase()
-        db = firestore.client()
-        one_day_ago_iso = (datetime.now() - timedelta(days=7)).isoformat()
-        print(f"🚀 기준 시간: {one_day_ago_iso} 이전에 업데이트된 상품을 찾습니다.\n")
+        db = metered_client(firestore.client(), "stale_refresh")
+        cutoff_iso = (datetime.now() - timedelta(days=settings["stale_days"])).isoformat()
+        print(f"🚀 기준 시간: {cutoff_iso} 이전에 업데이트된 상품을 찾습니다.\n")
         product_collection_ref = db.collection("emart_product")
 
+        # 오래된 것부터 갱신하도록 last_updated 순서로 ID만 읽습니다.
         query = product_collection_ref.where(
-            filter=FieldFilter("last_updated", "<", one_day_ago_iso)
-        )
-        docs_to_update = list(query.stream())
+            filter=FieldFilter("last_updated", "<", cutoff_iso)
+        ).select(["last_updated"])
+        stale_product_ids = [
+            doc.id
+            for doc in iter_documents(
+                query, ["last_updated"], limit=settings["max_products"] or None
+            )
+        ]
+        limited = settings["max_products"] > 0 and len(stale_product_ids) >= settings["max_products"]
 
-        if not docs_to_update:
+        result = {
+            "stale": len(stale_product_ids), "updated": 0, "price_changed": 0, "deleted": 0, "failed": 0, "remaining": 0,
+        }
+        if not stale_product_ids:
             print("✅ 모든 상품이 최신 상태입니다. 업데이트할 항목이 없습니다.")
         else:
-            stale_product_ids = [doc.id for doc in docs_to_update]
             print(
                 f"🔍 총 {len(stale_product_ids)}개의 오래된 상품을 찾았습니다. 업데이트를 시작합니다.\n"
             )
-            scrape_and_update_products_by_ids(stale_product_ids)
+            result.update(scrape_and_update_products_by_ids(stale_product_ids, db, deadline))
 
-        # --- [핵심 추가 로직] ---
-        # --- 2단계: 오래된 가격 문서 삭제 ---
+        if result["remaining"] or limited:
+            print("⏱️ 이번 실행에서 갱신하지 못한 상품이 남아 있어 오래된 가격 문서 정리는 건너뜁니다.")
+            return {"status": "partial", **result}
 
+        # --- 2단계: 오래된 가격 문서 삭제 ---
         print(f"\n===== 'emart_price' 컬렉션의 오래된 문서 정리 시작 =====")
-        price_collection_ref = db.collection("emart_price")
-
-        # 쿼리를 사용하여 기준 시간보다 오래된 가격 문서를 찾습니다.
-        price_query = price_collection_ref.where(
-            filter=FieldFilter("last_updated", "<", one_day_ago_iso)
-        )
-        docs_to_delete = list(price_query.stream())
-
-        if not docs_to_delete:
+        # 기준 시간보다 오래된 가격 문서를 찾는 대로 500개 단위 배치로 나눠 병렬로 지웁니다.
+        price_query = db.collection(PRICE_COLLECTION).where(
+            filter=FieldFilter("last_updated", "<", cutoff_iso)
+        ).select(["last_updated"])
+        price_collection_ref = db.collection(PRICE_COLLECTION)
+        stale_price_ids = []
+
+        def stale_price_refs():
+            # 버킷 목록 읽기도 사용량에 세도록 계측 클라이언트로 참조를 만듭니다. (doc.reference는 계측되지 않음)
+            for doc in iter_documents(price_query, ["last_updated"]):
+                stale_price_ids.append(doc.id)
+                yield price_collection_ref.document(doc.id)
+
+        delete_result = bulk_delete(db, stale_price_refs(), [PRICE_BUCKET_COLLECTION])
+        forget_products(stale_price_ids)
+
+        if not stale_price_ids:
             print("✅ 삭제할 오래된 가격 문서가 없습니다.")
-            return
-
-        print(f"🗑️ 총 {len(docs_to_delete)}개의 오래된 가격 문서를 삭제합니다...")
-
-        # Batch를 사용하여 모든 삭제 작업을 한 번에 처리합니다.
-        batch = db.batch()
-        for doc in docs_to_delete:
-            batch.delete(doc.reference)
-
-        batch.commit()
-        print(f"✨ 총 {len(docs_to_delete)}개의 오래된 가격 문서 삭제를 완료했습니다.")
+            return {"status": "success", **result}
+        if delete_result["failed"]:
+            print(f"🔥 {delete_result['failed']}개 삭제 작업이 실패했습니다. 다음 실행에서 다시 정리합니다.")
+            return {"status": "error", "error": f"{delete_result['failed']}개 삭제 작업이 실패했습니다.", **result}
+        print(
+            f"✨ 총 {len(stale_price_ids)}개의 오래된 가격 문서 삭제를 완료했습니다. "
+            f"(가격 이력 버킷 포함 {delete_result['deleted']}개 문서)"
+        )
+        return {"status": "success", "price_docs_deleted": len(stale_price_ids), **result}
 
     except Exception as e:
         print(f"\n🔥 작업 중 심각한 오류가 발생했습니다: {e}")
+        return {"status": "error", "error": str(e)}
+    finally:
+        if db is not None:
+            db.meter.finish()
 
 
-def delete_product_from_all_collections(product_ids: List[str]):
+def delete_product_from_all_collections(product_ids: List[str], db=None):
     """주어진 ID 목록에 해당하는 상품 문서를 emart_price, emart_product, emart_vector에서 모두 삭제합니다."""
-    # ... (내용 동일)
     try:
         initialize_firebase()
-        db = firestore.client()
-        batch = db.batch()
-        for pid in product_ids:
-            batch.delete(db.collection("emart_price").document(pid))
-            batch.delete(db.collection("emart_product").document(pid))
-            batch.delete(db.collection("emart_vector").document(pid))
-        batch.commit()
+        db = db or firestore.client()
+        delete_result = delete_products(db, product_ids)
+        forget_products(product_ids)
+        if delete_result["failed"]:
+            print(f"\n🔥 {delete_result['failed']}개 삭제 작업이 실패했습니다.")
+            return
         print(
             f"\n✨ {len(product_ids)}개 ID에 대한 문서 삭제 작업이 성공적으로 완료되었습니다."
         )
@@ -181,70 +198,112 @@ def delete_product_from_all_collections(product_ids: List[str]):
         print(f"\n🔥 작업 중 오류가 발생했습니다: {e}")
 
 
-def scrape_and_update_products_by_ids(stale_products: Dict[str, Dict]):
+def scrape_and_update_products_by_ids(
+    stale_products: Union[Iterable[str], Dict[str, Dict]], db=None, deadline: float = None
+):
     """
-    [수정됨] 주어진 상품 정보를 스크래핑하고, 모든 DB 업데이트를 Batch로 효율적으로 처리합니다.
+    주어진 상품을 목록 순서대로(오래된 것부터) 동시에 스크래핑하고, 결과가 나오는 대로
+    가격/상품 문서 갱신을 BulkWriter 배치에 넣어 커밋합니다. 품절 상품은 모든 컬렉션에서 삭제합니다.
+    가격은 마지막 가격 기록(업로드 상태 저장소 또는 가격 문서의 current_price)과 비교하여
+    바뀐 경우에만 가격 이력에 기록합니다. (firebase_uploader.update_price_history)
+    동시 요청 수와 요청 속도는 scrape_by_id.iter_products_by_ids(EMART_ID_CONCURRENCY, 호스트별 속도 제한기)를 따릅니다.
+    Args:
+        stale_products: 상품 ID 목록 (ID를 키로 하는 dict도 받습니다)
+        db: Firestore 클라이언트 (예: 사용량을 세는 클라이언트, 생략 시 새로 만듭니다)
+        deadline (float): time.monotonic() 기준 마감 시각입니다. 지나면 새 상품을 요청하지 않습니다.
+    Returns:
+        dict: updated, price_changed, deleted, failed, remaining 개수
     """
-    db = firestore.client()
-    price_collection_ref = db.collection("emart_price")
+    db = db or firestore.client()
     product_collection_ref = db.collection("emart_product")
+    product_ids = list(stale_products)
 
-    batch = db.batch()
     updated_count = 0
+    price_changed_count = 0
     deleted_count = 0
+    failed_count = 0
+    written_prices = {}
+    sold_out_ids = []
+    # 마지막 가격은 결과가 도착하는 순서(입력 순서)대로 EMART_FIRESTORE_READ_CHUNK개씩 미리 읽습니다.
+    read_chunk_size = read_chunk_size_from_env()
+    last_prices = {}
+    next_read = 0
+    state_store = open_state_store()
 
-    product_ids = list(stale_products.keys())
-
-    for i, product_id in enumerate(product_ids):
-        print(f"({i+1}/{len(product_ids)}) ID: {product_id} 처리 중...")
-
-        scraped_data = scrape_single_product(product_id)
-        if not scraped_data:
-            continue
-
-        if scraped_data.get("out_of_stock") == "Y":
-            # [수정] 치명적 오류 해결
-            delete_product_from_all_collections([product_id])
-            deleted_count += 1
-            print(f"  -> ID: {product_id} 품절로 간주되어 삭제되었습니다.")
-            continue
-
-        # --- [핵심 수정] DB 읽기 없이 Batch 작업만 수행 ---
-        price_doc_ref = price_collection_ref.document(product_id)
-
-        price_update_payload = {
-            "id": product_id,
-            "out_of_stock": scraped_data["out_of_stock"],
-            "quantity": scraped_data["quantity"],
-            "last_updated": scraped_data["last_updated"],
-            "price_history": firestore.ArrayUnion(
-                [
-                    {
-                        "original_price": scraped_data["original_price"],
-                        "selling_price": scraped_data["selling_price"],
-                        "last_updated": scraped_data["last_updated"],
-                    }
-                ]
-            ),
-        }
-
-        batch.set(price_doc_ref, price_update_payload, merge=True)
-        product_doc_ref = product_collection_ref.document(product_id)
-        batch.update(product_doc_ref, {"last_updated": scraped_data["last_updated"]})
-
-        updated_count += 1
-        if updated_count > 0 and updated_count % 50 == 0:
-            batch.commit()
-            batch = db.batch()
-
-        time.sleep(random.uniform(1, 3))
-
-    if updated_count > 0:
-        batch.commit()
-
-    print(f"\n✨ 총 {updated_count}개 상품 정보를 성공적으로 갱신했습니다.")
+    try:
+        with BulkWriter(db) as writer:
+            results = iter_products_by_ids(product_ids, deadline=deadline)
+            for i, (product_id, scraped_data) in enumerate(results):
+                print(f"({i+1}/{len(product_ids)}) ID: {product_id} 처리 완료")
+                if not scraped_data:
+                    failed_count += 1
+                    continue
+
+                if scraped_data.get("out_of_stock") == "Y":
+                    sold_out_ids.append(product_id)
+                    deleted_count += 1
+                    print(f"  -> ID: {product_id} 품절로 간주되어 삭제됩니다.")
+                    continue
+
+                while product_id not in last_prices and next_read < len(product_ids):
+                    chunk = product_ids[next_read:next_read + read_chunk_size]
+                    next_read += len(chunk)
+                    last_prices.update(_read_last_prices(db, state_store, chunk))
+
+                price_info = {
+                    "original_price": scraped_data["original_price"],
+                    "selling_price": scraped_data["selling_price"],
+                    "last_updated": scraped_data["last_updated"],
+                }
+                status = update_price_history(
+                    writer, db, last_prices.get(product_id), product_id,
+                    scraped_data["out_of_stock"], scraped_data["quantity"],
+                    scraped_data["last_updated"], price_info,
+                )
+                if status == "updated":
+                    price_changed_count += 1
+                written_prices[product_id] = price_info
+                product_doc_ref = product_collection_ref.document(product_id)
+                writer.update(product_doc_ref, {"last_updated": scraped_data["last_updated"]})
+
+                updated_count += 1
+                if updated_count % SEND_EVERY_PRODUCTS == 0:
+                    writer.flush(wait_done=False)
+
+            # 품절 상품은 갱신 쓰기와 같은 writer로 한꺼번에 지웁니다.
+            if sold_out_ids:
+                delete_products(db, sold_out_ids, writer)
+
+        if state_store:
+            if writer.failed_count:
+                # 어떤 쓰기가 반영됐는지 알 수 없으므로 다음 업로드 때 Firestore에서 다시 읽습니다.
+                state_store.forget(written_prices)
+            else:
+                state_store.record_prices(written_prices)
+            state_store.forget(sold_out_ids)
+    finally:
+        if state_store:
+            state_store.close()
+    processed_count = updated_count + deleted_count + failed_count
+    remaining_count = len(product_ids) - processed_count
+
+    print(f"\n✨ 총 {updated_count}개 상품 정보를 갱신했습니다. (가격 변경 {price_changed_count}개)")
     print(f"🗑️ 총 {deleted_count}개 상품을 품절 처리 후 삭제했습니다.")
+    if failed_count:
+        print(f"🚨 {failed_count}개 상품은 스크래핑에 실패했습니다.")
+    if remaining_count:
+        print(f"⏱️ 시간 예산이 다 되어 {remaining_count}개 상품은 다음 실행으로 미룹니다.")
+    if writer.failed_count:
+        print(f"🔥 {writer.failed_count}개 쓰기 작업이 실패했습니다.")
+    return {
+        "updated": updated_count,
+        "price_changed": price_changed_count,
+        "deleted": deleted_count,
+        "failed": failed_count,
+        "remaining": remaining_count,
+        "failed_writes": writer.failed_count,
+    }
 
 
 if __name__ == "__main__":
-    find_and_update_stale_products()
+    print(find_and_update_stale_products())
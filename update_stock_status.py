@@ -1,8 +1,12 @@
 # 오래된 상품 재고 없음으로 변경
 
 import firebase_admin
+import sys
 from firebase_admin import credentials, firestore
+from google.cloud.firestore_v1.base_query import FieldFilter
 from datetime import datetime, timedelta
+from firestore_bulk import BulkWriter, scan_pages
+from firestore_metrics import metered_client
 
 def initialize_firebase():
     """ Firebase Admin SDK를 초기화합니다. """
@@ -16,72 +20,111 @@ def initialize_firebase():
         print(f"Firebase 초기화 중 오류가 발생했습니다: {e}")
         raise
 
-def update_old_products_to_out_of_stock():
+# 아직 품절로 표시하지 않은 out_of_stock 값 ('N': 재고 있음, '': 알 수 없음)
+SWEEP_STOCK_VALUES = ["N", ""]
+
+
+def update_old_products_to_out_of_stock(stale_days=7, page_size=None):
     """
-    'emart_product' 컬렉션에서 마지막 업데이트가 일주일 이상 된 상품의
-    'out_of_stock' 상태를 'Y'로 변경합니다.
+    'emart_price' 컬렉션에서 마지막 업데이트가 stale_days일(기본 일주일) 이상 지났고 아직 품절로 표시하지 않은
+    (out_of_stock이 'N' 또는 빈 값) 상품의 'out_of_stock' 상태를 'Y'로 변경합니다.
+    컬렉션 전체를 읽지 않고 out_of_stock in ['N', ''] 및 last_updated 범위 쿼리로 오래된 문서만 page_size개씩
+    커서로 읽으므로(page_size 기본값: EMART_FIRESTORE_SCAN_PAGE_SIZE), 읽기 비용은 오래된 문서 수에만 비례합니다.
+    (out_of_stock + last_updated 복합 색인이 필요합니다. 처음 실행할 때 오류 메시지의 링크로 만들 수 있습니다)
+    out_of_stock 필드가 아예 없거나 null인 문서는 쿼리로 찾을 수 없으므로,
+    예전 데이터가 있으면 backfill_missing_stock_status()를 한 번 실행해 빈 값으로 채워 두세요.
+    Returns:
+        dict: 상태와 읽은 문서 수(scanned), 변경한 문서 수(updated), 실패한 쓰기 수(failed)
     """
+    db = None
     try:
         initialize_firebase()
-        db = firestore.client()
+        db = metered_client(firestore.client(), "stock_sweep")
 
-        # 1. 일주일 전의 날짜와 시간을 계산합니다.
-        one_week_ago = datetime.now() - timedelta(weeks=1)
-        print(f"기준 시간: {one_week_ago.isoformat()} 이전의 데이터를 확인합니다.")
+        # 1. 기준 시각을 계산합니다.
+        cutoff = datetime.now() - timedelta(days=stale_days)
+        print(f"기준 시간: {cutoff.isoformat()} 이전의 데이터를 확인합니다.")
 
-        # 2. 'emart_product' 컬렉션의 모든 문서를 가져옵니다.
+        # 2. 품절로 표시하지 않았으면서 기준 시각보다 오래된 문서만 last_updated 순서로 읽습니다.
         products_ref = db.collection("emart_price")
-        docs = products_ref.stream()
-
-        batch = db.batch()
-        update_count = 0
-        total_count = 0
+        query = (
+            products_ref.where(filter=FieldFilter("out_of_stock", "in", SWEEP_STOCK_VALUES))
+            .where(filter=FieldFilter("last_updated", "<", cutoff.isoformat()))
+            .select(["last_updated"])
+        )
 
+        scanned_count = 0
         print("상품 데이터 확인을 시작합니다...")
 
-        for doc in docs:
-            total_count += 1
-            product_data = doc.to_dict()
-            
-            # 3. 문서에 'last_updated' 필드가 있는지 확인합니다.
-            last_updated_str = product_data.get("last_updated")
-            if not last_updated_str:
-                continue # 필드가 없으면 건너뜁니다.
-            
-            try:
-                # 4. 업데이트 시간을 datetime 객체로 변환합니다.
-                last_updated_time = datetime.fromisoformat(last_updated_str)
-
-                # 5. 업데이트 시간이 일주일보다 오래되었는지 비교합니다.
-                if last_updated_time < one_week_ago:
-                    # 조건에 맞으면, 업데이트할 내용을 배치(batch)에 추가합니다.
-                    doc_ref = products_ref.document(doc.id)
-                    batch.update(doc_ref, {"out_of_stock": "Y"})
-                    update_count += 1
-                    print(f"  - ID: {doc.id} 상태 변경 예정 (마지막 업데이트: {last_updated_str})")
-
-                    # 6. 배치에 450개 작업이 쌓이면, 한 번에 커밋하여 서버 부담을 줄입니다.
-                    if update_count % 450 == 0:
-                        batch.commit()
-                        batch = db.batch()
-                        print(f"--- 중간 커밋: {update_count}개 문서 업데이트 완료 ---")
-
-            except (ValueError, TypeError):
-                # 날짜 형식이 잘못된 경우를 대비한 예외 처리
-                print(f"  - 경고: ID {doc.id}의 'last_updated' 필드 형식이 잘못되었습니다: {last_updated_str}")
-                continue
-        
-        # 7. 남아있는 모든 업데이트 작업을 최종 커밋합니다.
-        if update_count > 0 and update_count % 450 != 0:
-            batch.commit()
+        # 3. 변경은 500개 단위 배치로 묶어 병렬로 커밋합니다.
+        with BulkWriter(db) as writer:
+            for docs in scan_pages(query, ["last_updated"], page_size):
+                for doc in docs:
+                    writer.update(doc.reference, {"out_of_stock": "Y"})
+                scanned_count += len(docs)
+                print(f"--- {scanned_count}개 문서 상태 변경 요청 (마지막 업데이트: {(docs[-1].to_dict() or {}).get('last_updated')}) ---")
 
+        result = {
+            "status": "success" if not writer.failed_count else "error",
+            "scanned": scanned_count,
+            "updated": writer.committed_count,
+            "failed": writer.failed_count,
+        }
         print("\n===== 작업 완료 =====")
-        print(f"총 {total_count}개의 상품을 확인했습니다.")
-        print(f"총 {update_count}개 상품의 재고 상태를 'Y'로 변경했습니다.")
+        print(f"총 {scanned_count}개의 오래된 상품 문서를 읽었습니다.")
+        print(f"총 {writer.committed_count}개 상품의 재고 상태를 'Y'로 변경했습니다.")
+        if writer.failed_count:
+            print(f"{writer.failed_count}개 문서는 변경하지 못했습니다. 다음 실행에서 다시 시도합니다.")
+        return result
+
+    except Exception as e:
+        print(f"작업 중 오류가 발생했습니다: {e}")
+        return {"status": "error", "error": str(e)}
+    finally:
+        if db is not None:
+            db.meter.finish()
+
+
+def backfill_missing_stock_status(page_size=None):
+    """
+    out_of_stock 필드가 없거나 null인 'emart_price' 문서에 빈 값('')을 채워,
+    update_old_products_to_out_of_stock()의 쿼리가 이 문서들도 찾도록 합니다. (컬렉션 전체를 한 번 읽습니다)
+    Returns:
+        dict: 상태와 읽은 문서 수(scanned), 채운 문서 수(updated), 실패한 쓰기 수(failed)
+    """
+    db = None
+    try:
+        initialize_firebase()
+        db = metered_client(firestore.client(), "stock_backfill")
+        products_ref = db.collection("emart_price")
+
+        scanned_count = 0
+        with BulkWriter(db) as writer:
+            for docs in scan_pages(products_ref.select(["out_of_stock"]), page_size=page_size):
+                for doc in docs:
+                    if (doc.to_dict() or {}).get("out_of_stock") is None:
+                        writer.update(doc.reference, {"out_of_stock": ""})
+                scanned_count += len(docs)
+                print(f"--- {scanned_count}개 문서 확인 ---")
+
+        print(f"\n총 {scanned_count}개 문서 중 {writer.committed_count}개 문서의 재고 상태를 빈 값으로 채웠습니다.")
+        return {
+            "status": "success" if not writer.failed_count else "error",
+            "scanned": scanned_count,
+            "updated": writer.committed_count,
+            "failed": writer.failed_count,
+        }
 
     except Exception as e:
         print(f"작업 중 오류가 발생했습니다: {e}")
+        return {"status": "error", "error": str(e)}
+    finally:
+        if db is not None:
+            db.meter.finish()
 
 
 if __name__ == "__main__":
-    update_old_products_to_out_of_stock()
\ No newline at end of file
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        print(backfill_missing_stock_status())
+    else:
+        print(update_old_products_to_out_of_stock())
\ No newline at end of file
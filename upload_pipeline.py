@@ -0,0 +1,219 @@
+# upload_pipeline.py
+# 크롤링한 상품을 결과 파일을 거치지 않고 바로 Firestore에 올리는 스트리밍 파이프라인
+#
+# 페이지를 파싱하는 대로 상품이 프로세스 안의 대기열을 거쳐 업로드 스레드로 넘어가고,
+# 업로드 스레드는 크롤링이 계속되는 동안 500개 단위 배치로 Firestore에 씁니다.
+#
+# 사용법:
+#   python upload_pipeline.py price   # 가격 정보 (scheduler_price)
+#   python upload_pipeline.py full    # 전체 상품 정보 (scheduler_all)
+
+import os
+import queue
+import sys
+import threading
+
+from dotenv import load_dotenv
+
+from emart_crawler import (
+    JsonlCategoryWriter,
+    OrderedPageSink,
+    crawler_from_env,
+    load_categories_from_file,
+    page_range_from_env,
+    parse_page_for_kinds,
+    run_sync,
+)
+from emart_parser import OUTPUTS, project_products
+from firebase_uploader import (
+    FirestoreUploadSession,
+    beacon_for_directory,
+    get_db,
+    initialize_firebase,
+    notify_embedding_server,
+)
+from firestore_metrics import metered_client
+from parse_pool import create_parse_pool
+from product_dedup import ProductDeduplicator
+
+# 업로드 스레드에 크롤링이 끝났음을 알리는 표시
+_STOP = object()
+
+
+class _CategoryDone:
+    """ 카테고리의 모든 페이지를 대기열에 넣었음을 알리는 표시입니다. """
+
+    def __init__(self, category_name):
+        self.category_name = category_name
+
+
+def pipeline_enabled():
+    """ 정기 작업에서 파이프라인을 사용할지 여부입니다. (.env의 EMART_PIPELINE_MODE, 기본 True) """
+    return os.environ.get("EMART_PIPELINE_MODE", "True").lower() == "true"
+
+
+class UploadQueueSink(OrderedPageSink):
+    """
+    페이지 순서대로 상품을 업로드 대기열에 넣습니다.
+    대기열이 가득 차면 자리가 날 때까지 기다리므로, 업로드가 밀리면 크롤링도 함께 느려집니다.
+    audit_writer가 주어지면 같은 상품을 감사용 JSON Lines 파일에도 씁니다.
+    Args:
+        upload_queue (queue.Queue): 업로드 스레드가 읽는 대기열입니다.
+        fields (list): 올릴 필드 목록입니다. (None이면 파서 결과 그대로)
+        audit_writer (JsonlCategoryWriter): 감사용 파일 작성기입니다. (생략 가능)
+    """
+
+    def __init__(self, category_name, upload_queue, fields, start_page, audit_writer=None):
+        super().__init__(start_page)
+        self.category_name = category_name
+        self.upload_queue = upload_queue
+        self.fields = fields
+        self.audit_writer = audit_writer
+
+    def write_page(self, products):
+        if self.audit_writer is not None:
+            self.audit_writer.write_page(products)
+        self.upload_queue.put(
+            (
+                self.category_name,
+                products if self.fields is None else project_products(products, self.fields),
+            )
+        )
+
+    def close(self):
+        if self.audit_writer is not None:
+            self.audit_writer.close()
+        self.upload_queue.put(_CategoryDone(self.category_name))
+        return self.count
+
+    def abort(self):
+        if self.audit_writer is not None:
+            self.audit_writer.abort()
+        # 이미 올린 페이지는 그대로 두고, 지금까지 넣은 쓰기 작업의 커밋을 확인합니다.
+        self.upload_queue.put(_CategoryDone(self.category_name))
+
+
+def _upload_worker(session, upload_queue, flush_seconds, status, dedup):
+    """
+    대기열의 상품을 Firestore에 올리는 스레드입니다.
+    이번 실행에서 이미 올린 상품(다른 카테고리에 먼저 나온 상품)은 다시 올리지 않고 카테고리만 기록합니다.
+    flush_seconds 동안 새 페이지가 없으면 배치가 가득 차지 않았어도 커밋을 시작합니다.
+    카테고리가 끝날 때마다 커밋을 확인합니다.
+    """
+    while True:
+        try:
+            item = upload_queue.get(timeout=flush_seconds)
+        except queue.Empty:
+            if status["error"] is None:
+                session.send_pending()
+            continue
+        if item is _STOP:
+            break
+        if status["error"] is not None:
+            # 오류가 난 뒤에도 크롤링이 멈추지 않도록 대기열은 계속 비웁니다.
+            continue
+        try:
+            if isinstance(item, _CategoryDone):
+                if not session.commit():
+                    status["failed_categories"].append(item.category_name)
+            else:
+                category_name, products = item
+                first_seen = []
+                for product in products:
+                    if dedup.add(product, category_name):
+                        first_seen.append(dict(product, categories=[category_name]))
+                session.upload_records(first_seen)
+        except Exception as e:
+            print(f"Firestore 업로드 스레드에서 오류가 발생했습니다: {e}")
+            status["error"] = str(e)
+
+
+def run_upload_pipeline(kind="price", categories=None):
+    """
+    카테고리를 크롤링하면서 파싱한 상품을 바로 Firestore에 올립니다.
+    .env의 EMART_PIPELINE_AUDIT_DIR를 설정하면 올린 상품을 '<감사 디렉토리>/<결과 디렉토리>/<카테고리>.jsonl'에도 남깁니다.
+    Args:
+        kind (str): "full", "price", "non_price" 중 하나입니다.
+        categories (dict): 카테고리 이름 -> dispCtgId (생략 시 categories.json)
+    Returns:
+        dict: 상태와 카테고리별 상품 수 (크롤링에 실패한 카테고리는 None)
+    """
+    if kind not in OUTPUTS:
+        raise ValueError(f"알 수 없는 결과 종류입니다: {kind}")
+    load_dotenv(override=True)
+    try:
+        initialize_firebase()
+    except Exception as e:
+        return {"status": "error", "error": str(e)}
+
+    if categories is None:
+        categories = load_categories_from_file()
+    start_page, max_page = page_range_from_env()
+    output_dir, fields = OUTPUTS[kind]
+    audit_dir = os.environ.get("EMART_PIPELINE_AUDIT_DIR", "").strip()
+    upload_queue = queue.Queue(maxsize=max(1, int(os.environ.get("EMART_PIPELINE_QUEUE_SIZE", 32))))
+    flush_seconds = float(os.environ.get("EMART_PIPELINE_FLUSH_SECONDS", 2.0))
+
+    def sink_factory(category_name):
+        audit_writer = None
+        if audit_dir:
+            audit_writer = JsonlCategoryWriter(
+                category_name, {os.path.join(audit_dir, output_dir): fields}, start_page
+            )
+        return UploadQueueSink(category_name, upload_queue, fields, start_page, audit_writer)
+
+    db = metered_client(get_db(), f"pipeline_{kind}")
+    session = FirestoreUploadSession(db, beacon_for_directory(output_dir))
+    status = {"error": None, "failed_categories": []}
+    dedup = ProductDeduplicator()
+    uploader = threading.Thread(
+        target=_upload_worker,
+        args=(session, upload_queue, flush_seconds, status, dedup),
+        daemon=True,
+    )
+    uploader.start()
+    print(f"===== '{kind}' 스크래핑-업로드 파이프라인 시작 =====")
+
+    parse_pool = create_parse_pool()
+    try:
+        crawler = crawler_from_env(parse_page_for_kinds([kind]), parse_pool)
+        results = run_sync(crawler.crawl(categories, start_page, max_page, sink_factory))
+    finally:
+        if parse_pool is not None:
+            parse_pool.shutdown()
+        upload_queue.put(_STOP)
+        uploader.join()
+        try:
+            if status["error"] is None:
+                # 여러 카테고리에 나온 상품은 모든 카테고리를 안 뒤에 카테고리 목록만 한 번 더 고칩니다.
+                multi_category_ids = dedup.multi_category_ids()
+                session.update_product_categories(
+                    {pid: dedup.categories_of(pid) for pid in multi_category_ids}
+                )
+                print(
+                    f"카테고리 간 중복 {dedup.duplicate_count}개를 건너뛰었습니다. "
+                    f"(여러 카테고리에 나온 상품 {len(multi_category_ids)}개)"
+                )
+            if status["error"] is None and not session.commit():
+                status["error"] = "일부 Firestore 쓰기 작업이 실패했습니다."
+        finally:
+            session.close()
+            db.meter.finish()
+
+    session.print_summary()
+    failed_crawls = [name for name, count in results.items() if count is None]
+    for name in failed_crawls:
+        print(f"'{name}' 카테고리 스크래핑이 중간에 실패했습니다. (이미 가져온 페이지는 업로드됨)")
+    if status["error"] is not None or status["failed_categories"]:
+        return {
+            "status": "error",
+            "error": status["error"] or f"쓰기 작업이 실패한 카테고리: {status['failed_categories']}",
+            "results": results,
+        }
+
+    notify_embedding_server()
+    return {"status": "success", "results": results, "failed_crawls": failed_crawls}
+
+
+if __name__ == "__main__":
+    print(run_upload_pipeline(sys.argv[1] if len(sys.argv) > 1 else "price"))
@@ -0,0 +1,235 @@
+# upload_state.py
+# Firestore에 마지막으로 올린 상품 상태(가격, 이름/이미지 지문)를 로컬 SQLite 파일에 보관하는 저장소
+#
+# 업로더는 이 저장소에 있는 상품은 Firestore 문서를 읽지 않고 변경 여부를 판단합니다.
+# 저장소에 없는 상품만 Firestore에서 읽습니다.
+#
+# 사용법:
+#   python upload_state.py reconcile   # Firestore의 emart_price, emart_product 컬렉션에서 저장소를 다시 만듭니다.
+#   python upload_state.py stats       # 저장된 상품 수를 출력합니다.
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+
+from firestore_bulk import iter_documents
+from price_history import last_price_from_doc
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS price_state (
+    id TEXT PRIMARY KEY,
+    original_price TEXT,
+    selling_price TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS product_state (
+    id TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# SQLite 한 쿼리에 넣을 ID 수 (변수 개수 제한보다 작게)
+_QUERY_CHUNK = 500
+
+
+def product_fingerprint(product_name, image_url):
+    """ 상품 이름과 이미지 주소의 지문입니다. (둘 중 하나라도 바뀌면 달라집니다) """
+    raw = json.dumps([product_name, image_url], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def state_db_path_from_env():
+    """ .env의 EMART_UPLOAD_STATE_DB (기본 upload_state.sqlite3), 비어 있으면 저장소를 사용하지 않습니다(None). """
+    path = os.environ.get("EMART_UPLOAD_STATE_DB", "upload_state.sqlite3").strip()
+    return path or None
+
+
+class UploadStateStore:
+    """
+    상품 ID별로 마지막으로 업로드한 가격(original_price, selling_price)과
+    상품 정보 지문(product_fingerprint)을 저장합니다.
+    Args:
+        path (str): SQLite 파일 경로입니다.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30)
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def _select(self, table, columns, ids):
+        ids = list(dict.fromkeys(ids))
+        rows = []
+        for start in range(0, len(ids), _QUERY_CHUNK):
+            chunk = ids[start:start + _QUERY_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            rows += self._conn.execute(
+                f"SELECT id, {columns} FROM {table} WHERE id IN ({placeholders})", chunk
+            ).fetchall()
+        return rows
+
+    def get_prices(self, ids):
+        """ ID -> 마지막 가격 {"original_price", "selling_price"} (저장소에 있는 ID만) """
+        rows = self._select("price_state", "original_price, selling_price", ids)
+        return {
+            row[0]: {"original_price": row[1], "selling_price": row[2]} for row in rows
+        }
+
+    def get_product_fingerprints(self, ids):
+        """ ID -> 상품 정보 지문 (저장소에 있는 ID만) """
+        return dict(self._select("product_state", "fingerprint", ids))
+
+    def record_prices(self, prices):
+        """ prices: ID -> {"original_price", "selling_price"} """
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO price_state (id, original_price, selling_price, updated_at)"
+                " VALUES (?, ?, ?, ?)",
+                [
+                    (pid, price.get("original_price"), price.get("selling_price"), now)
+                    for pid, price in prices.items()
+                ],
+            )
+
+    def record_product_fingerprints(self, fingerprints):
+        """ fingerprints: ID -> 상품 정보 지문 """
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO product_state (id, fingerprint, updated_at) VALUES (?, ?, ?)",
+                [(pid, fingerprint, now) for pid, fingerprint in fingerprints.items()],
+            )
+
+    def forget(self, ids):
+        """ 상품 상태를 지웁니다. 다음 업로드 때는 Firestore에서 다시 읽습니다. (문서를 지웠거나 쓰기에 실패한 경우) """
+        ids = list(ids)
+        with self._conn:
+            for table in ("price_state", "product_state"):
+                self._conn.executemany(f"DELETE FROM {table} WHERE id = ?", [(pid,) for pid in ids])
+
+    def set_meta(self, key, value):
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def stats(self):
+        counts = {
+            table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            for table in ("price_state", "product_state")
+        }
+        reconciled_at = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'reconciled_at'"
+        ).fetchone()
+        return {
+            "path": self.path,
+            "prices": counts["price_state"],
+            "products": counts["product_state"],
+            "reconciled_at": reconciled_at[0] if reconciled_at else None,
+        }
+
+
+def open_state_store():
+    """ .env 설정에 따라 저장소를 엽니다. 사용하지 않도록 설정했으면 None을 반환합니다. """
+    path = state_db_path_from_env()
+    return UploadStateStore(path) if path else None
+
+
+def forget_products(ids):
+    """ 문서를 삭제한 상품을 저장소에서 지웁니다. (저장소를 사용하지 않으면 아무것도 하지 않습니다) """
+    store = open_state_store()
+    if store is None:
+        return
+    with store:
+        store.forget(ids)
+
+
+def reconcile_from_firestore(db, path=None, chunk_size=1000):
+    """
+    Firestore의 emart_price(현재 가격)와 emart_product(이름, 이미지)를 커서로 한 페이지씩 모두 읽어
+    저장소를 새로 만듭니다. 임시 파일에 만든 뒤 교체하므로 중간에 실패해도 기존 저장소는 그대로 남습니다.
+    Returns:
+        dict: 저장한 가격/상품 수
+    """
+    path = path or state_db_path_from_env() or "upload_state.sqlite3"
+    temp_path = path + ".tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    with UploadStateStore(temp_path) as store:
+        prices = {}
+        price_count = 0
+        for doc in iter_documents(db.collection("emart_price").select(["current_price", "price_history"])):
+            last_price = last_price_from_doc(doc.to_dict())
+            if not last_price:
+                continue
+            prices[doc.id] = last_price
+            if len(prices) >= chunk_size:
+                store.record_prices(prices)
+                price_count += len(prices)
+                print(f"가격 상태 {price_count}개를 저장했습니다.")
+                prices = {}
+        store.record_prices(prices)
+        price_count += len(prices)
+
+        fingerprints = {}
+        product_count = 0
+        for doc in iter_documents(db.collection("emart_product").select(["product_name", "image_url"])):
+            data = doc.to_dict() or {}
+            fingerprints[doc.id] = product_fingerprint(data.get("product_name"), data.get("image_url"))
+            if len(fingerprints) >= chunk_size:
+                store.record_product_fingerprints(fingerprints)
+                product_count += len(fingerprints)
+                print(f"상품 상태 {product_count}개를 저장했습니다.")
+                fingerprints = {}
+        store.record_product_fingerprints(fingerprints)
+        product_count += len(fingerprints)
+        store.set_meta("reconciled_at", time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+    os.replace(temp_path, path)
+    print(f"업로드 상태 저장소 '{path}'를 다시 만들었습니다. (가격 {price_count}개, 상품 {product_count}개)")
+    return {"prices": price_count, "products": product_count}
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv(override=True)
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "reconcile":
+        from firebase_uploader import get_db, initialize_firebase
+        from firestore_metrics import metered_client
+
+        initialize_firebase()
+        db = metered_client(get_db(), "upload_state_reconcile")
+        reconcile_from_firestore(db)
+        db.meter.finish()
+    elif command == "stats":
+        store = open_state_store()
+        if store is None:
+            print("EMART_UPLOAD_STATE_DB가 비어 있어 업로드 상태 저장소를 사용하지 않습니다.")
+        else:
+            with store:
+                print(json.dumps(store.stats(), ensure_ascii=False, indent=4))
+    else:
+        print("유효하지 않은 명령입니다. 다음 중 하나를 사용하세요: reconcile, stats")